@@ -18,11 +18,22 @@ setup(
     #    'sphinx_rtd_theme'
     #],
     tests_require=[
-        'nose'
+        'pytest'
     ],
-    test_suite='nose.collector',
     entry_points={'console_scripts': [
         '{0} = xbeachmi.console:xbeachmi'.format(
             'xbeach-mi'),
+        '{0} = xbeachmi.console:raw2nc'.format(
+            'xbeach-mi-raw2nc'),
+        '{0} = xbeachmi.console:benchmark'.format(
+            'xbeach-mi-benchmark'),
+        '{0} = xbeachmi.console:analyze'.format(
+            'xbeach-mi-analyze'),
+        '{0} = xbeachmi.console:sweep'.format(
+            'xbeach-mi-sweep'),
+        '{0} = xbeachmi.console:daemon'.format(
+            'xbeach-mi-daemon'),
+        '{0} = xbeachmi.console:replay'.format(
+            'xbeach-mi-replay'),
     ]},
 )
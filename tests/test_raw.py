@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import pytest
+
+import xbeachmi.raw
+
+
+def create(path, nt=3):
+    '''Write raw output with a single time-dependent variable'''
+
+    dimensions = {'x' : np.arange(4.), 'y' : np.arange(3.)}
+    variables = {'zs' : {'dimensions' : ('time', 'y', 'x')}}
+    xbeachmi.raw.initialize(path, dimensions, variables=variables,
+                            attributes={'title' : 'test'})
+
+    values = []
+    for i in range(nt):
+        zs = np.random.rand(3, 4)
+        xbeachmi.raw.append(path, i, {'time' : float(i), 'instance' : 'i000', 'zs' : zs})
+        values.append(zs)
+
+    return np.asarray(values, dtype='float32')
+
+
+def test_roundtrip(tmp_path):
+    path = str(tmp_path / 'out')
+    zs = create(path)
+
+    header = xbeachmi.raw.read_header(path)
+    assert header['dimensions'] == {'x' : 4, 'y' : 3}
+    assert header['attributes']['title'] == 'test'
+
+    data = xbeachmi.raw.read(path)
+    np.testing.assert_array_equal(data['time'], [0., 1., 2.])
+    np.testing.assert_array_equal(data['zs'], zs)
+    np.testing.assert_array_equal(data['x'], np.arange(4.))
+
+
+def test_truncated(tmp_path):
+    path = str(tmp_path / 'out')
+    zs = create(path)
+
+    fname = os.path.join(path, 'zs.bin')
+    os.truncate(fname, os.path.getsize(fname) - 1)
+
+    data = xbeachmi.raw.read(path)
+    assert len(data['time']) == 3
+    np.testing.assert_array_equal(data['zs'], zs[:2])
+
+
+def test_to_netcdf_truncated(tmp_path):
+    netCDF4 = pytest.importorskip('netCDF4')
+
+    path = str(tmp_path / 'out')
+    zs = create(path)
+
+    fname = os.path.join(path, 'zs.bin')
+    os.truncate(fname, os.path.getsize(fname) - 1)
+
+    ncfile = str(tmp_path / 'out.nc')
+    xbeachmi.raw.to_netcdf(path, ncfile)
+
+    with netCDF4.Dataset(ncfile) as nc:
+        np.testing.assert_array_equal(nc.variables['time'][:], [0., 1.])
+        np.testing.assert_allclose(nc.variables['zs'][:], zs[:2])
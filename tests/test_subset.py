@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('bmi.api')
+
+import xbeachmi.worker
+from xbeachmi.model import XBeachMIWrapper
+
+
+DIMS = ('y', 'x')
+SHAPE = (6, 11)
+
+
+def read_subset(subset):
+    '''Read subset of variable "zs" on a 10 m grid'''
+
+    dimensions = {'x' : np.arange(11) * 10., 'y' : np.arange(6) * 10.}
+    return XBeachMIWrapper().read_subset('zs', subset, DIMS, SHAPE, dimensions), dimensions
+
+
+def test_points():
+    subset, dimensions = read_subset({'points' : [[21., 9.], [50., 50.], [49., 52.]]})
+
+    # nearest cells, duplicates removed
+    assert subset['dimensions'] == ('points_zs',)
+    np.testing.assert_array_equal(subset['index'], [1 * 11 + 2, 5 * 11 + 5])
+    np.testing.assert_array_equal(dimensions['points_zs'], [0, 1])
+
+    coords = subset['variables']
+    np.testing.assert_array_equal(coords['x_points_zs']['values'], [20., 50.])
+    np.testing.assert_array_equal(coords['y_points_zs']['values'], [10., 50.])
+
+
+def test_points_values():
+    subset, _ = read_subset({'points' : [[21., 9.], [50., 50.]]})
+
+    x = np.arange(66.).reshape(SHAPE)
+    w = type('Engine', (), {'get_var' : lambda self, var: x})()
+    np.testing.assert_array_equal(xbeachmi.worker.get_var_index(w, 'zs', subset['index']),
+                                  [x[1, 2], x[5, 5]])
+
+
+def test_bbox():
+    subset, dimensions = read_subset({'bbox' : [15., 5., 55., 35.]})
+
+    assert subset['start'] == [1, 2]
+    assert subset['count'] == [3, 4]
+    assert subset['shape'] == (3, 4)
+    assert subset['dimensions'] == ('y_zs', 'x_zs')
+    np.testing.assert_array_equal(dimensions['x_zs'], [20., 30., 40., 50.])
+    np.testing.assert_array_equal(dimensions['y_zs'], [10., 20., 30.])
+
+
+def test_bbox_empty():
+    with pytest.raises(ValueError):
+        read_subset({'bbox' : [1., 1., 2., 2.]})
+
+
+def test_stride():
+    subset, dimensions = read_subset({'stride' : 2})
+
+    assert subset['stride'] == [2, 2]
+    assert subset['count'] == [3, 6]
+
+    # strided axes get their own dimension
+    assert subset['dimensions'] == ('y_zs', 'x_zs')
+    np.testing.assert_array_equal(dimensions['x_zs'], np.arange(0., 101., 20.))
+
+    x = np.arange(66.).reshape(SHAPE)
+    s = x[xbeachmi.worker.get_slices(subset['start'], subset['count'], subset['stride'])]
+    assert s.shape == subset['shape']
+    np.testing.assert_array_equal(s, x[::2, ::2])
+
+
+def test_bbox_stride():
+    subset, dimensions = read_subset({'bbox' : [15., 5., 55., 35.], 'stride' : 2})
+
+    assert subset['start'] == [1, 2]
+    assert subset['count'] == [2, 2]
+    np.testing.assert_array_equal(dimensions['x_zs'], [20., 40.])
@@ -0,0 +1,83 @@
+import os
+import re
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip('bmi.api')
+
+import xbeachmi.benchmark
+from xbeachmi.model import XBeachMI, XBeachMIWrapper
+
+
+INSTANCES = ['i000', 'i001']
+
+
+def create_case(path, **netcdf):
+    '''Create two-instance case of the synthetic engine with 5 time steps'''
+
+    configfile = xbeachmi.benchmark.create_case(str(path), 10, 3, len(INSTANCES),
+                                                exchange=['zb', 'zs'],
+                                                outputvars=['zb', 'zs'])
+
+    parfile = os.path.join(str(path), 'params.txt')
+    with open(parfile, 'r') as fp:
+        params = fp.read()
+    with open(parfile, 'w') as fp:
+        fp.write(re.sub(r'tstop\s*=\s*\S+', 'tstop = 5', params))
+
+    with open(configfile, 'r') as fp:
+        config = json.load(fp)
+    config['netcdf'].update(netcdf)
+    with open(configfile, 'w') as fp:
+        json.dump(config, fp)
+
+    return configfile
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    with XBeachMI(configfile=create_case(tmp_path)) as m:
+        yield m
+
+
+def test_get_var_all(model):
+    shape = tuple(model.get_var_shape('zs'))
+    for i, instance in enumerate(INSTANCES):
+        model._call('set_var', ('zs', np.full(shape, float(i + 1))), instances=[instance])
+
+    x = model.get_var_all('zs', instances=INSTANCES)
+    assert x.shape == (len(INSTANCES),) + shape
+    np.testing.assert_array_equal(x[:,0,0], [1., 2.])
+
+    # reversed order, into preallocated array
+    out = np.zeros((len(INSTANCES),) + shape, dtype='float32')
+    y = model.get_var_all('zs', instances=INSTANCES[::-1], out=out)
+    assert y is out
+    np.testing.assert_array_equal(out[:,0,0], [2., 1.])
+
+    np.testing.assert_array_equal(model.aggregate(x), np.full(shape, 1.5))
+
+
+def test_ensemble_output(tmp_path, monkeypatch):
+    netCDF4 = pytest.importorskip('netCDF4')
+
+    monkeypatch.chdir(str(tmp_path))
+    configfile = create_case(tmp_path, ensemble={'variables' : ['zs'],
+                                                 'percentiles' : [50]})
+    XBeachMIWrapper(configfile=configfile).run()
+
+    with netCDF4.Dataset(str(tmp_path / 'benchmark.nc')) as nc:
+        assert 'zs' not in nc.variables.keys()
+        for stat in ['mean', 'std', 'min', 'max', 'p50']:
+            v = nc.variables['zs_%s' % stat]
+            assert v.dimensions == ('time', 'y', 'x')
+            assert len(v) > 0
+        assert nc.variables['zs_std'].cell_methods == 'realization: standard_deviation'
+
+        # instances of the synthetic engine are identical
+        zs = nc.variables['zs_mean'][:]
+        for stat in ['min', 'max', 'p50']:
+            np.testing.assert_allclose(nc.variables['zs_%s' % stat][:], zs)
+        np.testing.assert_allclose(nc.variables['zs_std'][:], 0.)
@@ -0,0 +1,71 @@
+import os
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip('bmi.api')
+
+import xbeachmi.trace
+
+
+def record(filename):
+    '''Write trace with two batches of calls'''
+
+    rec = xbeachmi.trace.TraceRecorder(filename, header={'engine' : 'synthetic'})
+    t = time.time()
+
+    rec.begin()
+    rec.record('i000', 'update', (-1,), None, t, .1)
+    rec.record('i001', 'update', (-1,), None, t, .2)
+
+    rec.begin()
+    rec.record('i000', 'get_var', ('zs',), np.zeros((3, 4), dtype='float32'), t, .01)
+    rec.record('i000', 'get_current_time', (), 10., t, .001)
+    rec.record('i001', 'set_var_index', ('zs', list(range(20)), 1.), None, t, .01)
+    rec.close()
+
+
+def test_roundtrip(tmp_path):
+    filename = str(tmp_path / 'run.trace')
+    record(filename)
+
+    header, records = xbeachmi.trace.read_trace(filename)
+    assert header == {'engine' : 'synthetic'}
+    assert len(records) == 5
+
+    assert [r['batch'] for r in records] == [1, 1, 2, 2, 2]
+    assert [r['instance'] for r in records] == ['i000', 'i001', 'i000', 'i000', 'i001']
+    assert records[1]['execute'] == pytest.approx(.2)
+
+    r = records[2]
+    assert r['function'] == 'get_var'
+    assert r['args'] == [(xbeachmi.trace.VALUE, 'zs')]
+    assert r['result'] == (xbeachmi.trace.ARRAY, np.dtype('float32').str, (3, 4))
+
+    assert records[3]['result'] == (xbeachmi.trace.FLOAT, 10.)
+
+    # long lists are described by their shape only
+    kind, dtype, shape = records[4]['args'][1]
+    assert kind == xbeachmi.trace.ARRAY
+    assert shape == (20,)
+
+
+def test_truncated(tmp_path):
+    filename = str(tmp_path / 'run.trace')
+    record(filename)
+
+    os.truncate(filename, os.path.getsize(filename) - 3)
+
+    header, records = xbeachmi.trace.read_trace(filename)
+    assert header == {'engine' : 'synthetic'}
+    assert len(records) == 4
+    assert records[-1]['function'] == 'get_current_time'
+
+
+def test_invalid(tmp_path):
+    filename = str(tmp_path / 'run.trace')
+    with open(filename, 'wb') as fp:
+        fp.write(b'not a trace')
+
+    with pytest.raises(ValueError):
+        xbeachmi.trace.read_trace(filename)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import xbeachmi.worker
+
+
+class Engine:
+    '''Minimal model engine holding a single variable'''
+
+    def __init__(self, x):
+        self.x = x
+
+    def get_var(self, var):
+        return self.x
+
+    def set_var(self, var, val):
+        self.x[...] = val
+
+
+def test_get_slices():
+    assert xbeachmi.worker.get_slices([0, 2], [3, 4]) == (slice(0, 3, 1), slice(2, 6, 1))
+    assert xbeachmi.worker.get_slices([1, 0], [2, 3], [2, 3]) == (slice(1, 5, 2), slice(0, 9, 3))
+
+
+def test_get_slices_length_mismatch():
+    with pytest.raises(ValueError):
+        xbeachmi.worker.get_slices([0, 0], [1])
+
+
+def test_get_var_slice():
+    x = np.arange(60.).reshape((6, 10))
+    w = Engine(x)
+
+    s = xbeachmi.worker.get_var_slice(w, 'zs', [1, 2], [2, 3], [2, 3])
+    np.testing.assert_array_equal(s, x[1:5:2, 2:11:3])
+    assert not np.shares_memory(s, x)
+
+
+def test_get_var_index():
+    x = np.arange(60.).reshape((6, 10))
+    w = Engine(x)
+
+    v = xbeachmi.worker.get_var_index(w, 'zs', [0, 11, 59])
+    np.testing.assert_array_equal(v, [0., 11., 59.])
+
+    idx = np.array([[0, 1], [10, 11]])
+    np.testing.assert_array_equal(xbeachmi.worker.get_var_index(w, 'zs', idx), idx.astype(float))
+
+
+def test_set_var_index():
+    w = Engine(np.zeros((3, 4)))
+
+    xbeachmi.worker.set_var_index(w, 'zs', [1, 6], [5., 7.])
+    assert w.x[0, 1] == 5.
+    assert w.x[1, 2] == 7.
+    assert w.x.sum() == 12.
@@ -0,0 +1,163 @@
+import os
+import asyncio
+import logging
+import functools
+import concurrent.futures
+
+from xbeachmi.model import XBeachMI
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+class AsyncXBeachMI:
+    '''Asyncio facade of the XBeach MI coordinator
+
+    Wraps :class:`~xbeachmi.model.XBeachMI` for embedding in
+    asyncio-based coupling frameworks. Every call that communicates
+    with the instance processes is run in a dedicated single-thread
+    executor and awaited, such that the event loop is not blocked
+    while the instances compute. Calls to the same coordinator are
+    executed one at a time in the order they are made, while
+    multiple coordinators and other components step concurrently:
+
+    .. code-block:: python
+
+       async def couple():
+           async with AsyncXBeachMI('a/config.json') as a, \\
+                      AsyncXBeachMI('b/config.json') as b:
+               tstop = await a.get_end_time()
+               while await a.get_current_time() < tstop:
+                   await asyncio.gather(a.update(), b.update())
+                   await b.set_var('zs', await a.get_var('zs'))
+
+       asyncio.run(couple())
+
+    The coordinator normally changes the working directory of the
+    process to the directory of its configuration file. The facade
+    restores the working directory after constructing the
+    coordinator, since the working directory is shared by all
+    coordinators and threads in the process. Relative paths passed
+    to the facade are therefore relative to the working directory of
+    the caller.
+
+    The work of an in-process instance, if configured, is done in the
+    executor thread and only overlaps with other components as far
+    as the model engine releases the GIL.
+
+    Metadata that is cached by the coordinator, like variable shapes
+    and types, is available through the synchronous :attr:`engine`.
+
+    '''
+
+
+    def __init__(self, configfile='', profile_workers=None):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        configfile : str
+            path to JSON configuration file, see
+            :func:`~xbeachmi.model.XBeachMI.load_configfile`
+        profile_workers : str, optional
+            directory to write profiles of instance processes to
+
+        '''
+
+        cwd = os.getcwd()
+        try:
+            self.engine = XBeachMI(configfile=os.path.abspath(configfile),
+                                   profile_workers=profile_workers)
+        finally:
+            os.chdir(cwd)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+
+    async def __aexit__(self, errtype, errobj, traceback):
+        await self.finalize()
+
+
+    async def _submit(self, fcn, *args, **kwargs):
+        '''Run coordinator method in executor and await the result'''
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(fcn, *args, **kwargs))
+
+
+    async def initialize(self):
+        await self._submit(self.engine.initialize)
+
+
+    async def update(self, dt=-1, instances=None):
+        await self._submit(self.engine.update, dt=dt, instances=instances)
+
+
+    async def update_until(self, t):
+        '''Update until the given time is reached
+
+        Parameters
+        ----------
+        t : float
+            time to update to
+
+        '''
+
+        while await self.get_current_time() < t:
+            await self.update()
+
+
+    async def finalize(self):
+        try:
+            await self._submit(self.engine.finalize)
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+    async def get_current_time(self):
+        return await self._submit(self.engine.get_current_time)
+
+
+    async def get_start_time(self):
+        return await self._submit(self.engine.get_start_time)
+
+
+    async def get_end_time(self):
+        return await self._submit(self.engine.get_end_time)
+
+
+    async def get_var(self, var, instances=None, out=None):
+        return await self._submit(self.engine.get_var, var,
+                                  instances=instances, out=out)
+
+
+    async def get_var_index(self, var, index, instances=None):
+        return await self._submit(self.engine.get_var_index, var, index,
+                                  instances=instances)
+
+
+    async def get_var_slice(self, var, start, count, stride=None, instances=None):
+        return await self._submit(self.engine.get_var_slice, var, start, count,
+                                  stride=stride, instances=instances)
+
+
+    async def set_var(self, var, val):
+        await self._submit(self.engine.set_var, var, val)
+
+
+    async def set_var_index(self, var, index, val):
+        await self._submit(self.engine.set_var_index, var, index, val)
+
+
+    async def set_var_slice(self, var, start, count, val):
+        await self._submit(self.engine.set_var_slice, var, start, count, val)
+
+
+    async def get_resources(self):
+        return await self._submit(self.engine.get_resources)
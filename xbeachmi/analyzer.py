@@ -0,0 +1,272 @@
+import os
+import time
+import json
+import logging
+import numpy as np
+
+from xbeachmi.model import XBeachMI
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+def analyze(configfile, source=None, target=None, variables=None, warmup=10,
+            steps=10, epsilon=1e-3, tolerance=1e-8):
+    '''Determine which exchange variables influence the continuation
+
+    Each candidate variable is tested in a separate run. The source
+    instance is run for a number of warmup steps, after which all
+    candidate variables are exchanged to the target instance. The
+    tested variable is then perturbed in the target instance by a
+    small random relative amount and the target instance is run for
+    a number of steps. If the state of the target instance after
+    these steps differs from the state in an unperturbed reference
+    run, the variable influences the continuation of the simulation
+    and should be exchanged. Diagnostic variables that are
+    recomputed every time step do not influence the continuation and
+    can be left out of the exchange. Variables that are not floating
+    point, like wet/dry masks, cannot be perturbed by a small
+    relative amount and are kept in the exchange without testing.
+    Their influence is reported as None.
+
+    The reference run is repeated to estimate the run-to-run
+    variability of the model engine, which is added to the tolerance.
+    The reference run also measures the number of bytes and the time
+    needed to exchange each variable.
+
+    Exchange subsets, the scenario and aggregation settings in the
+    configuration file are ignored.
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+    source : str, optional
+        name of source instance, defaults to the first instance in
+        the scenario
+    target : str, optional
+        name of target instance, defaults to the second instance in
+        the scenario
+    variables : list, optional
+        candidate variables, defaults to the exchange variables in
+        the configuration file
+    warmup : int, optional
+        number of time steps of source instance before the switch
+    steps : int, optional
+        number of time steps of target instance after the switch
+    epsilon : float, optional
+        relative size of perturbation
+    tolerance : float, optional
+        relative difference considered an influence
+
+    Returns
+    -------
+    dict
+        analysis results with the minimal exchange list, the
+        baseline variability and per variable the relative influence,
+        whether it is required and its exchange cost
+
+    '''
+
+    configfile = os.path.abspath(configfile)
+
+    # determine candidates, source and target
+    engine = XBeachMI(configfile=configfile)
+    os.chdir(engine.cwd)
+    if variables is None:
+        variables = list(engine.config['exchange'])
+    instances = []
+    for t, i in engine.config.get('scenario', []):
+        for instance in (i if type(i) is list else [i]):
+            if instance not in instances:
+                instances.append(instance)
+    instances.extend([i for i in sorted(engine.instances.keys()) if i not in instances])
+    if source is None:
+        source = instances[0]
+    if target is None:
+        target = instances[1] if len(instances) > 1 else instances[0]
+    if source == target:
+        logger.warning('Source and target instance are the same [%s]' % source)
+
+    # reference runs
+    logger.info('Running reference...')
+    reference, cost = run_switch(configfile, source, target, variables, warmup, steps)
+    repeated, _ = run_switch(configfile, source, target, variables, warmup, steps)
+    noise = max([difference(reference[var], repeated[var]) for var in variables] + [0.])
+
+    # perturbation runs, variables that are not floating point, like
+    # wet/dry masks, cannot be perturbed by a small relative amount
+    # and are kept in the exchange without testing
+    results = {}
+    for var in variables:
+        if np.asarray(reference[var]).dtype.kind != 'f':
+            logger.info('Skipping "%s", not a floating point variable' % var)
+            results[var] = {
+                'influence' : None,
+                'required' : True,
+                'bytes' : cost[var]['bytes'],
+                'time' : cost[var]['time'],
+            }
+            continue
+        logger.info('Testing "%s"...' % var)
+        state, _ = run_switch(configfile, source, target, variables, warmup, steps,
+                              perturb=var, epsilon=epsilon)
+        influence = max([difference(reference[v], state[v]) for v in variables])
+        results[var] = {
+            'influence' : influence,
+            'required' : influence > tolerance + noise,
+            'bytes' : cost[var]['bytes'],
+            'time' : cost[var]['time'],
+        }
+
+    return {
+        'source' : source,
+        'target' : target,
+        'noise' : noise,
+        'exchange' : [var for var in variables if results[var]['required']],
+        'variables' : results,
+    }
+
+
+def run_switch(configfile, source, target, variables, warmup, steps,
+               perturb=None, epsilon=1e-3):
+    '''Run source instance, switch to target instance and run target
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+    source : str
+        name of source instance
+    target : str
+        name of target instance
+    variables : list
+        variables to exchange and return
+    warmup : int
+        number of time steps of source instance
+    steps : int
+        number of time steps of target instance
+    perturb : str, optional
+        name of variable to perturb after the switch
+    epsilon : float, optional
+        relative size of perturbation
+
+    Returns
+    -------
+    state : dict
+        values of variables in target instance after the run
+    cost : dict
+        number of bytes and time needed to exchange each variable
+
+    '''
+
+    engine = XBeachMI(configfile=configfile)
+    for key in ['scenario', 'aggregate', 'profile', 'trace', 'inprocess']:
+        engine.config.pop(key, None)
+    engine.config['exchange'] = list(variables)
+    engine.subsets = {}
+    engine.inprocess = None
+
+    engine.initialize()
+
+    try:
+        engine.running = [source]
+        for i in range(warmup):
+            engine.update()
+
+        # exchange variables one by one to measure their cost
+        engine.sync_time(target)
+        cost = {}
+        for var in variables:
+            t0 = time.time()
+            val = engine.get_var(var, instances=[source])
+            engine._call('set_var', (var, val), instances=[target])
+            cost[var] = {
+                'bytes' : np.asarray(val).nbytes,
+                'time' : time.time() - t0,
+            }
+        engine.running = [target]
+
+        if perturb is not None:
+            val = np.asarray(engine.get_var(perturb), dtype='float64')
+            scale = np.abs(val).max()
+            if scale == 0.:
+                scale = 1.
+            noise = np.random.RandomState(0).uniform(-1., 1., val.shape)
+            engine.set_var(perturb, (val + epsilon * scale * noise).astype(
+                engine.get_var_dtype(perturb)))
+
+        for i in range(steps):
+            engine.update()
+
+        state = {var : np.array(engine.get_var(var)) for var in variables}
+
+    finally:
+        engine.finalize()
+
+    return state, cost
+
+
+def difference(a, b):
+    '''Return maximum absolute difference relative to maximum value
+
+    Parameters
+    ----------
+    a, b : np.ndarray
+        arrays to compare
+
+    Returns
+    -------
+    float
+        relative difference
+
+    '''
+
+    a = np.asarray(a, dtype='float64')
+    b = np.asarray(b, dtype='float64')
+    scale = max(np.abs(a).max() if a.size else 0., 1e-12)
+
+    return float(np.abs(a - b).max() / scale) if a.size else 0.
+
+
+def format_report(results):
+    '''Format analysis results as table
+
+    Parameters
+    ----------
+    results : dict
+        analysis results as returned by :func:`analyze`
+
+    Returns
+    -------
+    list
+        lines of report
+
+    '''
+
+    lines = []
+    lines.append('Switch from "%s" to "%s", run-to-run variability %0.3g' %
+                 (results['source'], results['target'], results['noise']))
+    lines.append('%-16s %8s %12s %12s %10s' %
+                 ('variable', 'required', 'influence', 'size [kB]', 'time [ms]'))
+
+    variables = results['variables']
+    total = {True : [0, 0.], False : [0, 0.]}
+    for var in sorted(variables.keys(), key=lambda v: -variables[v]['bytes']):
+        r = variables[var]
+        lines.append('%-16s %8s %12s %12.1f %10.3f' %
+                     (var, 'yes' if r['required'] else 'no',
+                      '%0.3g' % r['influence'] if r['influence'] is not None else 'untested',
+                      r['bytes'] / 1e3, r['time'] * 1e3))
+        total[r['required']][0] += r['bytes']
+        total[r['required']][1] += r['time']
+
+    lines.append('Required: %d variables, %0.1f kB, %0.3f ms per switch' %
+                 (len(results['exchange']), total[True][0] / 1e3, total[True][1] * 1e3))
+    lines.append('Omitted:  %d variables, %0.1f kB, %0.3f ms per switch' %
+                 (len(variables) - len(results['exchange']),
+                  total[False][0] / 1e3, total[False][1] * 1e3))
+    lines.append('"exchange": %s' % json.dumps(results['exchange']))
+
+    return lines
@@ -0,0 +1,315 @@
+from __future__  import absolute_import
+
+import os
+import sys
+import time
+import json
+import shutil
+import logging
+import tempfile
+import platform
+import numpy as np
+
+from xbeachmi.model import XBeachMI, XBeachMIWrapper
+from xbeachmi.progress import ProgressIndicator
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# exchange list of the sequential example
+EXCHANGE = ['zb', 'Fx', 'Fy', 'Sxy', 'Syy', 'Sxx', 'H', 'cgx', 'cgy', 'cx',
+            'cy', 'ctheta', 'ee', 'rr', 'k', 'c', 'cg', 'hh', 'zs', 'zs0',
+            'uu', 'vu', 'uv', 'vv', 'qx', 'qy', 'E', 'R', 'urms', 'D', 'Qb',
+            'ust', 'ueu', 'vev', 'u', 'v', 'ue', 've', 'wetu', 'wetv', 'wetz',
+            'hu', 'hv', 'hum', 'hvm', 'vmag', 'ccg', 'uwf', 'vwf', 'ustr',
+            'usd', 'DR', 'ur', 'Susg', 'Svsg', 'Subg', 'Svbg', 'ceqbg',
+            'ceqsg', 'ua', 'BR', 'kb', 'pbbed', 'bedfriccoef', 'taubx',
+            'tauby', 'Df', 'Dp', 'Sutot', 'Svtot', 'cctot', 'cf', 'cfu',
+            'cfv', 'viscu', 'viscv']
+
+OUTPUTVARS = ['zb', 'zs', 'zs0', 'H']
+
+
+def create_case(path, nx, ny, ninstances, nvars=0, cost=0., dt=1.,
+                exchange=EXCHANGE, outputvars=OUTPUTVARS):
+    '''Create model setup for benchmark case using the synthetic engine
+
+    Parameters
+    ----------
+    path : str
+        directory to create model setup in
+    nx, ny : int
+        number of grid cells in x and y direction
+    ninstances : int
+        number of instances
+    nvars : int, optional
+        number of additional synthetic variables
+    cost : float, optional
+        wall time per time step of synthetic engine
+    dt : float, optional
+        time step of synthetic engine
+    exchange : list, optional
+        exchange variables
+    outputvars : list, optional
+        output variables
+
+    Returns
+    -------
+    str
+        path to configuration file
+
+    '''
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    x, y = np.meshgrid(np.arange(nx+1) * 10., np.arange(ny+1) * 10.)
+    np.savetxt(os.path.join(path, 'x.txt'), x)
+    np.savetxt(os.path.join(path, 'y.txt'), y)
+
+    with open(os.path.join(path, 'params.txt'), 'w') as fp:
+        fp.write('nx = %d\n' % nx)
+        fp.write('ny = %d\n' % ny)
+        fp.write('vardx = 1\n')
+        fp.write('xfile = x.txt\n')
+        fp.write('yfile = y.txt\n')
+        fp.write('thetamin = -90\n')
+        fp.write('thetamax = 90\n')
+        fp.write('dtheta = 30\n')
+        fp.write('tstart = 0\n')
+        fp.write('tstop = 1000000\n')
+        fp.write('synthetic_dt = %g\n' % dt)
+        fp.write('synthetic_cost = %g\n' % cost)
+        fp.write('synthetic_nvars = %d\n' % nvars)
+
+    config = {
+        'engine' : 'synthetic',
+        'params_file' : 'params.txt',
+        'exchange' : list(exchange) + ['var%03d' % i for i in range(nvars)],
+        'instances' : ['i%03d' % i for i in range(ninstances)],
+        'netcdf' : {
+            'outputfile' : 'benchmark.nc',
+            'outputvars' : list(outputvars),
+            'interval' : 1.,
+            'crs' : {},
+            'attributes' : {},
+        },
+    }
+
+    configfile = os.path.join(path, 'config.json')
+    with open(configfile, 'w') as fp:
+        json.dump(config, fp, indent=4)
+
+    return configfile
+
+
+def run_case(nx, ny, ninstances, steps=100, switches=10, outputs=10, **kwargs):
+    '''Run benchmark case
+
+    Measures the startup time of XBeach MI, the update throughput of a
+    single instance, the latency of switching instances including the
+    exchange of all exchange variables, the cost of aggregating the
+    exchange variables over all instances and the netCDF output
+    throughput. With a single instance, the switch latency is
+    measured by switching to the same instance.
+
+    Parameters
+    ----------
+    nx, ny : int
+        number of grid cells in x and y direction
+    ninstances : int
+        number of instances
+    steps : int, optional
+        number of time steps to measure update throughput
+    switches : int, optional
+        number of switches to measure switch latency
+    outputs : int, optional
+        number of output time steps to measure output throughput
+    kwargs : dict
+        keyword arguments passed to :func:`create_case`
+
+    Returns
+    -------
+    dict
+        benchmark results
+
+    '''
+
+    path = tempfile.mkdtemp(prefix='xbeachmi-benchmark-')
+    cwd = os.getcwd()
+    result = {
+        'nx' : nx,
+        'ny' : ny,
+        'instances' : ninstances,
+    }
+
+    try:
+        configfile = create_case(path, nx, ny, ninstances, **kwargs)
+
+        # startup
+        t0 = time.time()
+        engine = XBeachMI(configfile=configfile)
+        engine.initialize()
+        result['startup'] = time.time() - t0
+
+        try:
+            names = sorted(engine.instances.keys())
+            nbytes = sum([engine.data[var].nbytes for var in engine.config['exchange']])
+            result['exchange_bytes'] = nbytes
+
+            # update throughput
+            engine.running = [names[0]]
+            t0 = time.time()
+            for i in range(steps):
+                engine.update()
+            dt = time.time() - t0
+            result['update_rate'] = steps / dt
+            result['update_time'] = dt / steps
+
+            # switch latency
+            t0 = time.time()
+            for i in range(switches):
+                engine.set_instances([names[(i+1) % len(names)]])
+            dt = time.time() - t0
+            result['switch_time'] = dt / switches
+            result['switch_rate'] = 2 * nbytes * switches / dt / 1e6
+
+            # aggregation cost
+            engine.running = names
+            t0 = time.time()
+            for i in range(switches):
+                engine.aggregate_data()
+            result['aggregate_time'] = (time.time() - t0) / switches
+
+            # output throughput
+            wrapper = XBeachMIWrapper()
+            wrapper.engine = engine
+            wrapper.t = engine.get_current_time()
+            wrapper.progress = ProgressIndicator(duration=engine.get_end_time())
+            wrapper.output_init()
+            t0 = time.time()
+            for i in range(outputs):
+                wrapper.progress.last = wrapper.t
+                wrapper.t += 1.
+                wrapper.output()
+            dt = time.time() - t0
+            result['output_time'] = dt / outputs
+            result['output_rate'] = sum([b.nbytes for b in wrapper.buffers.values()]) \
+                                    * outputs / dt / 1e6
+
+        finally:
+            engine.finalize()
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+    return result
+
+
+def run(grids=[(100, 0), (1000, 0), (100, 100)], instances=[1, 2, 4], **kwargs):
+    '''Run benchmark suite
+
+    Parameters
+    ----------
+    grids : list, optional
+        list of tuples with grid sizes (nx, ny)
+    instances : list, optional
+        list of numbers of instances
+    kwargs : dict
+        keyword arguments passed to :func:`run_case`
+
+    Returns
+    -------
+    dict
+        benchmark results with environment information
+
+    '''
+
+    results = {
+        'date' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python' : sys.version.split()[0],
+        'numpy' : np.__version__,
+        'platform' : platform.platform(),
+        'cases' : [],
+    }
+
+    for nx, ny in grids:
+        for n in instances:
+            logger.info('Running benchmark nx=%d, ny=%d, instances=%d...' % (nx, ny, n))
+            results['cases'].append(run_case(nx, ny, n, **kwargs))
+
+    return results
+
+
+def compare(results, reference, threshold=.1):
+    '''Compare benchmark results with reference results
+
+    Parameters
+    ----------
+    results : dict
+        benchmark results
+    reference : dict
+        reference benchmark results
+    threshold : float, optional
+        relative increase in time considered a regression
+
+    Returns
+    -------
+    list
+        lines with comparison per case and metric, regressions are
+        marked with an asterisk
+
+    '''
+
+    def key(case):
+        return (case['nx'], case['ny'], case['instances'])
+
+    ref = {key(case) : case for case in reference['cases']}
+
+    lines = []
+    for case in results['cases']:
+        if key(case) not in ref.keys():
+            continue
+        for metric in sorted(case.keys()):
+            if not metric.endswith('_time') and metric != 'startup':
+                continue
+            if metric not in ref[key(case)].keys():
+                continue
+            r = case[metric] / ref[key(case)][metric]
+            lines.append('%s nx=%-6d ny=%-6d n=%-3d %-16s %10.4f %10.4f %6.2fx' % (
+                '*' if r > 1. + threshold else ' ',
+                case['nx'], case['ny'], case['instances'], metric,
+                ref[key(case)][metric], case[metric], r))
+
+    return lines
+
+
+def format_results(results):
+    '''Format benchmark results as table
+
+    Parameters
+    ----------
+    results : dict
+        benchmark results
+
+    Returns
+    -------
+    list
+        lines of table
+
+    '''
+
+    lines = ['%-8s %-8s %-4s %10s %12s %12s %12s %12s %12s' %
+             ('nx', 'ny', 'n', 'startup', 'update [/s]', 'switch [ms]',
+              'switch MB/s', 'agg. [ms]', 'output MB/s')]
+    for case in results['cases']:
+        lines.append('%-8d %-8d %-4d %10.3f %12.1f %12.3f %12.1f %12.3f %12.1f' %
+                     (case['nx'], case['ny'], case['instances'],
+                      case['startup'], case['update_rate'],
+                      case['switch_time'] * 1e3, case['switch_rate'],
+                      case['aggregate_time'] * 1e3, case['output_rate']))
+
+    return lines
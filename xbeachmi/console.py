@@ -1,16 +1,18 @@
 from __future__  import absolute_import
 
+import sys
+import time
 import docopt
 import logging
 
-from xbeachmi.model import XBeachMIWrapper
-
 
 def xbeachmi():
     '''xbeach-mi : XBeach wrapper for running multiple parallel instances
 
 Usage:
-    xbeach-mi <config> [--verbose=LEVEL]
+    xbeach-mi <config> [--verbose=LEVEL] [--profile=DIR] [--daemon] [--socket=PATH]
+    xbeach-mi <config> --validate [--verbose=LEVEL]
+    xbeach-mi <config> --plan [--calibrate=STEPS] [--verbose=LEVEL]
 
 Positional arguments:
     config             configuration file
@@ -18,6 +20,18 @@ Positional arguments:
 Options:
     -h, --help         show this help message and exit
     --verbose=LEVEL    print logging messages [default: 30]
+    --profile=DIR      profile instance processes and write one
+                       statistics file per instance to DIR
+    --validate         check configuration, templates and referenced
+                       files without running the model
+    --plan             estimate switches, data exchange, output size
+                       and memory without running the model
+    --calibrate=STEPS  run each instance for STEPS time steps to
+                       measure speed and memory for the plan
+    --daemon           submit run to a running xbeach-mi-daemon, run
+                       locally if no daemon is listening
+    --socket=PATH      socket of daemon, defaults to a socket in the
+                       private runtime directory of the user
 
     '''
     
@@ -30,8 +44,309 @@ Options:
     else:
         logging.root.setLevel(logging.NOTSET)
 
+    logger = logging.getLogger(__name__)
+
+    # validate configuration
+    if arguments['--validate']:
+        from xbeachmi.validation import validate
+        errors, warnings = validate(arguments['<config>'])
+        for msg in warnings:
+            print('WARNING: %s' % msg)
+        for msg in errors:
+            print('ERROR: %s' % msg)
+        if errors:
+            sys.exit(1)
+        print('Configuration "%s" is valid' % arguments['<config>'])
+        return
+
+    # estimate cost and memory
+    if arguments['--plan']:
+        from xbeachmi.planner import plan, format_plan
+        print('\n'.join(format_plan(plan(arguments['<config>'],
+                                          calibrate=int(arguments['--calibrate'] or 0)))))
+        return
+
+    # submit run to daemon
+    if arguments['--daemon']:
+        from xbeachmi.daemon import submit
+        try:
+            code = submit(arguments['<config>'],
+                          path=arguments['--socket'],
+                          verbose=int(arguments['--verbose']),
+                          profile=arguments['--profile'])
+        except (ConnectionRefusedError, FileNotFoundError):
+            logger.warning('No daemon listening, running locally')
+        else:
+            sys.exit(code)
+
+    # import model, report import time
+    t0 = time.time()
+    from xbeachmi.model import XBeachMIWrapper
+    logger.info('Imported XBeach MI in %0.3f s' % (time.time() - t0))
+
     # start model
-    XBeachMIWrapper(configfile=arguments['<config>']).run()
+    XBeachMIWrapper(configfile=arguments['<config>'],
+                    profile_workers=arguments['--profile']).run()
+
+
+
+def raw2nc():
+    '''xbeach-mi-raw2nc : Convert XBeach MI raw binary output to netCDF4
+
+Usage:
+    xbeach-mi-raw2nc <rawdir> <ncfile>
+
+Positional arguments:
+    rawdir             raw binary output directory
+    ncfile             netCDF4 output file
+
+Options:
+    -h, --help         show this help message and exit
+
+    '''
+
+    arguments = docopt.docopt(raw2nc.__doc__)
+
+    import xbeachmi.raw
+    xbeachmi.raw.to_netcdf(arguments['<rawdir>'], arguments['<ncfile>'])
+
+
+
+def benchmark():
+    '''xbeach-mi-benchmark : Benchmark XBeach MI overhead with a synthetic engine
+
+Usage:
+    xbeach-mi-benchmark [options]
+
+Options:
+    -h, --help           show this help message and exit
+    --grids=SIZES        comma-separated grid sizes nx:ny [default: 100:0,1000:0,100:100]
+    --instances=NS       comma-separated numbers of instances [default: 1,2,4]
+    --steps=N            number of time steps per case [default: 100]
+    --cost=SECONDS       wall time per time step of synthetic engine [default: 0]
+    --output=FILE        write results to JSON file
+    --compare=FILE       compare results with reference JSON file
+    --threshold=FRAC     relative slowdown marked as regression [default: 0.1]
+    --verbose=LEVEL      print logging messages [default: 30]
+
+    '''
+
+    arguments = docopt.docopt(benchmark.__doc__)
+
+    logging.basicConfig(format='%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
+    logging.root.setLevel(int(arguments['--verbose']))
+
+    import json
+    import xbeachmi.benchmark
+
+    grids = [tuple([int(n) for n in g.split(':')])
+             for g in arguments['--grids'].split(',')]
+    instances = [int(n) for n in arguments['--instances'].split(',')]
+
+    results = xbeachmi.benchmark.run(grids=grids,
+                                     instances=instances,
+                                     steps=int(arguments['--steps']),
+                                     cost=float(arguments['--cost']))
+
+    print('\n'.join(xbeachmi.benchmark.format_results(results)))
+
+    if arguments['--output']:
+        with open(arguments['--output'], 'w') as fp:
+            json.dump(results, fp, indent=4)
+
+    if arguments['--compare']:
+        with open(arguments['--compare'], 'r') as fp:
+            reference = json.load(fp)
+        print('\n'.join(xbeachmi.benchmark.compare(results, reference,
+                                                   float(arguments['--threshold']))))
+
+
+
+def analyze():
+    '''xbeach-mi-analyze : Derive minimal list of exchange variables
+
+Usage:
+    xbeach-mi-analyze <config> [options]
+
+Positional arguments:
+    config             configuration file
+
+Options:
+    -h, --help         show this help message and exit
+    --source=NAME      source instance, defaults to first instance in scenario
+    --target=NAME      target instance, defaults to second instance in scenario
+    --variables=LIST   comma-separated candidate variables, defaults to
+                       the exchange variables in the configuration file
+    --warmup=N         time steps before the switch [default: 10]
+    --steps=N          time steps after the switch [default: 10]
+    --epsilon=EPS      relative size of perturbation [default: 1e-3]
+    --tolerance=TOL    relative difference considered an influence [default: 1e-8]
+    --output=FILE      write results to JSON file
+    --verbose=LEVEL    print logging messages [default: 30]
+
+    '''
+
+    arguments = docopt.docopt(analyze.__doc__)
+
+    logging.basicConfig(format='%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
+    logging.root.setLevel(int(arguments['--verbose']))
+
+    import json
+    import xbeachmi.analyzer
+
+    variables = None
+    if arguments['--variables']:
+        variables = arguments['--variables'].split(',')
+
+    results = xbeachmi.analyzer.analyze(arguments['<config>'],
+                                        source=arguments['--source'],
+                                        target=arguments['--target'],
+                                        variables=variables,
+                                        warmup=int(arguments['--warmup']),
+                                        steps=int(arguments['--steps']),
+                                        epsilon=float(arguments['--epsilon']),
+                                        tolerance=float(arguments['--tolerance']))
+
+    print('\n'.join(xbeachmi.analyzer.format_report(results)))
+
+    if arguments['--output']:
+        with open(arguments['--output'], 'w') as fp:
+            json.dump(results, fp, indent=4)
+
+
+def sweep():
+    '''xbeach-mi-sweep : Run XBeach MI for each row in a parameter table
+
+Usage:
+    xbeach-mi-sweep <template> <table> [options]
+
+Positional arguments:
+    template           JSON configuration template, rendered with Mako
+    table              parameter table, CSV file with header or JSON
+                       list of dictionaries
+
+Options:
+    -h, --help         show this help message and exit
+    --outdir=DIR       directory for run directories [default: runs]
+    --cores=N          core budget, defaults to the number of CPUs
+    --memory=MB        memory budget
+    --instance-memory=MB
+                       estimated memory per instance process
+    --dry-run          expand runs without starting them
+    --verbose=LEVEL    print logging messages [default: 30]
+
+    '''
+
+    arguments = docopt.docopt(sweep.__doc__)
+
+    logging.basicConfig(format='%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
+    logging.root.setLevel(int(arguments['--verbose']))
+
+    import xbeachmi.sweep
+
+    runs = xbeachmi.sweep.expand(arguments['<template>'],
+                                 xbeachmi.sweep.read_table(arguments['<table>']),
+                                 arguments['--outdir'])
+
+    if arguments['--dry-run']:
+        for run in runs:
+            status = xbeachmi.sweep.read_status(run['path']).get('status', 'pending')
+            print('%-40s %4d cores  %s' % (run['id'], run['cores'], status))
+        return
+
+    def optional(value, fcn):
+        return fcn(value) if value is not None else None
+
+    result = xbeachmi.sweep.schedule(runs,
+                                     cores=optional(arguments['--cores'], int),
+                                     memory=optional(arguments['--memory'], float),
+                                     memory_per_instance=optional(
+                                         arguments['--instance-memory'], float),
+                                     verbose=int(arguments['--verbose']))
+
+    failed = [k for k, v in result.items() if v != 'done']
+    print('%d of %d runs done' % (len(result) - len(failed), len(result)))
+    if failed:
+        print('Failed: %s' % ', '.join(sorted(failed)))
+        sys.exit(1)
+
+
+
+def daemon():
+    '''xbeach-mi-daemon : Serve XBeach MI runs with preloaded engines
+
+Usage:
+    xbeach-mi-daemon [options]
+
+Options:
+    -h, --help         show this help message and exit
+    --socket=PATH      socket to listen on, defaults to a socket in the
+                       private runtime directory of the user
+    --engines=LIST     comma-separated model engines to preload [default: xbeach]
+    --jobs=N           maximum number of simultaneous runs
+    --stop             stop running daemon
+    --verbose=LEVEL    print logging messages [default: 20]
+
+Runs are submitted using "xbeach-mi <config> --daemon".
+
+    '''
+
+    arguments = docopt.docopt(daemon.__doc__)
+
+    import xbeachmi.daemon
+
+    if arguments['--stop']:
+        xbeachmi.daemon.stop(arguments['--socket'])
+        return
+
+    logging.basicConfig(format=xbeachmi.daemon.FORMAT)
+    logging.root.setLevel(int(arguments['--verbose']))
+
+    xbeachmi.daemon.serve(arguments['--socket'],
+                          engines=arguments['--engines'].split(','),
+                          jobs=int(arguments['--jobs']) if arguments['--jobs'] else None)
+
+
+
+def replay():
+    '''xbeach-mi-replay : Replay recorded XBeach MI calls against stub workers
+
+Usage:
+    xbeach-mi-replay <trace> [options]
+
+Positional arguments:
+    trace              trace file recorded using the "trace" entry of
+                       the configuration file
+
+Options:
+    -h, --help         show this help message and exit
+    --scale=FACTOR     factor applied to recorded execution times [default: 1]
+    --gaps             sleep the recorded time between batches of calls
+    --profile          profile calls during replay
+    --output=FILE      write results to JSON file
+    --verbose=LEVEL    print logging messages [default: 30]
+
+    '''
+
+    arguments = docopt.docopt(replay.__doc__)
+
+    logging.basicConfig(format='%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
+    logging.root.setLevel(int(arguments['--verbose']))
+
+    import json
+    import xbeachmi.trace
+
+    with xbeachmi.trace.Replay(arguments['<trace>'],
+                               scale=float(arguments['--scale']),
+                               gaps=arguments['--gaps'],
+                               profile=arguments['--profile']) as engine:
+        results = engine.replay()
+
+    print('\n'.join(xbeachmi.trace.format_results(results)))
+
+    if arguments['--output']:
+        with open(arguments['--output'], 'w') as fp:
+            json.dump(results, fp, indent=4)
 
             
 if __name__ == '__main__':
@@ -0,0 +1,455 @@
+import os
+import sys
+import json
+import time
+import select
+import signal
+import socket
+import struct
+import logging
+import tempfile
+import traceback
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+FORMAT = '%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s'
+
+
+def get_socket_path():
+    '''Return default path of daemon socket
+
+    The socket is placed in the runtime directory of the user given
+    by "$XDG_RUNTIME_DIR", or otherwise in a directory in the
+    temporary directory that is only accessible by the user. The
+    latter is created if it does not exist.
+
+    Returns
+    -------
+    str
+        path to Unix socket, unique per user
+
+    Raises
+    ------
+    PermissionError
+        if the directory in the temporary directory is owned by
+        another user or accessible by others
+
+    '''
+
+    path = os.environ.get('XDG_RUNTIME_DIR')
+    if not path or not os.path.isdir(path):
+        path = os.path.join(tempfile.gettempdir(), 'xbeachmi-%d' % os.getuid())
+        if not os.path.exists(path):
+            os.mkdir(path, 0o700)
+        st = os.lstat(path)
+        if st.st_uid != os.getuid() or st.st_mode & 0o077 or not os.path.isdir(path):
+            raise PermissionError('Directory "%s" is not private to the current user' % path)
+
+    return os.path.join(path, 'xbeachmi.sock')
+
+
+def get_peer_uid(conn):
+    '''Return user id of process connected to Unix socket
+
+    Parameters
+    ----------
+    conn : socket.socket
+        accepted connection
+
+    Returns
+    -------
+    int
+        user id, None if not supported on this platform
+
+    '''
+
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    pid, uid, gid = struct.unpack('3i', creds)
+
+    return uid
+
+
+def connect(path):
+    '''Connect to daemon socket owned by the current user
+
+    Parameters
+    ----------
+    path : str
+        path to Unix socket
+
+    Returns
+    -------
+    socket.socket
+        connection
+
+    Raises
+    ------
+    ConnectionRefusedError, FileNotFoundError
+        if no daemon is listening on the socket
+    PermissionError
+        if the socket is owned by another user
+
+    '''
+
+    if os.stat(path).st_uid != os.getuid():
+        raise PermissionError('Socket "%s" is not owned by the current user' % path)
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except:
+        conn.close()
+        raise
+
+    return conn
+
+
+class SocketHandler(logging.Handler):
+    '''Send log records of a run as JSON lines to the client'''
+
+
+    def __init__(self, fp):
+        logging.Handler.__init__(self)
+        self.fp = fp
+        self.setFormatter(logging.Formatter(FORMAT))
+
+
+    def emit(self, record):
+        try:
+            send(self.fp, {'log' : self.format(record)})
+        except:
+            pass # client disconnected, continue the run
+
+
+def send(fp, message):
+    '''Send message as JSON line
+
+    Parameters
+    ----------
+    fp : file
+        file object of socket connection
+    message : dict
+        message
+
+    '''
+
+    fp.write(json.dumps(message) + '\n')
+    fp.flush()
+
+
+def preload(engines):
+    '''Import modules and load model engine libraries
+
+    Parameters
+    ----------
+    engines : list
+        names of model engines to load, see
+        :func:`xbeachmi.worker.preload_engine`
+
+    Returns
+    -------
+    list
+        uninitialized model engines keeping the libraries loaded
+
+    '''
+
+    t0 = time.time()
+
+    import mako.template
+    import xbeachmi.model
+    import xbeachmi.worker
+    xbeachmi.netcdf.have_netcdf()
+
+    loaded = []
+    for engine in engines:
+        try:
+            loaded.append(xbeachmi.worker.preload_engine(engine))
+        except:
+            logger.warning('Failed to load engine "%s"' % engine)
+            logger.debug(traceback.format_exc())
+
+    logger.info('Loaded modules and engines in %0.3f s' % (time.time() - t0))
+
+    return loaded
+
+
+def serve(path=None, engines=['xbeach'], jobs=None, poll=.1):
+    '''Serve runs submitted to a Unix socket
+
+    The daemon imports all modules and loads the model engine
+    libraries once. Every submitted run is executed in a process
+    forked from the daemon, which inherits the loaded modules and
+    libraries, but not any model state. The instance processes of
+    the run are forked from this process as usual. Back-to-back runs
+    therefore skip interpreter startup, imports and library loading,
+    while each run starts from uninitialized model engines.
+
+    Log messages of a run are sent to the submitting client, see
+    :func:`submit`. The daemon stops on SIGTERM, SIGINT or a stop
+    request, see :func:`stop`, after waiting for active runs.
+
+    The socket is only accessible by the user running the daemon and,
+    where supported, connections of processes of other users are
+    rejected.
+
+    Parameters
+    ----------
+    path : str, optional
+        path to Unix socket, see :func:`get_socket_path`
+    engines : list, optional
+        names of model engines to load
+    jobs : int, optional
+        maximum number of simultaneous runs, defaults to no limit
+    poll : float, optional
+        interval between checks of active runs in seconds
+
+    '''
+
+    if path is None:
+        path = get_socket_path()
+
+    # remove stale socket
+    if os.path.exists(path):
+        try:
+            request(path, {'command' : 'ping'})
+            raise RuntimeError('Daemon already listening on "%s"' % path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+
+    loaded = preload(engines)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+    listener.listen(16)
+    logger.info('Listening on "%s"...' % path)
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, terminate)
+
+    children = {}
+    try:
+        while True:
+
+            # reap finished runs
+            for pid in list(children.keys()):
+                p, status = os.waitpid(pid, os.WNOHANG)
+                if p != 0:
+                    if os.WIFEXITED(status):
+                        code = os.WEXITSTATUS(status)
+                    else:
+                        code = -os.WTERMSIG(status)
+                    logger.info('Run "%s" finished [%d]' % (children.pop(pid), code))
+
+            if jobs is not None and len(children) >= jobs:
+                time.sleep(poll)
+                continue
+
+            r, _, _ = select.select([listener], [], [], poll)
+            if not r:
+                continue
+
+            conn, _ = listener.accept()
+            uid = get_peer_uid(conn)
+            if uid is not None and uid != os.getuid():
+                logger.warning('Rejected connection of user #%d' % uid)
+                conn.close()
+                continue
+
+            fp = conn.makefile('rw')
+            try:
+                req = json.loads(fp.readline())
+            except ValueError:
+                fp.close()
+                conn.close()
+                continue
+
+            if req.get('command') == 'ping':
+                send(fp, {'pid' : os.getpid(), 'active' : list(children.values())})
+            elif req.get('command') == 'stop':
+                send(fp, {'stopping' : True})
+                fp.close()
+                conn.close()
+                break
+            elif 'configfile' in req.keys():
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    code = 1
+                    try:
+                        code = run(fp, req)
+                    finally:
+                        sys.stdout.flush()
+                        sys.stderr.flush()
+                        os._exit(code)
+                logger.info('Run "%s" started [%d]' % (req['configfile'], pid))
+                children[pid] = req['configfile']
+
+            fp.close()
+            conn.close()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        for pid, configfile in children.items():
+            logger.info('Waiting for run "%s"...' % configfile)
+            os.waitpid(pid, 0)
+
+
+def run(fp, req):
+    '''Execute submitted run in forked process
+
+    Parameters
+    ----------
+    fp : file
+        file object of client connection
+    req : dict
+        run request with "configfile", "cwd" and optionally "verbose"
+        and "profile"
+
+    Returns
+    -------
+    int
+        exit code
+
+    '''
+
+    from xbeachmi.model import XBeachMIWrapper
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    logging.root.handlers = [SocketHandler(fp)]
+    logging.root.setLevel(int(req.get('verbose', 30)))
+
+    code = 0
+    try:
+        os.chdir(req['cwd'])
+        XBeachMIWrapper(configfile=req['configfile'],
+                        profile_workers=req.get('profile')).run()
+    except:
+        logger.error(traceback.format_exc())
+        code = 1
+
+    try:
+        send(fp, {'returncode' : code})
+    except:
+        pass
+
+    return code
+
+
+def request(path, message):
+    '''Send request to daemon and return first reply
+
+    Parameters
+    ----------
+    path : str
+        path to Unix socket
+    message : dict
+        request
+
+    Returns
+    -------
+    dict
+        reply
+
+    '''
+
+    conn = connect(path)
+    try:
+        fp = conn.makefile('rw')
+        send(fp, message)
+        return json.loads(fp.readline() or '{}')
+    finally:
+        conn.close()
+
+
+def submit(configfile, path=None, verbose=30, profile=None):
+    '''Submit run to daemon and wait for it to finish
+
+    Log messages of the run are written to the standard error
+    stream.
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+    path : str, optional
+        path to Unix socket, see :func:`get_socket_path`
+    verbose : int, optional
+        logging level of run
+    profile : str, optional
+        directory to write profiles of instance processes to
+
+    Returns
+    -------
+    int
+        exit code of run, 1 if the connection to the daemon is lost
+        during the run
+
+    Raises
+    ------
+    ConnectionRefusedError, FileNotFoundError
+        if no daemon is listening on the socket
+    PermissionError
+        if the socket is owned by another user
+
+    '''
+
+    if path is None:
+        path = get_socket_path()
+
+    conn = connect(path)
+    try:
+        fp = conn.makefile('rw')
+        send(fp, {
+            'configfile' : os.path.abspath(configfile),
+            'cwd' : os.getcwd(),
+            'verbose' : verbose,
+            'profile' : os.path.abspath(profile) if profile else None,
+        })
+        for line in fp:
+            message = json.loads(line)
+            if 'log' in message.keys():
+                sys.stderr.write(message['log'] + '\n')
+            elif 'returncode' in message.keys():
+                return message['returncode']
+    except (socket.error, ValueError):
+        logger.debug(traceback.format_exc())
+    finally:
+        conn.close()
+
+    logger.error('Connection to daemon lost')
+    return 1
+
+
+def stop(path=None):
+    '''Stop daemon
+
+    Parameters
+    ----------
+    path : str, optional
+        path to Unix socket, see :func:`get_socket_path`
+
+    '''
+
+    if path is None:
+        path = get_socket_path()
+
+    request(path, {'command' : 'stop'})
@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import time
+import logging
+import numpy as np
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# layout of the fixed part of the shared memory region: sequence
+# number, simulation time, length of the JSON header and start of the
+# variable data, followed by the JSON header
+SEQUENCE = 0
+TIME = 8
+LENGTH = 16
+DATA = 24
+HEADER = 32
+ALIGN = 64
+
+
+class LivePublisher:
+    '''Publish latest values of variables in shared memory
+
+    The values are stored in a named shared memory region that can be
+    read by other processes on the same node using
+    :class:`LiveReader`, without any file I/O. The region starts with
+    a sequence number, the simulation time and a JSON header
+    describing the offset, shape and data type of each variable.
+
+    The sequence number is used as a seqlock: it is odd while the
+    values are being updated and even otherwise. A reader copies the
+    values and accepts them only if the sequence number was even and
+    unchanged during the copy. The publisher never waits for readers.
+
+    '''
+
+
+    def __init__(self, name, variables, attributes=None):
+        '''Initialize the class
+
+        Creates the shared memory region, replacing a region with the
+        same name left behind by a previous run whose process no
+        longer exists.
+
+        Parameters
+        ----------
+        name : str
+            name of shared memory region
+        variables : dict
+            dictionary with variable names as keys and tuples with
+            shape and data type as values
+        attributes : dict, optional
+            additional items stored in the JSON header
+
+        Raises
+        ------
+        RuntimeError
+            if a region with the same name is published by a running
+            process
+
+        '''
+
+        from multiprocessing import shared_memory
+
+        self.name = name
+
+        header = {'pid' : os.getpid(), 'variables' : {}, 'attributes' : attributes or {}}
+        size = 0
+        for var, (shape, dtype) in sorted(variables.items()):
+            dtype = np.dtype(dtype)
+            header['variables'][var] = {
+                'offset' : size,
+                'shape' : [int(n) for n in shape],
+                'dtype' : dtype.str,
+            }
+            size += int(np.prod(shape)) * dtype.itemsize
+            size += -size % ALIGN
+
+        data = json.dumps(header).encode('utf-8')
+        start = HEADER + len(data)
+        start += -start % ALIGN
+        size = max(start + size, ALIGN)
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = attach(name)
+            try:
+                pid = read_header(stale.buf).get('pid')
+            except (ValueError, UnicodeDecodeError):
+                pid = None # incomplete region of a crashed run
+            stale.close()
+            if pid is not None and pid_exists(pid):
+                raise RuntimeError('Shared memory region "%s" is published by '
+                                   'running process #%d' % (name, pid))
+            logger.warning('Replacing stale shared memory region "%s"' % name)
+            stale = attach(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        buf = self.shm.buf
+        self.sequence = np.ndarray((), dtype='<u8', buffer=buf, offset=SEQUENCE)
+        self.time = np.ndarray((), dtype='<f8', buffer=buf, offset=TIME)
+        np.ndarray((), dtype='<u8', buffer=buf, offset=LENGTH)[...] = len(data)
+        np.ndarray((), dtype='<u8', buffer=buf, offset=DATA)[...] = start
+        buf[HEADER:HEADER+len(data)] = data
+
+        self.arrays = {}
+        for var, props in header['variables'].items():
+            self.arrays[var] = np.ndarray(props['shape'], dtype=props['dtype'],
+                                          buffer=buf, offset=start + props['offset'])
+
+        self.sequence[...] = 0
+        self.time[...] = np.nan
+
+
+    def begin(self):
+        '''Mark start of update
+
+        Returns
+        -------
+        dict
+            dictionary with variable names as keys and shared memory
+            arrays as values, to be filled before calling :func:`end`
+
+        '''
+
+        self.sequence[...] += 1
+        return self.arrays
+
+
+    def end(self, t):
+        '''Mark end of update
+
+        Parameters
+        ----------
+        t : float
+            simulation time of values
+
+        '''
+
+        self.time[...] = t
+        self.sequence[...] += 1
+
+
+    def publish(self, t, values):
+        '''Publish values of variables
+
+        Parameters
+        ----------
+        t : float
+            simulation time of values
+        values : dict
+            dictionary with variable names as keys and values as
+            values
+
+        '''
+
+        arrays = self.begin()
+        for var, value in values.items():
+            np.copyto(arrays[var], value, casting='unsafe')
+        self.end(t)
+
+
+    def close(self):
+        '''Close and remove shared memory region'''
+
+        self.sequence = None
+        self.time = None
+        self.arrays = {}
+        self.shm.close()
+        self.shm.unlink()
+
+
+class LiveReader:
+    '''Read latest values of variables published by a running model
+
+    Example
+    -------
+    >>> with LiveReader('xbeachmi-12345') as reader:
+    ...     t, fields = reader.read(['zs'])
+    ...     t, fields = reader.wait(timeout=10.)
+
+    '''
+
+
+    def __init__(self, name):
+        '''Initialize the class
+
+        Attaches to the shared memory region without taking
+        ownership, such that the region is not removed when the
+        reader exits.
+
+        Parameters
+        ----------
+        name : str
+            name of shared memory region
+
+        '''
+
+        self.shm = attach(name)
+
+        buf = self.shm.buf
+        self.sequence = np.ndarray((), dtype='<u8', buffer=buf, offset=SEQUENCE)
+        self.time = np.ndarray((), dtype='<f8', buffer=buf, offset=TIME)
+        start = int(np.ndarray((), dtype='<u8', buffer=buf, offset=DATA))
+        header = read_header(buf)
+
+        self.attributes = header['attributes']
+        self.arrays = {}
+        for var, props in header['variables'].items():
+            self.arrays[var] = np.ndarray(props['shape'], dtype=props['dtype'],
+                                          buffer=buf, offset=start + props['offset'])
+
+        self.last = 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, errtype, errobj, traceback):
+        self.close()
+
+
+    @property
+    def variables(self):
+        '''Names of published variables'''
+
+        return sorted(self.arrays.keys())
+
+
+    def read(self, variables=None, timeout=1.):
+        '''Read consistent copy of latest values
+
+        Parameters
+        ----------
+        variables : list, optional
+            names of variables, defaults to all published variables
+        timeout : float, optional
+            maximum time in seconds to wait for a consistent copy
+
+        Returns
+        -------
+        t : float
+            simulation time of values, NaN if nothing is published yet
+        fields : dict
+            dictionary with variable names as keys and copies of the
+            values as values
+
+        '''
+
+        if variables is None:
+            variables = self.variables
+
+        t0 = time.time()
+        while True:
+            s1 = int(self.sequence)
+            if s1 % 2 == 0:
+                fields = {var : self.arrays[var].copy() for var in variables}
+                t = float(self.time)
+                if int(self.sequence) == s1:
+                    self.last = s1
+                    return t, fields
+            if time.time() - t0 > timeout:
+                raise RuntimeError('No consistent copy of "%s" within %0.1f s' %
+                                   (self.shm.name, timeout))
+            time.sleep(1e-4)
+
+
+    def wait(self, variables=None, timeout=None, poll=.01):
+        '''Wait for values newer than the last read and read them
+
+        Parameters
+        ----------
+        variables : list, optional
+            names of variables, defaults to all published variables
+        timeout : float, optional
+            maximum time in seconds to wait, defaults to no limit
+        poll : float, optional
+            interval between checks in seconds
+
+        Returns
+        -------
+        t : float
+            simulation time of values
+        fields : dict
+            dictionary with variable names as keys and copies of the
+            values as values, None if timed out
+
+        '''
+
+        t0 = time.time()
+        while int(self.sequence) <= self.last or int(self.sequence) % 2 == 1:
+            if timeout is not None and time.time() - t0 > timeout:
+                return float(self.time), None
+            time.sleep(poll)
+
+        return self.read(variables)
+
+
+    def close(self):
+        '''Detach from shared memory region'''
+
+        self.sequence = None
+        self.time = None
+        self.arrays = {}
+        self.shm.close()
+
+
+def attach(name):
+    '''Attach to shared memory region without taking ownership
+
+    The region is not removed when the attaching process exits.
+
+    Parameters
+    ----------
+    name : str
+        name of shared memory region
+
+    Returns
+    -------
+    multiprocessing.shared_memory.SharedMemory
+        shared memory region
+
+    '''
+
+    from multiprocessing import shared_memory
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except (ImportError, AttributeError):
+        pass
+
+    return shm
+
+
+def read_header(buf):
+    '''Read JSON header of shared memory region
+
+    Parameters
+    ----------
+    buf : memoryview
+        buffer of shared memory region
+
+    Returns
+    -------
+    dict
+        header with the publishing process, variables and attributes
+
+    '''
+
+    n = int(np.ndarray((), dtype='<u8', buffer=buf, offset=LENGTH))
+    return json.loads(bytes(buf[HEADER:HEADER+n]).decode('utf-8'))
+
+
+def pid_exists(pid):
+    '''Return True if a process with the given id exists'''
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # process of other user
+
+    return True
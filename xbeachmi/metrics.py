@@ -0,0 +1,136 @@
+import time
+import json
+import logging
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+class MetricsWriter:
+    '''Writer for machine-readable run metrics
+
+    Periodically appends a JSON record with run metrics to a
+    JSON-lines file. Each record contains the wall clock time,
+    simulation time and progress, the simulation speed overall, since
+    the previous record and per instance, the estimated remaining wall
+    time and any additional metrics returned by the ``collect``
+    callback.
+
+    To keep the overhead per time step negligible, the wall clock is
+    only read every ``sample`` steps and a record is only written if
+    at least ``interval`` seconds passed since the previous record.
+    The simulation time between two records is attributed to the
+    instances running at the time of the latter record.
+
+    '''
+
+
+    def __init__(self, filename, duration, interval=60., sample=10, collect=None):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        filename : str
+            path to JSON-lines file
+        duration : float
+            duration of simulation
+        interval : float, optional
+            minimum wall time between records in seconds
+        sample : int, optional
+            number of steps between checks of the wall clock
+        collect : callable, optional
+            function returning a dict with additional metrics, the
+            key "running" is used to attribute simulation time to
+            instances
+
+        '''
+
+        self.filename = filename
+        self.duration = duration
+        self.interval = interval
+        self.sample = max(1, int(sample))
+        self.collect = collect
+
+        self.n = 0
+        self.start = time.time()
+        self.last_wall = self.start
+        self.last_t = 0.
+        self.instance_time = {}
+        self.instance_wall = {}
+
+        open(self.filename, 'w').close()
+
+
+    def step(self, t):
+        '''Register time step and write record if due
+
+        Parameters
+        ----------
+        t : float
+            current simulation time
+
+        '''
+
+        self.n += 1
+        if self.n % self.sample:
+            return
+
+        now = time.time()
+        if now - self.last_wall >= self.interval:
+            self.write(t, now)
+
+
+    def write(self, t, now=None):
+        '''Write record
+
+        Parameters
+        ----------
+        t : float
+            current simulation time
+        now : float, optional
+            current wall time
+
+        '''
+
+        if now is None:
+            now = time.time()
+
+        fields = self.collect() if self.collect is not None else {}
+
+        elapsed = now - self.start
+        dt_wall = now - self.last_wall
+        dt_sim = t - self.last_t
+
+        # attribute simulation time to running instances
+        for instance in fields.get('running', []):
+            self.instance_time[instance] = self.instance_time.get(instance, 0.) + dt_sim
+            self.instance_wall[instance] = self.instance_wall.get(instance, 0.) + dt_wall
+
+        speed = t / elapsed if elapsed > 0. else 0.
+
+        record = {
+            'wall_time' : now,
+            'elapsed' : elapsed,
+            't' : t,
+            'progress' : min(1., t / self.duration) if self.duration > 0. else 1.,
+            'speed' : speed,
+            'speed_recent' : dt_sim / dt_wall if dt_wall > 0. else 0.,
+            'speed_instances' : {
+                k : self.instance_time[k] / self.instance_wall[k]
+                for k in self.instance_time.keys()
+                if self.instance_wall[k] > 0.
+            },
+            'eta' : (self.duration - t) / speed if speed > 0. else None,
+            'steps' : self.n,
+        }
+        record.update(fields)
+
+        try:
+            with open(self.filename, 'a') as fp:
+                fp.write(json.dumps(record) + '\n')
+        except:
+            logger.warning('Failed to write metrics to "%s"' % self.filename)
+
+        self.last_wall = now
+        self.last_t = t
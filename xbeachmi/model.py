@@ -3,25 +3,185 @@ from __future__  import absolute_import
 import os
 import re
 import json
+import time
 import shutil
+import hashlib
+import signal
 import logging
+import threading
+import cProfile
 import traceback
 import numpy as np
-from mako.template import Template
-from bmi.wrapper import BMIWrapper
 from bmi.api import IBmi
-from multiprocessing import Process, Queue, JoinableQueue
-from Queue import Empty, Full
+
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
 
 import xbeachmi.progress
+import xbeachmi.metrics
+import xbeachmi.resources
 import xbeachmi.netcdf
+import xbeachmi.raw
 import xbeachmi.parsers
+import xbeachmi.worker
+import xbeachmi.profiling
+import xbeachmi.plugins
+import xbeachmi.live
+import xbeachmi.scratch
 
 
 # initialize log
 logger = logging.getLogger(__name__)
 
 
+# numpy data types corresponding to BMI variable types
+DTYPES = {
+    'double' : 'float64',
+    'float' : 'float32',
+    'real' : 'float32',
+    'int' : 'int32',
+    'integer' : 'int32',
+    'long' : 'int64',
+    'bool' : 'bool',
+    'logical' : 'bool',
+}
+
+# CF cell methods of ensemble statistics
+ENSEMBLE_METHODS = {
+    'mean' : 'realization: mean',
+    'std' : 'realization: standard_deviation',
+    'min' : 'realization: minimum',
+    'max' : 'realization: maximum',
+}
+
+# model engine functions that may write files, executed in the
+# working directory of an in-process engine
+FILE_CALLS = ['update', 'update_until', 'finalize']
+
+
+def sync_directory(src, dst, ignore=None, keep=None, delete=True):
+    '''Synchronize directory with source directory
+
+    Files are only copied if they do not exist in the destination
+    directory or differ in size or content. Files with the same size
+    and modification time are assumed to have the same content. Unless
+    ``delete`` is False, files and directories in the destination
+    directory that do not exist in the source directory are removed,
+    except for the files listed in ``keep``.
+
+    Parameters
+    ----------
+    src : str
+        path to source directory
+    dst : str
+        path to destination directory
+    ignore : callable, optional
+        function returning the names of files to be ignored, see
+        :func:`shutil.copytree`
+    keep : list, optional
+        names of files in the destination directory to be left alone
+    delete : bool, optional
+        remove obsolete files from the destination directory
+
+    '''
+
+    if keep is None:
+        keep = []
+
+    if not os.path.exists(dst):
+        os.makedirs(dst)
+
+    files = os.listdir(src)
+    if ignore is not None:
+        ignored = ignore(src, files)
+        files = [f for f in files if f not in ignored]
+
+    # remove obsolete files
+    for f in os.listdir(dst) if delete else []:
+        if f not in files and f not in keep:
+            path = os.path.join(dst, f)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    # copy new and modified files
+    for f in files:
+        srcpath = os.path.join(src, f)
+        dstpath = os.path.join(dst, f)
+        if os.path.isdir(srcpath):
+            sync_directory(srcpath, dstpath, ignore=ignore, delete=delete)
+        elif f not in keep:
+            if os.path.exists(dstpath):
+                s1 = os.stat(srcpath)
+                s2 = os.stat(dstpath)
+                if s1.st_size == s2.st_size:
+                    if s1.st_mtime_ns == s2.st_mtime_ns:
+                        continue
+                    if same_content(srcpath, dstpath):
+                        shutil.copystat(srcpath, dstpath)
+                        continue
+            shutil.copy2(srcpath, dstpath)
+
+
+def same_content(file1, file2):
+    '''Check if two files exist and have the same contents
+
+    Parameters
+    ----------
+    file1, file2 : str
+        paths to files
+
+    Returns
+    -------
+    bool
+        True if both files exist and have the same contents
+
+    '''
+
+    if not os.path.exists(file1) or not os.path.exists(file2):
+        return False
+    if os.path.getsize(file1) != os.path.getsize(file2):
+        return False
+    with open(file1, 'rb') as fp1, open(file2, 'rb') as fp2:
+        return fp1.read() == fp2.read()
+
+
+def write_if_changed(filename, contents):
+    '''Write text file unless it exists with the same contents
+
+    The MD5 hash of the contents is compared with the hash of the
+    existing file, such that unchanged files keep their modification
+    time.
+
+    Parameters
+    ----------
+    filename : str
+        path to file
+    contents : str
+        file contents
+
+    Returns
+    -------
+    bool
+        True if the file is written
+
+    '''
+
+    data = contents.encode('utf-8')
+    if os.path.exists(filename):
+        with open(filename, 'rb') as fp:
+            if hashlib.md5(fp.read()).digest() == hashlib.md5(data).digest():
+                return False
+
+    with open(filename, 'wb') as fp:
+        fp.write(data)
+
+    return True
+
+
 class XBeachMIWrapper:
     '''XBeachMIWrapper class
 
@@ -30,8 +190,11 @@ class XBeachMIWrapper:
 
     '''
 
+
+    plugins = []
+
     
-    def __init__(self, configfile=None):
+    def __init__(self, configfile=None, profile_workers=None):
         '''Initialize the class
 
         Parameters
@@ -39,28 +202,224 @@ class XBeachMIWrapper:
         configfile : str
             path to JSON configuration file, see
             :func:`~beachmi.model.XBeachMI.load_configfile`
+        profile_workers : str, optional
+            directory to write profiles of instance processes to
 
         '''
 
         self.configfile = configfile
+        self.profile_workers = profile_workers
 
 
     def run(self):
         '''Start model time loop'''
 
-        with XBeachMI(configfile=self.configfile) as self.engine:
+        with XBeachMI(configfile=self.configfile,
+                      profile_workers=self.profile_workers) as self.engine:
 
             self.t = 0
             self.progress = xbeachmi.progress.ProgressIndicator(
                 duration=self.engine.get_end_time()
             )
 
+            self.plugins_init()
             self.output_init()
-            while self.t < self.progress.duration:
-                self.progress.progress(self.t)
-                self.engine.update()
-                self.t = self.engine.get_current_time()
-                self.output()
+            self.metrics_init()
+            self.telemetry_init()
+            self.live_init()
+            try:
+                while self.t < self.progress.duration:
+                    self.progress.progress(self.t)
+                    self.telemetry()
+                    self.engine.update()
+                    self.t = self.engine.get_current_time()
+                    self.output()
+                    self.run_plugins()
+                    self.live()
+                    self.stage()
+                    if self.metrics is not None:
+                        self.metrics.step(self.t)
+            finally:
+                if self.publisher is not None:
+                    self.publisher.close()
+
+            if self.metrics is not None:
+                self.metrics.write(self.t)
+
+            for p in self.plugins:
+                p['plugin'].finalize()
+
+
+    def metrics_init(self):
+        '''Initialize run metrics stream
+
+        Creates a JSON-lines file with run metrics if the "metrics"
+        entry is given in the configuration file:
+
+        .. code-block:: json
+
+           "metrics" : {
+               "file" : "metrics.jsonl",
+               "interval" : 60,
+               "sample" : 10
+           }
+
+        See :class:`~xbeachmi.metrics.MetricsWriter` for details.
+
+        '''
+
+        self.metrics = None
+
+        if 'metrics' in self.engine.config.keys():
+            cfg = self.engine.config['metrics']
+            self.metrics = xbeachmi.metrics.MetricsWriter(
+                cfg.get('file', 'metrics.jsonl'),
+                duration=self.progress.duration,
+                interval=cfg.get('interval', 60.),
+                sample=cfg.get('sample', 10),
+                collect=self.collect_metrics)
+
+
+    def telemetry_init(self):
+        '''Initialize resource telemetry
+
+        Resource usage of the coordinator and all instance processes
+        is logged at the wall clock interval given by the "interval"
+        item of the "telemetry" entry in the configuration file and
+        summarized upon finalization:
+
+        .. code-block:: json
+
+           "telemetry" : {
+               "interval" : 300
+           }
+
+        '''
+
+        self.telemetry_interval = None
+        self.telemetry_last = time.time()
+
+        if 'telemetry' in self.engine.config.keys():
+            self.telemetry_interval = \
+                self.engine.config['telemetry'].get('interval', 300.)
+
+
+    def telemetry(self):
+        '''Log resource usage if telemetry interval has passed'''
+
+        if self.telemetry_interval is None:
+            return
+
+        if time.time() - self.telemetry_last > self.telemetry_interval:
+            for line in xbeachmi.resources.format_resources(
+                    self.engine.get_resources()):
+                logger.info(line)
+            self.telemetry_last = time.time()
+
+
+    def live_init(self):
+        '''Initialize live view of latest fields
+
+        Publishes the latest values of the variables listed in the
+        "live" entry in the configuration file in a named shared
+        memory region, such that viewers on the same node can read
+        the current fields without file I/O using
+        :class:`~xbeachmi.live.LiveReader`:
+
+        .. code-block:: json
+
+           "live" : {
+               "name" : "xbeachmi",
+               "variables" : ["zs", "zb"],
+               "interval" : 0
+           }
+
+        The values are published every "interval" seconds of
+        simulation time, or every time step if zero. The region is
+        named "xbeachmi-<pid>" if no "name" is given, such that
+        concurrent runs do not collide. See
+        :class:`~xbeachmi.live.LivePublisher` for details.
+
+        '''
+
+        self.publisher = None
+
+        if 'live' in self.engine.config.keys():
+            cfg = self.engine.config['live']
+            variables = {}
+            for var in cfg['variables']:
+                if var not in self.engine.subsets.keys():
+                    self.engine.register_buffer(var)
+                variables[var] = (self.engine.get_var_shape(var),
+                                  self.engine.get_var_dtype(var))
+            try:
+                self.publisher = xbeachmi.live.LivePublisher(
+                    cfg.get('name', 'xbeachmi-%d' % os.getpid()), variables,
+                    attributes={'pid' : os.getpid(),
+                                'configfile' : self.engine.configfile,
+                                'instances' : sorted(self.engine.instances.keys())})
+                logger.info('Publishing live fields to shared memory region "%s"' %
+                            self.publisher.name)
+            except ImportError:
+                logger.warning('Shared memory not available, live view disabled')
+            self.live_interval = cfg.get('interval', 0)
+
+
+    def live(self):
+        '''Publish latest fields if live interval has passed'''
+
+        if self.publisher is None:
+            return
+
+        if self.live_interval > 0 and \
+           not self.progress.check_period(self.t, self.live_interval):
+            return
+
+        arrays = self.publisher.begin()
+        try:
+            for var, out in arrays.items():
+                self.engine.get_var(var, out=out)
+        finally:
+            self.publisher.end(self.t)
+
+
+    def stage(self):
+        '''Copy back results from scratch directory if interval has passed
+
+        See :class:`~xbeachmi.scratch.ScratchDirectory`.
+
+        '''
+
+        scratch = self.engine.scratch
+        if scratch is None or not scratch.interval:
+            return
+
+        if self.progress.check_period(self.t, scratch.interval):
+            scratch.stage()
+
+
+    def collect_metrics(self):
+        '''Collect run metrics from wrapper and engine
+
+        Returns
+        -------
+        dict
+            dictionary with run metrics
+
+        '''
+
+        return {
+            'running' : list(self.engine.running),
+            'segment' : self.engine.next_index - 1
+                        if 'scenario' in self.engine.config.keys() else None,
+            'switches' : self.engine.switches,
+            'aggregations' : self.engine.aggregations,
+            'exchange_bytes' : self.engine.exchange_bytes,
+            'output_writes' : self.output_count,
+            'output_latency' : self.output_time / self.output_count
+                               if self.output_count > 0 else 0.,
+            'resources' : self.engine.resources,
+        }
 
 
     def output_init(self):
@@ -70,27 +429,168 @@ class XBeachMIWrapper:
         dimensions, variables, attributes and coordinate reference
         system specification (crs).
 
+        Output variables may be written at their own interval using
+        the "intervals" entry and may be limited to a part of the
+        domain using the "subset" entry in the netCDF configuration:
+
+        .. code-block:: json
+
+           "netcdf" : {
+               "outputvars" : ["zb", "zs", "H"],
+               "interval" : 3600,
+               "intervals" : {"zs" : 60},
+               "subset" : {
+                   "zb" : {"bbox" : [0, 0, 1000, 500], "stride" : 2},
+                   "zs" : {"points" : [[250, 0], [500, 0]]},
+                   "H" : {"transect" : [[0, 0], [1000, 0]]}
+               }
+           }
+
+        See :func:`read_subset` for the available subset options.
+
+        If "format" is "raw" in the netCDF configuration, the output
+        is written as memory mappable raw binary files to the
+        directory given by "outputfile" instead, see
+        :mod:`xbeachmi.raw`.
+
+        If "per_instance" is true in the netCDF configuration, the
+        output variables get an additional "realization" dimension,
+        labelled by the "instance_name" variable, and the values of
+        each running instance are stored separately, rather than the
+        aggregated values.
+
+        Variables listed in the "ensemble" entry are written as
+        statistics across the running instances instead, i.e. the
+        mean, standard deviation, minimum, maximum and optional
+        percentiles, named "<var>_mean", "<var>_std", "<var>_min",
+        "<var>_max" and "<var>_p<percentile>":
+
+        .. code-block:: json
+
+           "netcdf" : {
+               "outputvars" : ["zb", "H"],
+               "ensemble" : {
+                   "variables" : ["zb"],
+                   "percentiles" : [5, 50, 95]
+               }
+           }
+
+        Time series of in-situ analysis plugins that write to the
+        netCDF file are added with their own time dimension, see
+        :func:`plugins_init`.
+
         '''
 
+        self.output_count = 0
+        self.output_time = 0.
+
         if 'netcdf' in self.engine.config.keys():
 
             logger.debug('Initializing output...')
         
             cfg = self.engine.config['netcdf']
 
+            # select output backend
+            if cfg.get('format', 'netcdf4') == 'raw':
+                self.writer = xbeachmi.raw
+            else:
+                self.writer = xbeachmi.netcdf
+
             # get dimension names for each variable
             variables = {
                 v : { 'dimensions' : self.engine.get_dimensions(v) }
                 for v in cfg['outputvars']
             }
+            shapes = {
+                v : self.engine.get_var_shape(v)
+                for v in cfg['outputvars']
+            }
+            dimensions = self.read_dimensions()
+
+            # add dimensions for subsets
+            self.subsets = {}
+            for v, subset in cfg.get('subset', {}).items():
+                self.subsets[v] = self.read_subset(v, subset,
+                                                   variables[v]['dimensions'][1:],
+                                                   shapes[v],
+                                                   dimensions)
+                variables[v]['dimensions'] = (u'time',) + self.subsets[v]['dimensions']
+                variables.update(self.subsets[v]['variables'])
+                shapes[v] = self.subsets[v]['shape']
+
+            # group variables by output interval
+            self.intervals = {cfg['interval'] : []}
+            self.times = {cfg['interval'] : u'time'}
+            for v in cfg['outputvars']:
+                interval = cfg.get('intervals', {}).get(v, cfg['interval'])
+                if interval not in self.intervals.keys():
+                    self.intervals[interval] = []
+                    self.times[interval] = u'time_%g' % interval
+                self.intervals[interval].append(v)
+                variables[v]['dimensions'] = (self.times[interval],) + \
+                                             tuple(variables[v]['dimensions'][1:])
+
+            # replace ensemble variables by statistics
+            self.ensemble = {}
+            percentiles = cfg.get('ensemble', {}).get('percentiles', [])
+            for v in cfg.get('ensemble', {}).get('variables', []):
+                self.ensemble[v] = {
+                    'stack' : np.zeros((len(self.engine.instances),) + tuple(shapes[v]),
+                                       dtype=self.engine.get_var_dtype(v)),
+                    'stats' : ['mean', 'std', 'min', 'max'] + ['p%g' % q for q in percentiles],
+                    'percentiles' : percentiles,
+                    'quantiles' : np.zeros((len(percentiles),) + tuple(shapes[v])),
+                }
+                props = variables.pop(v)
+                for stat in self.ensemble[v]['stats']:
+                    variables['%s_%s' % (v, stat)] = {
+                        'dimensions' : props['dimensions'],
+                        'cell_methods' : ENSEMBLE_METHODS.get(stat, ''),
+                    }
+
+            # add realization dimension
+            self.per_instance = cfg.get('per_instance', False)
+            if self.per_instance:
+                instances = list(self.engine.instances.keys())
+                for v in cfg['outputvars']:
+                    if v in self.ensemble.keys():
+                        continue
+                    dims = variables[v]['dimensions']
+                    variables[v]['dimensions'] = (dims[0], u'realization') + tuple(dims[1:])
+                    shapes[v] = (len(instances),) + tuple(shapes[v])
+            else:
+                instances = None
+
+            # add time series of plugins
+            times = [t for t in self.times.values() if t != u'time']
+            for p in self.plugins:
+                if p['timedim'] is None:
+                    continue
+                dimensions.update(p['dimensions'])
+                for output, dims in p['outputs'].items():
+                    variables[p['names'][output]] = {
+                        'dimensions' : (p['timedim'],) + dims
+                    }
+                times.append(p['timedim'])
+
+            # preallocate output buffers using cached shapes
+            self.buffers = {}
+            for v in cfg['outputvars']:
+                if v in self.ensemble.keys():
+                    for stat in self.ensemble[v]['stats']:
+                        self.buffers['%s_%s' % (v, stat)] = np.zeros(shapes[v], dtype='float32')
+                else:
+                    self.buffers[v] = np.zeros(shapes[v], dtype='float32')
         
-            xbeachmi.netcdf.initialize(cfg['outputfile'],
-                                       self.read_dimensions(),
+            self.writer.initialize(cfg['outputfile'],
+                                       dimensions,
                               variables=variables,
                               attributes=cfg['attributes'],
-                              crs=cfg['crs'])
+                              crs=cfg['crs'],
+                              times=times,
+                              instances=instances)
 
-        self.iout = 0
+            self.iout = {t : 0 for t in list(self.times.values()) + times}
 
         
     def output(self):
@@ -100,20 +600,460 @@ class XBeachMIWrapper:
             
             cfg = self.engine.config['netcdf']
 
-            if self.progress.check_period(self.t, cfg['interval']):
+            for interval, outputvars in self.intervals.items():
+
+                if not self.progress.check_period(self.t, interval):
+                    continue
+
+                t0 = time.time()
 
-                logger.debug('Writing output at t=%0.2f...' % self.t)
+                timedim = self.times[interval]
+
+                logger.debug('Writing output at t=%0.2f to "%s"...' % (self.t, timedim))
                 
                 # get dimension data for each variable
-                variables = {v : self.engine.get_var(v) for v in cfg['outputvars']}
-                variables['time'] = self.t
-                variables['instance'] = ', '.join(self.engine.running)
+                variables = {}
+                for v in outputvars:
+                    if v in self.ensemble.keys():
+                        variables.update(self.ensemble_output_var(v))
+                        continue
+                    elif self.per_instance:
+                        self.gather_output_var(v, self.buffers[v])
+                    elif v not in self.subsets.keys():
+                        self.engine.get_var(v, out=self.buffers[v])
+                    else:
+                        np.copyto(self.buffers[v], self.get_output_var(v), casting='unsafe')
+                    variables[v] = self.buffers[v]
+                variables[timedim] = self.t
+                if timedim == u'time':
+                    variables['instance'] = ', '.join(self.engine.running)
         
-                xbeachmi.netcdf.append(cfg['outputfile'],
-                                       idx=self.iout,
-                                       variables=variables)
+                self.writer.append(cfg['outputfile'],
+                                       idx=self.iout[timedim],
+                                       variables=variables,
+                                       time=timedim)
+
+                self.iout[timedim] += 1
+                self.output_count += 1
+                self.output_time += time.time() - t0
+
+
+    def get_output_var(self, var, instances=None):
+        '''Get output variable, or a subset of it, from the engine
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instances : list, optional
+            names of instances to get variable from, defaults to
+            running instances
+
+        Returns
+        -------
+        np.ndarray
+            variable data
+
+        '''
+
+        if var in self.subsets.keys():
+            subset = self.subsets[var]
+            if 'index' in subset.keys():
+                return self.engine.get_var_index(var, subset['index'],
+                                                 instances=instances)
+            else:
+                return self.engine.get_var_slice(var,
+                                                 subset['start'],
+                                                 subset['count'],
+                                                 subset['stride'],
+                                                 instances=instances)
+        else:
+            return self.engine.get_var(var, instances=instances)
+
+
+    def gather_output_var(self, var, out):
+        '''Gather output variable of all running instances
+
+        Stores the values of each running instance in the
+        corresponding row of a preallocated stacked buffer, gathered
+        concurrently using :func:`~xbeachmi.model.XBeachMI.get_var_all`.
+        Rows of instances that are not running are filled with NaN
+        values.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        out : np.ndarray
+            stacked buffer with instances along the first axis
+
+        '''
+
+        instances = []
+        rows = []
+        for i, instance in enumerate(self.engine.instances.keys()):
+            if instance not in self.engine.running:
+                out[i] = np.nan
+            else:
+                instances.append(instance)
+                rows.append(out[i])
+
+        self.engine.get_var_all(var, instances=instances, out=rows,
+                                subset=self.subsets.get(var))
+
+
+    def ensemble_output_var(self, var):
+        '''Compute statistics of output variable across running instances
+
+        The values of all running instances are gathered concurrently
+        in a preallocated stacked buffer, after which each statistic is
+        computed in a single vectorized pass along the instance axis
+        directly into its output buffer. Percentiles are computed last,
+        since they reorder the stacked buffer in place.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+
+        Returns
+        -------
+        dict
+            dictionary with names of statistics variables as keys and
+            output buffers as values
+
+        '''
+
+        ensemble = self.ensemble[var]
+
+        n = len(self.engine.running)
+        x = self.engine.get_var_all(var, instances=list(self.engine.running),
+                                    out=ensemble['stack'][:n],
+                                    subset=self.subsets.get(var))
+
+        buffers = {stat : self.buffers['%s_%s' % (var, stat)] for stat in ensemble['stats']}
+        np.mean(x, axis=0, dtype=np.float64, out=buffers['mean'])
+        np.std(x, axis=0, dtype=np.float64, out=buffers['std'])
+        np.min(x, axis=0, out=buffers['min'])
+        np.max(x, axis=0, out=buffers['max'])
+        if len(ensemble['percentiles']) > 0:
+            p = np.percentile(x, ensemble['percentiles'], axis=0,
+                              out=ensemble['quantiles'], overwrite_input=True)
+            for q, values in zip(ensemble['percentiles'], p):
+                np.copyto(buffers['p%g' % q], values, casting='unsafe')
+
+        return {'%s_%s' % (var, stat) : buf for stat, buf in buffers.items()}
+
+
+    def plugins_init(self):
+        '''Initialize in-situ analysis plugins
+
+        Plugins reduce model fields to small time series while the
+        model is running, such that the full fields do not need to
+        be written to the output file. Plugins are listed in the
+        "plugins" entry in the configuration file:
+
+        .. code-block:: json
+
+           "plugins" : [
+               {
+                   "class" : "shoreline",
+                   "name" : "shoreline",
+                   "interval" : 3600,
+                   "options" : {"level" : 0}
+               },
+               {
+                   "class" : "max_runup",
+                   "interval" : 600,
+                   "sample" : 0,
+                   "output" : "csv",
+                   "file" : "runup.csv"
+               }
+           ]
+
+        The "class" entry is either the name of a built-in plugin or
+        the full path of a subclass of
+        :class:`~xbeachmi.plugins.Plugin`, see
+        :mod:`xbeachmi.plugins`. Outputs are computed every
+        "interval" seconds and, if given, fields are sampled every
+        "sample" seconds in between, or every time step if zero.
+
+        Outputs are written to the netCDF file as variables named
+        "<name>_<output>" with time dimension "time_<name>" if
+        "output" is "netcdf", which is the default if netCDF output
+        is configured, or to the CSV file given by "file" otherwise.
+
+        '''
+
+        self.plugins = []
+        self.plugin_buffers = {}
+
+        if 'plugins' not in self.engine.config.keys():
+            return
+
+        dimensions = self.read_dimensions()
+        sizes = {dim : len(values) for dim, values in dimensions.items()}
+
+        for cfg in self.engine.config['plugins']:
+            plugin = xbeachmi.plugins.load_plugin(cfg, dimensions['x'], dimensions['y'])
+
+            # prefix plugin specific dimensions with plugin name
+            dims = plugin.get_dimensions()
+            outputs = {}
+            for output, d in plugin.get_outputs().items():
+                outputs[output] = tuple([u'%s_%s' % (plugin.name, dim)
+                                         if dim in dims.keys() else u'%s' % dim
+                                         for dim in d])
+            dims = {u'%s_%s' % (plugin.name, dim) : values for dim, values in dims.items()}
+
+            fmt = cfg.get('output', 'netcdf' if 'netcdf' in self.engine.config.keys() else 'csv')
+            if fmt == 'netcdf' and 'netcdf' not in self.engine.config.keys():
+                logger.warning('No netCDF output configured, writing plugin "%s" '
+                               'to CSV file' % plugin.name)
+                fmt = 'csv'
+
+            p = {
+                'plugin' : plugin,
+                'interval' : cfg['interval'],
+                'sample' : cfg.get('sample'),
+                'dimensions' : dims,
+                'outputs' : outputs,
+                'names' : {output : '%s_%s' % (plugin.name, output) for output in outputs},
+                'timedim' : None,
+                'writer' : None,
+            }
+            if fmt == 'netcdf':
+                p['timedim'] = u'time_%s' % plugin.name
+            else:
+                sizes.update({dim : len(values) for dim, values in dims.items()})
+                p['writer'] = xbeachmi.plugins.CSVWriter(
+                    cfg.get('file', '%s.csv' % plugin.name), outputs, sizes)
+            self.plugins.append(p)
+
+            # register receive buffers for fields
+            for var in plugin.variables:
+                if var in self.plugin_buffers.keys():
+                    continue
+                if var not in self.engine.subsets.keys():
+                    self.engine.register_buffer(var)
+                self.plugin_buffers[var] = np.zeros(self.engine.get_var_shape(var),
+                                                    dtype=self.engine.get_var_dtype(var))
+
+
+    def run_plugins(self):
+        '''Sample fields and write outputs of in-situ analysis plugins'''
+
+        for p in self.plugins:
+
+            sample = p['sample'] is not None and \
+                     (p['sample'] == 0 or self.progress.check_period(self.t, p['sample']))
+            compute = self.progress.check_period(self.t, p['interval'])
+            if not sample and not compute:
+                continue
+
+            plugin = p['plugin']
+            fields = self.get_plugin_fields(plugin.variables)
+
+            if not compute:
+                plugin.sample(self.t, fields)
+                continue
+
+            logger.debug('Computing plugin "%s" at t=%0.2f...' % (plugin.name, self.t))
+
+            values = plugin.compute(self.t, fields)
+            if p['writer'] is not None:
+                p['writer'].append(self.t, values)
+            else:
+                timedim = p['timedim']
+                variables = {p['names'][output] : value for output, value in values.items()}
+                variables[timedim] = self.t
+                self.writer.append(self.engine.config['netcdf']['outputfile'],
+                                   idx=self.iout[timedim],
+                                   variables=variables,
+                                   time=timedim)
+                self.iout[timedim] += 1
+
+
+    def get_plugin_fields(self, variables):
+        '''Get read-only fields for in-situ analysis plugins
+
+        If a single instance is running, the fields are views on the
+        receive buffers of the instance, or on the model engine
+        memory of the in-process instance, such that no data is
+        copied. Otherwise the fields are aggregated into
+        preallocated buffers.
+
+        Parameters
+        ----------
+        variables : list
+            names of variables
+
+        Returns
+        -------
+        dict
+            dictionary with variable names as keys and read-only
+            arrays as values, only valid until the next call to the
+            engine
+
+        '''
+
+        running = self.engine.running
+        if type(running) is not list:
+            running = [running]
+
+        fields = {}
+        for var in variables:
+            if len(running) == 1:
+                val = self.engine._get_var_buffered(var, running[0])
+            else:
+                val = self.engine.get_var(var, out=self.plugin_buffers[var])
+            val = np.asarray(val).view()
+            val.flags.writeable = False
+            fields[var] = val
+
+        return fields
+
+
+    def read_subset(self, var, subset, dims, shape, dimensions):
+        '''Read subset specification of output variable
+
+        A subset is specified by either:
+
+        * "start" and "count": start index and number of elements
+          along each axis of the variable
+        * "bbox": bounding box [xmin, ymin, xmax, ymax] in world
+          coordinates
+        * "points": list of [x, y] world coordinates, each mapped to
+          the nearest grid cell
+        * "transect": list of [x, y] world coordinates of the
+          transect vertices, mapped to all grid cells along the
+          transect
+
+        Rectangular subsets may be combined with a "stride", either a
+        step size for each axis or a single step size for the x and y
+        axes. Point and transect cell indices are computed once and
+        only the values in these cells are retrieved from the
+        running instance. Cell mapping assumes a rectilinear grid.
+
+        Additional dimensions needed for the subset are added to the
+        ``dimensions`` dictionary.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        subset : dict
+            subset specification
+        dims : tuple
+            dimension names of variable, excluding time
+        shape : tuple
+            shape of variable
+        dimensions : dict
+            dictionary with dimension variables
+
+        Returns
+        -------
+        dict
+            subset with dimension names, shape and either start, count
+            and stride or flat indices
+
+        '''
 
-                self.iout += 1
+        dims = tuple(dims)
+        x = np.asarray(dimensions.get('x', []), dtype='float')
+        y = np.asarray(dimensions.get('y', []), dtype='float')
+
+        if 'points' in subset.keys() or 'transect' in subset.keys():
+
+            if 'x' not in dims or 'y' not in dims:
+                raise ValueError('Point output requires x and y dimensions [%s]' % var)
+
+            if 'points' in subset.keys():
+                points = np.asarray(subset['points'], dtype='float')
+            else:
+                # sample transect at grid resolution
+                vertices = np.asarray(subset['transect'], dtype='float')
+                ds = min([np.min(np.abs(np.diff(c))) for c in (x, y) if len(c) > 1] or [1.])
+                points = []
+                for p0, p1 in zip(vertices[:-1], vertices[1:]):
+                    n = int(np.ceil(np.sqrt(np.sum((p1 - p0)**2)) / ds)) + 1
+                    points.extend(np.linspace(0., 1., n)[:,np.newaxis] * (p1 - p0) + p0)
+                points = np.asarray(points)
+
+            # map points to nearest grid cells, keep unique cells in order
+            cells = []
+            for px, py in points:
+                cell = (int(np.argmin(np.abs(y - py))),
+                        int(np.argmin(np.abs(x - px))))
+                if cell not in cells:
+                    cells.append(cell)
+            jj, ii = np.asarray(cells).T
+
+            # replace x and y dimensions by point dimension
+            pdim = u'points_%s' % var
+            dimensions[pdim] = np.arange(len(cells))
+            outdims = tuple([pdim if d == 'y' else d for d in dims if d != 'x'])
+
+            # precompute flat indices in variable
+            arrays = []
+            for d, n in zip(dims, shape):
+                if d == 'y':
+                    a, k = jj, outdims.index(pdim)
+                elif d == 'x':
+                    a, k = ii, outdims.index(pdim)
+                else:
+                    a, k = np.arange(n), outdims.index(d)
+                s = [1] * len(outdims)
+                s[k] = -1
+                arrays.append(a.reshape(s))
+            index = np.ravel_multi_index(np.broadcast_arrays(*arrays), shape)
+
+            return {
+                'dimensions' : outdims,
+                'shape' : index.shape,
+                'index' : index,
+                'variables' : {
+                    u'x_%s' % pdim : {'dimensions' : (pdim,), 'values' : x[ii]},
+                    u'y_%s' % pdim : {'dimensions' : (pdim,), 'values' : y[jj]},
+                },
+            }
+
+        start = list(subset.get('start', [0] * len(dims)))
+        count = list(subset.get('count', shape))
+        stride = subset.get('stride', 1)
+        if type(stride) is not list:
+            stride = [stride if d in ('x', 'y') else 1 for d in dims]
+
+        if 'bbox' in subset.keys():
+            xmin, ymin, xmax, ymax = subset['bbox']
+            for d, c, lo, hi in (('x', x, xmin, xmax), ('y', y, ymin, ymax)):
+                if d in dims:
+                    k = dims.index(d)
+                    idx = np.where((c >= lo) & (c <= hi))[0]
+                    if len(idx) == 0:
+                        raise ValueError('Bounding box contains no grid cells [%s]' % var)
+                    start[k] = int(idx[0])
+                    count[k] = int(idx[-1] - idx[0]) // stride[k] + 1
+        elif 'count' not in subset.keys():
+            count = [(n - i - 1) // k + 1 for n, i, k in zip(shape, start, stride)]
+
+        # add dimensions for cropped axes
+        outdims = []
+        for d, i, n, k in zip(dims, start, count, stride):
+            if i > 0 or k > 1 or n < len(dimensions[d]):
+                name = u'%s_%s' % (d, var)
+                dimensions[name] = np.asarray(dimensions[d])[i:i+n*k:k]
+                d = name
+            outdims.append(d)
+
+        return {
+            'dimensions' : tuple(outdims),
+            'shape' : tuple(count),
+            'start' : start,
+            'count' : count,
+            'stride' : stride,
+            'variables' : {},
+        }
 
 
     def read_dimensions(self):
@@ -122,7 +1062,8 @@ class XBeachMIWrapper:
         Parses individual model engine configuration files and read
         information regarding the dimensions of the composite domain,
         like the bathymetric grid, number of sediment fractions and
-        number of bed layers.
+        number of bed layers. Dimensions other than x and y are taken
+        from :attr:`XBeachMI.dimension_sizes`.
 
         Returns
         -------
@@ -148,6 +1089,11 @@ class XBeachMIWrapper:
             dimensions['x'] = []
             dimensions['y'] = []
 
+        # other dimensions, like fractions, layers and theta
+        for k, n in self.engine.dimension_sizes.items():
+            if k not in dimensions.keys():
+                dimensions[k] = np.arange(n)
+
         # ensure lists
         for k, v in dimensions.items():
             try:
@@ -190,11 +1136,22 @@ class XBeachMI(IBmi):
     next_index = 0
     next_aggegation = 0.
     data = {}
+    metadata = {}
+    dimension_sizes = {}
+    profiler = None
+    tracer = None
+    inprocess = None
+    scratch = None
+    buffers = {}
+    switches = 0
+    aggregations = 0
+    exchange_bytes = 0
+    resources = None
     
     dzmax = 0.05            # maximum bed level change per time step
     
 
-    def __init__(self, configfile=''):
+    def __init__(self, configfile='', profile_workers=None):
         '''Initialize class
 
         Parameters
@@ -202,10 +1159,25 @@ class XBeachMI(IBmi):
         configfile : str
             path to JSON configuration file, see
             :func:`~xbeach-mi.model.XBeachMI.load_configfile`
+        profile_workers : str, optional
+            directory to write profiles of instance processes to,
+            profiling is disabled if not given
 
         '''
         
         self.configfile = configfile
+        self.running = []
+        self.instances = {}
+        self.data = {}
+        self.stacks = {}
+        self.metadata = {}
+        self.dimension_sizes = {}
+        self.inprocess = None
+        self.scratch = None
+        self.buffers = {}
+        self.profile_workers = None
+        if profile_workers:
+            self.profile_workers = os.path.abspath(profile_workers)
         self.load_configfile()
 
 
@@ -245,7 +1217,80 @@ class XBeachMI(IBmi):
         template. These variables refer to the absolute model
         execution path, the absolute path to the rendered params.txt
         file and the absolute path to the params.txt template file
-        used.
+        used. Additional variables can be defined in the "markers"
+        entry of the configuration file, for example by a parameter
+        sweep (see :mod:`xbeachmi.sweep`):
+
+        .. code-block:: json
+
+           "markers": {"morfac": 10, "site": "egmond"}
+
+        The "engine" entry selects the model engine. It defaults to
+        "xbeach", the name of the BMI compatible XBeach library. The
+        value "synthetic" selects the NumPy stand-in model
+        :class:`~xbeachmi.synthetic.SyntheticModel`, which requires
+        no compiled library.
+
+        The "exchange" entry may also be a dictionary with variable
+        names as keys and either null or a subset as values. A subset
+        specifies the start index and number of elements along each
+        axis of the variable. Only the subset is then aggregated and
+        exchanged between instances:
+
+        .. code-block:: json
+
+           "exchange": {
+               "zb": null,
+               "zs": {"start": [0, 0], "count": [1, 10]}
+           }
+
+        Similarly, the "netcdf" entry may contain a "subset" entry
+        with variable names as keys and subsets as values to write
+        only part of an output variable.
+
+        Calls between the coordinator and the instance processes are
+        profiled if the "profile" entry is true or contains "calls":
+        true. A summary per function and instance is logged upon
+        finalization and, optionally, written to the file given by
+        "report" or logged whenever the signal given by "signal"
+        (e.g. "SIGUSR1") is received:
+
+        .. code-block:: json
+
+           "profile": {"calls": true, "signal": "SIGUSR1", "report": "calls.txt"}
+
+        All calls between the coordinator and the instances are
+        recorded to a binary trace file if the "trace" entry is
+        given. The trace can be replayed against stub instance
+        processes to benchmark the overhead of the coordinator
+        without running the model engine, see
+        :class:`~xbeachmi.trace.Replay`:
+
+        .. code-block:: json
+
+           "trace": {"file": "trace.bin"}
+
+        The instance directories and the output file are placed on a
+        fast local path, like "/dev/shm" or node-local disk, instead
+        of next to the configuration file if the "scratch" entry is
+        given. Results are copied back every "interval" seconds of
+        simulation time in the background and at the end of the run,
+        see :class:`~xbeachmi.scratch.ScratchDirectory`:
+
+        .. code-block:: json
+
+           "scratch": {"path": "$TMPDIR", "interval": 3600}
+
+        A single instance can be run inside the coordinator process
+        instead of in a separate process by setting the "inprocess"
+        entry to the name of the instance. Calls to this instance are
+        direct calls to the model engine without any interprocess
+        communication or pickling. If "inprocess" is true, the
+        instance that runs longest on its own according to the
+        "scenario" is selected. Since the model engine is loaded in
+        the coordinator process, this option should only be used for
+        engines that can be loaded once per process without side
+        effects on the other instances.
 
         '''
 
@@ -273,6 +1318,40 @@ class XBeachMI(IBmi):
         if 'engine' in self.config.keys():
             self.engine = self.config['engine']
 
+        # a boolean profile entry switches call profiling on or off
+        if 'profile' in self.config.keys() and not isinstance(self.config['profile'], dict):
+            self.config['profile'] = {'calls' : bool(self.config['profile'])}
+
+        # resolve files that are opened after initialization, when
+        # the working directory may have changed
+        if isinstance(self.config.get('profile'), dict) and \
+           'report' in self.config['profile'].keys():
+            self.config['profile']['report'] = os.path.abspath(self.config['profile']['report'])
+        if isinstance(self.config.get('trace'), dict) and \
+           'file' in self.config['trace'].keys():
+            self.config['trace']['file'] = os.path.abspath(self.config['trace']['file'])
+
+        # create scratch directory for instance directories and output
+        if 'scratch' in self.config.keys():
+            if not isinstance(self.config['scratch'], dict):
+                self.config['scratch'] = {'path' : self.config['scratch']}
+            self.scratch = xbeachmi.scratch.ScratchDirectory(
+                os.getcwd(), self.config['scratch']['path'],
+                interval=self.config['scratch'].get('interval', 0))
+            if 'netcdf' in self.config.keys():
+                outputfile = self.scratch.get_path(self.config['netcdf']['outputfile'])
+                if not os.path.exists(os.path.dirname(outputfile)):
+                    os.makedirs(os.path.dirname(outputfile))
+                self.config['netcdf']['outputfile'] = outputfile
+
+        # split exchange subsets from list of exchange variables
+        self.subsets = {}
+        if type(self.config.get('exchange')) is dict:
+            for var, subset in self.config['exchange'].items():
+                if subset is not None:
+                    self.subsets[var] = subset
+            self.config['exchange'] = list(self.config['exchange'].keys())
+
         # read params.txt file
         if 'params_file' in self.config.keys():
             if os.path.exists(self.config['params_file']):
@@ -299,36 +1378,51 @@ class XBeachMI(IBmi):
                 # set initial running instances
                 self.running = list(instances)
 
+                from mako.template import Template
+                from multiprocessing import Queue, JoinableQueue
+
+                # compile params.txt template once for all instances,
+                # compiled template modules are cached in a hidden
+                # directory next to the configuration file
+                logger.debug('Compiling template "%s"...' % fname)
+                template = Template(filename=os.path.join(fpath, fname),
+                                    module_directory=os.path.abspath('.mako'))
+
                 # create a hidden model directory for each model
                 # instance listed in the configuration file and copy
                 # params.txt file and other model configuration files
-                # to the model directory
+                # to the model directory, files that are unchanged
+                # since a previous run are not copied again
                 for instance in instances:
 
                     logger.debug('Creating working directory "%s"...' % instance)
 
                     # create instance variables
                     self.instances[instance] = {'process': None,
+                                                'engine': None,
+                                                'cwd': None,
                                                 'queue_to': JoinableQueue(),
                                                 'queue_from': Queue(),
                                                 'configfile': '',
                                                 'markers': {}}
 
-                    # create hidden model directory
+                    # synchronize hidden model directory
                     subdir = '.%s' % instance
-                    if os.path.exists(subdir):
-                        shutil.rmtree(subdir)
-                    shutil.copytree(fpath, subdir,
-                                    ignore=lambda src, files: [f
-                                                               for f in files
-                                                               if f.startswith('.') or 
-                                                               f.endswith('.nc') or
-                                                               f.endswith('.log')])
-
-                    # create backup of original params.txt file
+                    if self.scratch is not None:
+                        subdir = self.scratch.get_path(subdir)
                     parfile = os.path.join(subdir, fname)
                     tmplfile = os.path.join(subdir, '%s.tmpl' % fname)
-                    shutil.copyfile(parfile, tmplfile)
+                    sync_directory(fpath, subdir,
+                                   ignore=lambda src, files: [f
+                                                              for f in files
+                                                              if f.startswith('.') or 
+                                                              f.endswith('.nc') or
+                                                              f.endswith('.log')],
+                                   keep=[fname, '%s.tmpl' % fname])
+
+                    # create backup of original params.txt file
+                    if not same_content(os.path.join(fpath, fname), tmplfile):
+                        shutil.copyfile(os.path.join(fpath, fname), tmplfile)
 
                     # store instance-specific mako template markers
                     self.instances[instance]['markers'] = {
@@ -340,20 +1434,73 @@ class XBeachMI(IBmi):
 
                     self.instances[instance]['configfile'] = os.path.abspath(parfile)
 
-                # render templates
+                # render templates, files are only written if their
+                # contents changed
                 for instance in self.instances.values():
 
                     # set global mako template markers
                     markers = instance['markers']
                     markers['instances'] = self.instances.keys()
+                    for k, v in self.config.get('markers', {}).items():
+                        markers.setdefault(k, v)
 
-                    logger.debug('Rendering template "%s"...' % markers['tmplfile'])
+                    logger.debug('Rendering template "%s"...' % markers['parfile'])
                     
-                    template = Template(filename=markers['tmplfile'])
-                    with open(markers['parfile'], 'w') as fp:
-                        rendered = template.render(**markers)
-                        fp.write('defuse = 0\n') # disable time explosion checks
-                        fp.write(rendered)
+                    rendered = 'defuse = 0\n' # disable time explosion checks
+                    rendered += template.render(**markers)
+                    write_if_changed(markers['parfile'], rendered)
+
+                # copy back model output only
+                if self.scratch is not None:
+                    self.scratch.mark()
+
+                # select instance to run in coordinator process
+                if self.config.get('inprocess'):
+                    self.inprocess = self.select_inprocess_instance()
+                    logger.info('Running instance "%s" in coordinator process' % self.inprocess)
+
+
+    def select_inprocess_instance(self):
+        '''Select instance to run in the coordinator process
+
+        Returns the instance given by the "inprocess" configuration
+        entry. If the entry is true, the instance that runs on its
+        own for the longest time according to the "scenario" is
+        returned. The last scenario entry is assumed to last until
+        the stop time of the instance.
+
+        Returns
+        -------
+        str
+            name of instance
+
+        '''
+
+        inprocess = self.config['inprocess']
+        if inprocess is not True:
+            if inprocess not in self.instances.keys():
+                raise ValueError('Invalid instance [%s]' % inprocess)
+            return inprocess
+
+        durations = {}
+        scenario = self.config.get('scenario', [])
+        for i, (t, instances) in enumerate(scenario):
+            if type(instances) is list:
+                if len(instances) != 1:
+                    continue
+                instances = instances[0]
+            if i + 1 < len(scenario):
+                tstop = scenario[i+1][0]
+            else:
+                cfg = xbeachmi.parsers.XBeachParser(
+                    self.instances[instances]['configfile']).parse()
+                tstop = cfg.get('tstop', t)
+            durations[instances] = durations.get(instances, 0.) + tstop - t
+
+        if len(durations) == 0:
+            return sorted(self.instances.keys())[0]
+
+        return max(sorted(durations.keys()), key=lambda k: durations[k])
 
 
     def update_instances(self):
@@ -390,13 +1537,21 @@ class XBeachMI(IBmi):
         '''
 
         self.aggregate_data()
-        instance = instances   #instances is only 1 string: {str} 'stat' > therefore cannot iterate over this, temp removed
-        # for instance in instances:
-        if instance in self.instances.keys():
-            self.sync_time(instance)
-            self.exchange_data(instance)
+
+        if type(instances) is not list:
+            instances = [instances]
+
+        if sorted(instances) == sorted(self.running):
+            self.aggregations += 1
         else:
-            raise ValueError('Invalid instance [%s]' % instance)
+            self.switches += 1
+
+        for instance in instances:
+            if instance in self.instances.keys():
+                self.sync_time(instance)
+                self.exchange_data(instance)
+            else:
+                raise ValueError('Invalid instance [%s]' % instance)
 
         self.running = instances
             
@@ -427,20 +1582,43 @@ class XBeachMI(IBmi):
         
 
     def aggregate_data(self):
-        '''Aggregate exchange values of running instances and store in aggregated storage'''
+        '''Aggregate exchange values of running instances and store in aggregated storage
 
+        The values of all running instances are gathered concurrently
+        in the stacked receive buffer, or in stacked storage that is
+        allocated once if the running instances do not share a
+        buffer, see :func:`get_var_all`, and aggregated along the
+        instance axis.
+
+        '''
+
+        n = len(self.running)
         for var in self.config['exchange']:
             logger.debug('Aggregating "%s"...' % var)
 
-            vals = []
-            for instance in self.running:
-                try:
-                    vals.append(self._call('get_var', (var,)))
-                except:
-                    logger.error('Failed to get "%s" from "%s"!' % (var, instance))
-                    logger.error(traceback.format_exc())
+            # gather in stacked receive buffer or preallocated storage
+            out = None
+            if var in self.data.keys() and \
+               (var in self.subsets.keys() or self._get_stack(var, self.running) is None):
+                if var not in self.stacks.keys():
+                    self.stacks[var] = np.zeros((len(self.instances),) + self.data[var].shape,
+                                                dtype=self.data[var].dtype)
+                out = self.stacks[var][:n]
+
+            try:
+                x = self.get_var_all(var, instances=self.running, out=out,
+                                     subset=self.subsets.get(var))
+            except:
+                logger.error('Failed to get "%s" from "%s"!' % (var, ', '.join(self.running)))
+                logger.error(traceback.format_exc())
+                continue
+
+            self.exchange_bytes += x.nbytes
 
-            self.data[var] = self.aggregate(tuple(vals))
+            if var in self.data.keys():
+                self.aggregate(x, out=self.data[var])
+            else:
+                self.data[var] = self.aggregate(x)
         
             
     def exchange_data(self, instance):
@@ -457,32 +1635,49 @@ class XBeachMI(IBmi):
             logger.debug('Exchanging "%s"...' % var)
 
             try:
-                self._call('set_var', (var, self.data[var]), instances=[instance])
+                if var in self.subsets.keys():
+                    subset = self.subsets[var]
+                    self._call('set_var_slice',
+                               (var, subset['start'], subset['count'], self.data[var]),
+                               instances=[instance])
+                elif (instance, var) in self.buffers.keys() and \
+                     self.buffers[(instance, var)]['shm'] is not None:
+                    np.copyto(self.buffers[(instance, var)]['array'], self.data[var],
+                              casting='unsafe')
+                    self._call('set_var_from', (var,), instances=[instance])
+                else:
+                    self._call('set_var', (var, self.data[var]), instances=[instance])
+                self.exchange_bytes += np.asarray(self.data[var]).nbytes
             except:
                 logger.error('Failed to set "%s" in "%s"!' % (var, instance))
                 logger.error(traceback.format_exc())
             
             
-    def aggregate(self, x, method='average', options={}):
+    def aggregate(self, x, method='average', options={}, out=None):
         '''Aggregate values
 
         Parameters
         ----------
-        x : tuple
-            Tuple with values to be aggregated
+        x : tuple or np.ndarray
+            Tuple with values to be aggregated or array with values
+            stacked along the first axis
         method : str
             Aggregation method (e.g. 'mean')
         options : dict
             Key/value pair options for aggregation method
+        out : np.ndarray, optional
+            array to store the aggregated value in
 
         Returns
         -------
         misc
-            Aggregated value of same type as original values in ``x``
+            Aggregated value of same type as original values in ``x``,
+            ``out`` if given
 
         '''
         
-        x = tuple([0 if i is None else i for i in x])
+        if not isinstance(x, np.ndarray):
+            x = tuple([0 if i is None else i for i in x])
         if len(x) > 0:
 
             # read config
@@ -495,15 +1690,27 @@ class XBeachMI(IBmi):
 
             # apply aggregation
             if method == 'average':
-                return np.average(x, axis=0, **options)
+                if out is not None and len(options) == 0 and out.dtype.kind == 'f':
+                    if len(x) == 1:
+                        np.copyto(out, x[0], casting='unsafe')
+                        return out
+                    return np.mean(x, axis=0, dtype=np.float64, out=out)
+                val = np.average(x, axis=0, **options)
             else:
                 raise ValueError('Unsupported aggregation method [%s]' % method)
+
+            if out is not None:
+                np.copyto(out, val, casting='unsafe')
+                return out
+            return val
     
 
     def start(self):
         '''Start all instance processes'''
         
         for name, instance in self.instances.items():
+            if instance['process'] is None:
+                continue
             logger.debug('Starting instance "%s"...' % name)
             self.instances[name]['process'].start()
             
@@ -512,13 +1719,20 @@ class XBeachMI(IBmi):
         '''Wait for all instance processes to be finished'''
         
         for name, instance in self.instances.items():
+            if instance['process'] is None:
+                continue
             logger.debug('Joining instance "%s"...' % name)
             self.instances[name]['process'].join()
             
             
-    def run(self, parfile, queue_to, queue_from):
+    def run(self, parfile, queue_to, queue_from, instance=''):
         '''Start instance process
 
+        If worker profiling is enabled, the listening loop is run
+        under :mod:`cProfile` and the time spent on each command is
+        recorded. Both are written to the profile directory upon
+        exit, see :func:`~xbeachmi.profiling.dump_worker_profile`.
+
         Parameters
         ----------
         parfile : str
@@ -527,43 +1741,69 @@ class XBeachMI(IBmi):
             joinable queue for sharing data from master to subprocess
         queue_from : multiprocessing.Queue
             queue for sharing data from subprocess to master
+        instance : str, optional
+            name of instance
 
         '''
         
         logger.info('Process #%d started...' % os.getpid())
 
-        # initialize xbeach model
-        w = BMIWrapper(self.engine, configfile=parfile)
-        w.initialize()
+        profiler = None
+        timing = {}
+        if self.profile_workers:
+            profiler = cProfile.Profile()
+            profiler.enable()
 
-        # start listening loop
-        while True:
+        try:
 
-            # get command from queue
-            q = queue_to.get()
+            # initialize xbeach model
+            w = xbeachmi.worker.create_engine(self.engine, parfile)
+            w.initialize()
 
-            if q:
-                fcn, args = q
-                try:
-                    # execute command and put result to queue
-                    r = getattr(w, fcn)(*args)
-                    queue_from.put(r)
-                except:
-                    # command failed
-                    logger.error('Call "%s" with "(%s)" FAILED [%d]' %
-                                 (fcn, ','.join([str(x) for x in args]), os.getpid()))
-                    queue_from.put(None)
-                    raise
-
-                # register task as completed
-                queue_to.task_done()
-
-                # quit listening loop upon finalize
-                if fcn == 'finalize':
-                    break
-                
-                
-    def __enter__(self):
+            # start listening loop
+            while True:
+
+                # get command from queue
+                q = queue_to.get()
+
+                if q:
+                    fcn, args = q[:2]
+                    t0 = time.time()
+                    try:
+                        # execute command and put result to queue, record
+                        # timing if a timestamp is sent along
+                        if len(q) > 2:
+                            r = xbeachmi.profiling.execute(w, fcn, args, q[2])
+                        else:
+                            r = xbeachmi.worker.execute(w, fcn, args)
+                        queue_from.put(r)
+                    except:
+                        # command failed
+                        logger.error('Call "%s" with "(%s)" FAILED [%d]' %
+                                     (fcn, ','.join([str(x) for x in args]), os.getpid()))
+                        queue_from.put(None)
+                        raise
+
+                    if profiler is not None:
+                        if fcn not in timing.keys():
+                            timing[fcn] = xbeachmi.profiling.Histogram()
+                        timing[fcn].add(time.time() - t0)
+
+                    # register task as completed
+                    queue_to.task_done()
+
+                    # quit listening loop upon finalize
+                    if fcn == 'finalize':
+                        break
+
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                xbeachmi.profiling.dump_worker_profile(self.profile_workers,
+                                                       instance, profiler, timing)
+                
+                
+    def __enter__(self):
         self.initialize()
         return self
     
@@ -586,8 +1826,117 @@ class XBeachMI(IBmi):
         return self._call('get_end_time')
     
     
-    def get_var(self, var):
-        return self._call('get_var', (var,))
+    def get_var(self, var, instances=None, out=None):
+        '''Get variable from running or given instances
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instances : list, optional
+            names of instances, defaults to running instances
+        out : np.ndarray, optional
+            array to store the, possibly aggregated, values in,
+            avoiding the allocation of a new array, values of
+            multiple instances are aggregated using :func:`aggregate`
+
+        Returns
+        -------
+        np.ndarray
+            variable values, ``out`` if given
+
+        '''
+
+        if out is None:
+            return self._call('get_var', (var,), instances=instances)
+
+        if not instances:
+            instances = self.running
+        if type(instances) is not list:
+            instances = [instances]
+
+        if len(instances) == 1:
+            np.copyto(out, self._get_var_buffered(var, instances[0]), casting='unsafe')
+            return out
+
+        # aggregate values of multiple instances, gathered concurrently
+        return self.aggregate(self.get_var_all(var, instances=instances), out=out)
+
+
+    def get_var_all(self, var, instances=None, out=None, subset=None):
+        '''Get variable from multiple instances stacked along a new axis
+
+        Commands are sent to all instances before any result is
+        received, such that the instances provide their values
+        concurrently. Instances with a shared memory receive buffer
+        copy their values into the buffer, see
+        :func:`register_buffer`. If ``out`` is not given and the
+        instances occupy consecutive rows of the same stacked
+        buffer, a view on these rows is returned without any further
+        copy. The view is only valid until the next call.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instances : list, optional
+            names of instances, defaults to running instances
+        out : np.ndarray or list, optional
+            array with instances along the first axis, or list of
+            arrays with one array per instance, to store the values
+            in, avoiding the allocation of a new array
+        subset : dict, optional
+            subset of variable given by "index" or by "start",
+            "count" and optionally "stride", see
+            :func:`get_var_index` and :func:`get_var_slice`
+
+        Returns
+        -------
+        np.ndarray or list
+            values of instances along the first axis, ``out`` if given
+
+        '''
+
+        if not instances:
+            instances = self.running
+        if type(instances) is not list:
+            instances = [instances]
+
+        calls = []
+        for instance in instances:
+            buf = self.buffers.get((instance, var))
+            if subset is not None:
+                if 'index' in subset.keys():
+                    calls.append((instance, 'get_var_index', (var, subset['index'])))
+                else:
+                    calls.append((instance, 'get_var_slice',
+                                  (var, subset['start'], subset['count'],
+                                   subset.get('stride'))))
+            elif buf is not None and buf['shm'] is not None:
+                calls.append((instance, 'get_var_into', (var,)))
+            else:
+                calls.append((instance, 'get_var', (var,)))
+
+        vals = self._call_each(calls, copy=False)
+
+        if out is None and subset is None:
+            stack = self._get_stack(var, instances)
+            if stack is not None:
+                return stack
+
+        if out is None:
+            val = vals[0] if calls[0][1] != 'get_var_into' \
+                  else self.buffers[(instances[0], var)]['array']
+            out = np.zeros((len(instances),) + np.shape(val),
+                           dtype=np.asarray(val).dtype)
+
+        for i, (instance, fcn, args) in enumerate(calls):
+            if fcn == 'get_var_into':
+                np.copyto(out[i], self.buffers[(instance, var)]['array'], casting='unsafe')
+            else:
+                np.copyto(out[i], vals[i], casting='unsafe')
+
+        return out
     
     
     def get_var_name(self, i):
@@ -600,15 +1949,15 @@ class XBeachMI(IBmi):
     
 
     def get_var_rank(self, var):
-        return self._call('get_var_rank', (var,))
+        return self._get_metadata(var, 'rank')
     
     
     def get_var_shape(self, var):
-        return self._call('get_var_shape', (var,))
+        return self._get_metadata(var, 'shape')
 
     
     def get_var_type(self, var):
-        return self._call('get_var_type', (var,))
+        return self._get_metadata(var, 'type')
     
     
     def inq_compound(self, var):
@@ -628,27 +1977,370 @@ class XBeachMI(IBmi):
             self._call('set_var', (var, val))
         
         
-    def set_var_index(self, var, idx):
-        raise NotImplemented(
-            'BMI extended function "get_var_index" is not implemented yet')
+    def set_var_index(self, var, index, val):
+        self._call('set_var_index', (var, index, val))
         
     
-    def set_var_slice(self, var, slc):
-        raise NotImplemented(
-            'BMI extended function "get_var_slice" is not implemented yet')
+    def set_var_slice(self, var, start, count, val):
+        self._call('set_var_slice', (var, start, count, val))
+
+
+    def get_var_index(self, var, index, instances=None):
+        return self._call('get_var_index', (var, index), instances=instances)
+
+
+    def get_var_slice(self, var, start, count, stride=None, instances=None):
+        return self._call('get_var_slice', (var, start, count, stride),
+                          instances=instances)
 
     
+    def register_buffer(self, var, instances=None):
+        '''Register persistent receive buffers for a variable
+
+        A buffer with the shape and data type of the variable is
+        allocated for each instance. The buffer is reused every time
+        the variable is read using :func:`get_var` with the ``out``
+        argument or :func:`get_var_all`, or written in
+        :func:`exchange_data`. Metadata of variables that are not
+        cached yet is queried first.
+
+        If available, the buffers of all instance processes are rows
+        of a single stacked shared memory block that is attached by
+        the instance processes, such that values are copied directly
+        between the model engines and the block without pickling and
+        the values of all instances are available as a single array
+        with instances along the first axis. Otherwise, values are
+        passed as usual and copied into the buffer.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instances : list, optional
+            names of instances, defaults to all instances
+
+        '''
+
+        if instances is None:
+            instances = list(self.instances.keys())
+
+        dtype = None
+        groups = {}
+        for instance in instances:
+            if (instance, var) in self.buffers.keys():
+                continue
+
+            cache = self.metadata.setdefault(instance, {})
+            if var not in cache.keys():
+                try:
+                    cache.update(self._call('get_var_info', ([var],), instances=[instance]))
+                except:
+                    logger.debug(traceback.format_exc())
+
+            metadata = cache.get(var)
+            if metadata is None:
+                continue
+
+            shape = tuple(metadata['shape'])
+            dtype = self.get_var_dtype(var)
+
+            if instance == self.inprocess:
+                self.buffers[(instance, var)] = {'array' : np.zeros(shape, dtype=dtype),
+                                                 'shm' : None, 'stack' : None, 'row' : None}
+            else:
+                groups.setdefault(shape, []).append(instance)
+
+        # stack buffers of instance processes with equal shapes
+        for shape, group in groups.items():
+
+            shm = None
+            stack = None
+            try:
+                from multiprocessing import shared_memory
+                shm = shared_memory.SharedMemory(
+                    create=True,
+                    size=max(1, len(group) * int(np.prod(shape)) * dtype.itemsize))
+                stack = np.ndarray((len(group),) + shape, dtype=dtype, buffer=shm.buf)
+            except ImportError:
+                pass # shared memory not available, fall back to copies
+
+            attached = 0
+            for i, instance in enumerate(group):
+                buf = {'array' : None, 'shm' : None, 'stack' : None, 'row' : None}
+                if stack is not None:
+                    try:
+                        self._call('attach_buffer',
+                                   (var, shm.name, shape, dtype.str, i * stack[0].nbytes),
+                                   instances=[instance])
+                        buf = {'array' : stack[i], 'shm' : shm, 'stack' : stack, 'row' : i}
+                        attached += 1
+                    except:
+                        logger.warning('Failed to share buffer of "%s" with "%s"' % (var, instance))
+                        logger.debug(traceback.format_exc())
+                if buf['array'] is None:
+                    buf['array'] = np.zeros(shape, dtype=dtype)
+                self.buffers[(instance, var)] = buf
+
+            if shm is not None and attached == 0:
+                stack = None
+                shm.close()
+                shm.unlink()
+
+
+    def release_buffers(self):
+        '''Release all receive buffers and shared memory blocks'''
+
+        blocks = []
+        for key, buf in self.buffers.items():
+            if buf['shm'] is not None and buf['shm'] not in blocks:
+                blocks.append(buf['shm'])
+            buf['array'] = None
+            buf['stack'] = None
+        self.buffers = {}
+
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass # views on the block are still referenced
+            shm.unlink()
+
+
+    def _get_stack(self, var, instances):
+        '''Return view on stacked receive buffer of multiple instances
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instances : list
+            names of instances
+
+        Returns
+        -------
+        np.ndarray or None
+            rows of the stacked shared memory block of the variable
+            corresponding to the instances, None if the instances do
+            not occupy consecutive rows of the same block
+
+        '''
+
+        bufs = [self.buffers.get((instance, var)) for instance in instances]
+        if len(bufs) == 0 or any([b is None or b['stack'] is None for b in bufs]):
+            return None
+
+        stack = bufs[0]['stack']
+        row = bufs[0]['row']
+        for i, b in enumerate(bufs):
+            if b['stack'] is not stack or b['row'] != row + i:
+                return None
+
+        return stack[row:row+len(bufs)]
+
+
+    def _get_var_buffered(self, var, instance):
+        '''Get variable of a single instance using its receive buffer
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        instance : str
+            name of instance
+
+        Returns
+        -------
+        np.ndarray
+            variable values, only valid until the next call
+
+        '''
+
+        # read model engine memory directly
+        if instance == self.inprocess:
+            return self._call_each([(instance, 'get_var', (var,))], copy=False)[0]
+
+        buf = self.buffers.get((instance, var))
+        if buf is None:
+            return self._call('get_var', (var,), instances=[instance])
+        elif buf['shm'] is not None:
+            self._call('get_var_into', (var,), instances=[instance])
+        else:
+            np.copyto(buf['array'], self._call('get_var', (var,), instances=[instance]),
+                      casting='unsafe')
+
+        return buf['array']
+
+
     def initialize(self):
-        '''Initialize and start instance processes'''
+        '''Initialize and start instance processes
+
+        The model engine of the in-process instance, if any, is
+        initialized after the instance processes are started, such
+        that the instance processes do not inherit its state.
+
+        '''
+
+        from multiprocessing import Process
+
+        # start resource tracker before forking, such that shared
+        # memory blocks attached by the instance processes are
+        # tracked by the coordinator and not removed when an
+        # instance process exits
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        except ImportError:
+            pass
         
         for name, instance in self.instances.items():
+            if name == self.inprocess:
+                continue
             logger.debug('Starting process "%s"...' % name)
             self.instances[name]['process'] = \
                 Process(target=self.run,
                         args=(instance['configfile'],
                               self.instances[name]['queue_to'],
-                              self.instances[name]['queue_from']))
+                              self.instances[name]['queue_from'],
+                              name))
         self.start()
+
+        # initialize in-process model engine
+        if self.inprocess is not None:
+            logger.debug('Initializing engine "%s"...' % self.inprocess)
+            cwd = os.getcwd()
+            w = xbeachmi.worker.create_engine(
+                self.engine, self.instances[self.inprocess]['configfile'])
+            w.initialize()
+            self.instances[self.inprocess]['engine'] = w
+            self.instances[self.inprocess]['cwd'] = os.getcwd()
+            os.chdir(cwd) # engine may change working directory
+
+        # enable call recording, the recorder profiles calls as well
+        if 'trace' in self.config.keys():
+            from xbeachmi.trace import TraceRecorder
+            self.tracer = TraceRecorder(self.config['trace']['file'],
+                                        header={'configfile' : self.configfile,
+                                                'engine' : self.engine,
+                                                'instances' : list(self.instances.keys()),
+                                                'inprocess' : self.inprocess,
+                                                'start' : time.time()})
+            self.profiler = self.tracer
+
+        # enable call profiling
+        if 'profile' in self.config.keys():
+            if self.config['profile'].get('calls', False):
+                if self.profiler is None:
+                    self.profiler = xbeachmi.profiling.CallProfiler()
+                if 'signal' in self.config['profile'].keys():
+                    if threading.current_thread() is threading.main_thread():
+                        signal.signal(getattr(signal, self.config['profile']['signal']),
+                                      self.profiler.log_report)
+                    else:
+                        logger.warning('Not in main thread, profile report on signal "%s" '
+                                       'disabled' % self.config['profile']['signal'])
+
+        self.cache_metadata()
+
+
+    def cache_metadata(self):
+        '''Cache variable metadata and preallocate exchange buffers
+
+        Queries each instance once for the shape, rank and type of
+        all variables listed in the "exchange" and "outputvars"
+        configuration entries. The metadata is cached per instance
+        and used to answer :func:`get_var_shape`,
+        :func:`get_var_rank` and :func:`get_var_type` without
+        interprocess communication, to derive netCDF dimensions in
+        :func:`get_dimensions`, to preallocate the aggregated
+        exchange storage and to register receive buffers, see
+        :func:`register_buffer`.
+
+        '''
+
+        variables = []
+        if 'exchange' in self.config.keys():
+            variables.extend(self.config['exchange'])
+        if 'netcdf' in self.config.keys():
+            variables.extend(self.config['netcdf']['outputvars'])
+        variables = list(np.unique(variables))
+
+        for instance in self.instances.keys():
+            logger.debug('Caching metadata of "%s"...' % instance)
+            try:
+                self.metadata[instance] = self._call('get_var_info', (variables,),
+                                                     instances=[instance])
+            except:
+                logger.error('Failed to get metadata from "%s"!' % instance)
+                logger.error(traceback.format_exc())
+                self.metadata[instance] = {}
+
+        self.dimension_sizes = self.read_dimension_sizes()
+
+        # preallocate aggregated exchange storage
+        if 'exchange' in self.config.keys():
+            for var in self.config['exchange']:
+                if var in self.subsets.keys():
+                    shape = tuple(self.subsets[var]['count'])
+                else:
+                    shape = self.get_var_shape(var)
+                if shape is not None:
+                    self.data[var] = np.zeros(shape, dtype=self.get_var_dtype(var))
+
+        # register receive buffers for exchanged and output variables
+        for var in variables:
+            if var not in self.subsets.keys():
+                self.register_buffer(var)
+
+
+    def read_dimension_sizes(self):
+        '''Read dimension sizes from XBeach configuration file
+
+        Axes of cached variables that do not match the known
+        dimensions of the variable are assigned a generic dimension
+        named after their length, see :func:`get_dimensions`.
+
+        Returns
+        -------
+        dict
+            dictionary with the sizes of the dimensions x, y,
+            fractions, layers and theta and any generic dimensions
+
+        '''
+
+        sizes = {}
+
+        cfg = xbeachmi.parsers.XBeachParser(
+            self.instances[self.running[0]]['configfile']).parse()
+
+        if 'nx' in cfg.keys() and 'ny' in cfg.keys():
+            sizes['x'] = cfg['nx'] + 1
+            sizes['y'] = cfg['ny'] + 1
+
+        # sediment fractions
+        if 'ngd' in cfg.keys():
+            sizes['fractions'] = cfg['ngd']
+        elif type(cfg.get('D50')) is list:
+            sizes['fractions'] = len(cfg['D50'])
+        else:
+            sizes['fractions'] = 1
+
+        # bed layers
+        sizes['layers'] = cfg.get('nd', 3)
+
+        # directional bins
+        thetamin = cfg.get('thetamin', -90.)
+        thetamax = cfg.get('thetamax', 90.)
+        dtheta = cfg.get('dtheta', 10.)
+        sizes['theta'] = max(1, int(np.round((thetamax - thetamin) / dtheta)))
+
+        # generic dimensions
+        for var, info in self.metadata.get(self.running[0], {}).items():
+            if info.get('shape') is not None:
+                dims = self._match_dimensions(var, info['shape'], sizes)
+                for dim, n in zip(dims, info['shape']):
+                    sizes.setdefault(dim, n)
+
+        return sizes
             
             
     def update(self, dt=-1, instances=None):
@@ -692,7 +2384,7 @@ class XBeachMI(IBmi):
                     t = self._call('get_current_time', instances=[instance])
 
                     if target > t:
-                        self._call('update', (target - t,))
+                        self._call('update', (target - t,), instances=[instance])
                     else:
                         break
             
@@ -703,11 +2395,37 @@ class XBeachMI(IBmi):
             
     def finalize(self):
         '''Finalize instance processes'''
+
+        # report resource usage
+        if 'telemetry' in self.config.keys():
+            logger.info('Resource usage summary:')
+            for line in xbeachmi.resources.format_resources(self.get_resources()):
+                logger.info(line)
         
         for instance in self.instances.keys():
             logger.debug('Finalizing "%s"...' % instance)
-            self._call('finalize', instances=[instance])
+            try:
+                self._call('finalize', instances=[instance])
+            except:
+                logger.error('Failed to finalize "%s"!' % instance)
+                logger.error(traceback.format_exc())
         self.join()
+        self.release_buffers()
+
+        # copy back results from scratch directory
+        if self.scratch is not None:
+            self.scratch.close()
+
+        # close call trace
+        if self.tracer is not None:
+            self.tracer.close()
+
+        # report call profile
+        if self.profiler is not None:
+            self.profiler.log_report()
+            if 'report' in self.config.get('profile', {}).keys():
+                with open(self.config['profile']['report'], 'w') as fp:
+                    fp.write('\n'.join(self.profiler.report()) + '\n')
 
         # change working directory back to original
         os.chdir(self.cwd)
@@ -719,7 +2437,9 @@ class XBeachMI(IBmi):
 
         Calls a function in a subprocess and returns the result via
         separate queues. If no instance is specified the running
-        instance is used.
+        instance is used. Results of multiple instances are
+        aggregated, see :func:`aggregate`. Functions of multiple
+        instances are called concurrently, see :func:`_call_each`.
 
         Parameters
         ----------
@@ -743,15 +2463,7 @@ class XBeachMI(IBmi):
         if type(instances) is not list:
             instances = [instances]
 
-        #logger.debug('Call "%s" with "(%s)" [%d]' %
-        #             (fcn, ','.join([str(x) for x in args]), os.getpid()))
-
-        vals = []
-        for instance in instances:
-            self.instances[instance]['queue_to'].put((fcn, args))
-        for instance in instances:
-            self.instances[instance]['queue_to'].join()
-            vals.append(self.instances[instance]['queue_from'].get())
+        vals = self._call_each([(instance, fcn, args) for instance in instances])
 
         if len(vals) > 1:
             return self.aggregate(vals)
@@ -759,12 +2471,276 @@ class XBeachMI(IBmi):
             return vals[0]
 
 
-    @staticmethod
-    def get_dimensions(var):
+    def _call_each(self, calls, copy=True):
+        '''Call functions in multiple instances concurrently
+
+        All commands are sent before any result is received, such
+        that the instance processes execute them concurrently. The
+        function of the in-process instance, if any, is called
+        directly after the commands are sent to all other instances.
+        Direct calls are not profiled, but are recorded if a trace is
+        recorded.
+
+        Parameters
+        ----------
+        calls : list
+            list of tuples with name of instance, name of function
+            and function arguments
+        copy : bool, optional
+            copy arrays returned by the in-process instance to
+            decouple them from the model engine memory
+
+        Returns
+        -------
+        list
+            function results in order of calls
+
+        '''
+
+        if self.tracer is not None:
+            self.tracer.begin()
+
+        t = time.time()
+        for instance, fcn, args in calls:
+            if instance == self.inprocess:
+                continue
+            if self.profiler is None:
+                self.instances[instance]['queue_to'].put((fcn, args))
+            else:
+                self.instances[instance]['queue_to'].put(self.profiler.send(fcn, args))
+
+        vals = []
+        for instance, fcn, args in calls:
+            if instance == self.inprocess:
+                t0 = time.time()
+                vals.append(self._call_inprocess(fcn, args, copy=copy))
+                if self.tracer is not None:
+                    self.tracer.record(instance, fcn, args, vals[-1], t, time.time() - t0)
+            elif self.profiler is None:
+                vals.append(self._receive(instance))
+            else:
+                vals.append(self.profiler.receive(fcn, instance, args,
+                                                  self._receive(instance),
+                                                  t))
+
+        return vals
+
+
+    def _receive(self, instance):
+        '''Receive result from instance process
+
+        Waits for the result of the last command sent to the
+        instance process, while checking if the process is still
+        alive, such that a failing instance process does not block
+        the coordinator.
+
+        Parameters
+        ----------
+        instance : str
+            name of instance
+
+        Returns
+        -------
+        any
+            function result
+
+        '''
+
+        while True:
+            try:
+                return self.instances[instance]['queue_from'].get(timeout=1.)
+            except Empty:
+                process = self.instances[instance]['process']
+                if process is not None and not process.is_alive():
+                    raise RuntimeError('Process of instance "%s" exited [%s]' %
+                                       (instance, process.exitcode))
+
+
+    def _call_inprocess(self, fcn, args=(), copy=True):
+        '''In-process function caller
+
+        Functions listed in :data:`FILE_CALLS` are executed in the
+        working directory the engine was left in after
+        initialization, like in an instance process, such that any
+        files written by the engine end up in its instance directory.
+
+        Parameters
+        ----------
+        fcn : str
+            name of function
+        args : tuple, optional
+            function arguments
+        copy : bool, optional
+            copy arrays returned by the model engine
+
+        Returns
+        -------
+        any
+            function result
+
+        '''
+
+        instance = self.instances[self.inprocess]
+        if fcn in FILE_CALLS:
+            cwd = os.getcwd()
+            os.chdir(instance['cwd'])
+            try:
+                val = xbeachmi.worker.execute(instance['engine'], fcn, args)
+            finally:
+                os.chdir(cwd)
+        else:
+            val = xbeachmi.worker.execute(instance['engine'], fcn, args)
+        if copy and isinstance(val, np.ndarray):
+            return val.copy()
+        return val
+
+
+    def get_resources(self):
+        '''Return resource usage of coordinator and instance processes
+
+        The coordinator usage includes the number of bytes held by
+        the aggregated exchange storage. The result is also stored as
+        :attr:`resources`.
+
+        Returns
+        -------
+        dict
+            dictionary with instance names and "coordinator" as keys
+            and resource usage dictionaries as values, see
+            :func:`xbeachmi.resources.read_resources`
+
+        '''
+
+        resources = {}
+        for instance in self.instances.keys():
+            try:
+                resources[instance] = self._call('get_resources', instances=[instance])
+            except:
+                logger.error('Failed to get resources from "%s"!' % instance)
+                logger.error(traceback.format_exc())
+                resources[instance] = None
+
+        resources['coordinator'] = xbeachmi.resources.read_resources()
+        resources['coordinator']['data_bytes'] = \
+            sum([np.asarray(v).nbytes for v in self.data.values() if v is not None])
+
+        self.resources = resources
+
+        return resources
+
+
+    def get_var_dtype(self, var):
+        '''Return numpy data type of a given variable
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+
+        Returns
+        -------
+        numpy.dtype
+            numpy data type corresponding to BMI variable type
+
+        '''
+
+        t = self.get_var_type(var)
+        if t in DTYPES.keys():
+            return np.dtype(DTYPES[t])
+        try:
+            return np.dtype(t)
+        except TypeError:
+            return np.dtype('float64')
+
+
+    def get_dimensions(self, var):
         '''Return dimensions of a given variable
 
-        TODO: actually implement this function
+        Dimensions are taken from the known dimensions of XBeach
+        variables, see :func:`xbeachmi.parsers.get_var_dimensions`,
+        if they match the cached variable shape and the dimension
+        sizes read from the XBeach configuration file. Otherwise the
+        last two axes are assumed to be y and x, if their lengths
+        match, and the remaining axes are assigned a generic
+        dimension named after their length.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+
+        Returns
+        -------
+        tuple
+            dimension names, starting with time
 
         '''
-        
-        return (u'time', u'y', u'x')
+
+        shape = self.get_var_shape(var)
+        if shape is None:
+            return (u'time', u'y', u'x')
+
+        dims = self._match_dimensions(var, shape, self.dimension_sizes)
+
+        return tuple([u'time'] + [u'%s' % d for d in dims])
+
+
+    def _match_dimensions(self, var, shape, sizes):
+        '''Return dimensions of a variable that match its shape
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        shape : tuple
+            shape of variable
+        sizes : dict
+            dimension sizes, see :func:`read_dimension_sizes`
+
+        Returns
+        -------
+        list
+            dimension names, without time
+
+        '''
+
+        dims = list(xbeachmi.parsers.get_var_dimensions(var))
+        if len(dims) == len(shape) and \
+           all([sizes.get(dim) == n for dim, n in zip(dims, shape)]):
+            return dims
+
+        dims = ['n%d' % n for n in shape]
+        if len(shape) >= 2 and tuple(shape[-2:]) == (sizes.get('y'), sizes.get('x')):
+            dims[-2:] = ['y', 'x']
+
+        return dims
+
+
+    def _get_metadata(self, var, key):
+        '''Return cached metadata of a variable in the running instance
+
+        Falls back to a call to the running instance if the variable
+        is not cached yet and caches the result.
+
+        Parameters
+        ----------
+        var : str
+            name of variable
+        key : str
+            metadata item (shape, rank or type)
+
+        Returns
+        -------
+        any
+            metadata value
+
+        '''
+
+        instance = self.running[0] if type(self.running) is list else self.running
+        cache = self.metadata.setdefault(instance, {})
+
+        if var not in cache.keys():
+            cache[var] = self._call('get_var_info', ([var],),
+                                    instances=[instance])[var]
+
+        return cache[var][key]
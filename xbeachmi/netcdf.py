@@ -2,15 +2,32 @@ import numpy as np
 from datetime import datetime
 
 
-# check if netCDF4 is available
-try:
-    import netCDF4
-    HAVE_NETCDF = True
-except ImportError:
-    HAVE_NETCDF = False
+# netCDF4 module, imported on first use to keep startup fast
+netCDF4 = None
 
 
-def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
+def have_netcdf():
+    '''Import netCDF4 on first use and check if it is available
+
+    Returns
+    -------
+    bool
+        True if netCDF4 is available
+
+    '''
+
+    global netCDF4
+    if netCDF4 is None:
+        try:
+            import netCDF4 as module
+            netCDF4 = module
+        except ImportError:
+            netCDF4 = False
+    return netCDF4 is not False
+
+
+def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None,
+               times=None, instances=None):
     '''Initialize netCDF4 file
 
     Creates an empty netCDF4 file with dimensions and variable
@@ -41,7 +58,9 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
     ncfile : str
         path to netCDF4 file
     dimensions : dict
-        dict with dimension variables x, y, layers and fractions
+        dict with dimension variables x, y, layers and fractions,
+        other dimensions are created with their own coordinate
+        variable
     variables : dict
         dict of dicts with other variables, where each variable
         defines at least its dimensions
@@ -49,11 +68,21 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
         dict with global netCDF attributes
     crs : dict
         dict with EPSG attributes for local coordinate reference system (crs)
+    times : list
+        names of additional time dimensions for variables that are
+        written at their own interval
+    instances : list
+        names of instances, if given a "realization" dimension is
+        added that variables may use to store values per instance,
+        labelled by the "instance_name" variable
 
     '''
 
+    if times is None:
+        times = []
+
     # abort if netCDF4 is not available
-    if not HAVE_NETCDF:
+    if not have_netcdf():
         return
 
     with netCDF4.Dataset(ncfile, 'w') as nc:
@@ -62,9 +91,18 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
         nc.createDimension('x', len(dimensions['x']))
         nc.createDimension('y', len(dimensions['y']))
         nc.createDimension('time', 0)
+        for time in times:
+            nc.createDimension(time, 0)
+        if instances is not None:
+            nc.createDimension('realization', len(instances))
         nc.createDimension('nv', 2)
         nc.createDimension('nv2', 4)
         nc.createDimension('nv3', 128)
+
+        # other dimensions, like fractions, layers and theta
+        for dim, values in dimensions.items():
+            if dim not in nc.dimensions.keys():
+                nc.createDimension(dim, len(values))
           
         ## add global attributes
         # see http://www.unidata.ucar.edu/software/thredds/current/netcdf-java/formats/DataDiscoveryAttConvention.html
@@ -169,6 +207,15 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
         nc.variables['time'].bounds = 'time_bounds'
         nc.variables['time'].ancillary_variables = ''
         nc.variables['time'].comment = ''
+
+        for time in times:
+            nc.createVariable(time, 'float64', (time,))
+            nc.variables[time].long_name = 'time'
+            nc.variables[time].standard_name = 'time'
+            nc.variables[time].units = nc.variables['time'].units
+            nc.variables[time].calendar = 'julian'
+            nc.variables[time].axis = 'T'
+            nc.variables[time].comment = ''
         
         nc.createVariable('instance', 'S1', (u'time', u'nv3'))
         nc.variables['instance'].long_name = 'instance'
@@ -179,6 +226,24 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
         nc.variables['instance'].ancillary_variables = ''
         nc.variables['instance'].comment = ''
 
+        for dim in dimensions.keys():
+            if dim not in nc.variables.keys():
+                nc.createVariable(dim, 'float32', (dim,))
+                nc.variables[dim].long_name = dim
+                nc.variables[dim].units = '-'
+                nc.variables[dim].comment = ''
+
+        if instances is not None:
+            nc.createVariable('realization', 'int32', (u'realization',))
+            nc.variables['realization'].long_name = 'realization'
+            nc.variables['realization'].standard_name = 'realization'
+            nc.variables['realization'].units = '1'
+            nc.variables['realization'].comment = 'index of instance'
+
+            nc.createVariable('instance_name', 'S1', (u'realization', u'nv3'))
+            nc.variables['instance_name'].long_name = 'instance name'
+            nc.variables['instance_name'].comment = 'label of realization'
+
         nc.createVariable('x_bounds', 'float32', (u'x', u'nv'))
         nc.variables['x_bounds'].units = 'm'
         nc.variables['x_bounds'].comment = 'x-coordinate values at the upper and lower bounds of each pixel.'
@@ -211,13 +276,19 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
                 nc.variables[var].valid_min = -np.inf
                 nc.variables[var].valid_max = np.inf
                 nc.variables[var].coordinates = ' '.join(props['dimensions'])
+                if u'realization' in props['dimensions']:
+                    nc.variables[var].coordinates += ' instance_name'
                 nc.variables[var].grid_mapping = 'crs'
                 nc.variables[var].source = ''
                 nc.variables[var].references = ''
-                nc.variables[var].cell_methods = ''
+                nc.variables[var].cell_methods = props.get('cell_methods', '')
                 nc.variables[var].ancillary_variables = ''
                 nc.variables[var].comment = ''
 
+                # store static data
+                if 'values' in props.keys():
+                    nc.variables[var][:] = props['values']
+
         # set local coordinate system
         nc.createVariable('crs', 'int32', ())
         if crs is not None:
@@ -230,8 +301,13 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
                 nc = set_ncattr(nc, key, value)
             
         # store static data
-        nc.variables['x'][:] = dimensions['x']
-        nc.variables['y'][:] = dimensions['y']
+        for dim, values in dimensions.items():
+            nc.variables[dim][:] = values
+
+        if instances is not None:
+            nc.variables['realization'][:] = np.arange(len(instances))
+            for i, instance in enumerate(instances):
+                nc.variables['instance_name'][i,:len(instance)] = list(instance)
 
         nc.variables['lat'][:,:] = 0.
         nc.variables['lon'][:,:] = 0.
@@ -249,7 +325,7 @@ def initialize(ncfile, dimensions, variables=None, attributes=None, crs=None):
 #                grp.setncattr(k, v)
 
 
-def append(ncfile, idx, variables):
+def append(ncfile, idx, variables, time='time'):
     '''Append data to existing netCDF4 file
 
     Parameters
@@ -261,20 +337,27 @@ def append(ncfile, idx, variables):
     variables : dict
         dict with variable names (keys) and data to be
         appended (values)
+    time : str, optional
+        name of time dimension the variables are appended to
 
     '''
 
     # abort if netCDF4 is not available
-    if not HAVE_NETCDF:
+    if not have_netcdf():
         return
 
     with netCDF4.Dataset(ncfile, 'a') as nc:
-        nc.variables['time'][idx] = variables['time']
+        nc.variables[time][idx] = variables[time]
         for name, value in variables.items():
+            if isinstance(value, bytes):
+                value = value.decode()
+            if isinstance(value, str):
+                value = netCDF4.stringtoarr(value, nc.variables[name].shape[-1])
             nc.variables[name][idx,...] = value
-        nc.variables['time_bounds'][idx,0] \
-            = 0 if idx == 0 else nc.variables['time'][idx]
-        nc.variables['time_bounds'][idx,1] = variables['time']
+        if time == 'time':
+            nc.variables['time_bounds'][idx,0] \
+                = 0 if idx == 0 else nc.variables['time'][idx]
+            nc.variables['time_bounds'][idx,1] = variables['time']
     
 
 def set_ncattr(nc, key, value):
@@ -3,6 +3,41 @@ import re
 import numpy as np
 
 
+# XBeach variables with a directional bin dimension
+DIRECTIONAL = ['ee', 'rr', 'cgx', 'cgy', 'cx', 'cy', 'ctheta']
+
+# XBeach variables with a sediment fraction dimension
+FRACTIONS = ['ccg', 'ceqbg', 'ceqsg', 'Susg', 'Svsg', 'Subg', 'Svbg']
+
+# XBeach variables with a sediment fraction and bed layer dimension
+LAYERS = ['pbbed']
+
+
+def get_var_dimensions(var):
+    '''Return dimensions of XBeach variable
+
+    Parameters
+    ----------
+    var : str
+        name of variable
+
+    Returns
+    -------
+    tuple
+        dimension names, without time, defaults to the grid
+        dimensions y and x
+
+    '''
+
+    if var in DIRECTIONAL:
+        return ('theta', 'y', 'x')
+    elif var in FRACTIONS:
+        return ('fractions', 'y', 'x')
+    elif var in LAYERS:
+        return ('fractions', 'layers', 'y', 'x')
+    return ('y', 'x')
+
+
 class ConfigParser:
     '''Configuration parser base class
 
@@ -126,7 +161,7 @@ class ConfigParser:
 
         value = value.strip()
         if re.search('\s', value) or force_list:
-            return [self.parse_config_value(x) for x in re.split('\s+', value)]
+            return [ConfigParser.parse_config_value(x) for x in re.split('\s+', value)]
         elif re.match('[FT]$', value):
             return value == 'T'
         elif re.match('[\-0-9]+$', value):
@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+
+import xbeachmi.parsers
+import xbeachmi.validation
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# bytes per element of exchanged values and output values
+ITEMSIZE = 8
+OUTPUT_ITEMSIZE = 4
+
+
+def plan(configfile, calibrate=0):
+    '''Estimate cost and memory of an XBeach MI run
+
+    Reads the configuration file and the rendered params.txt file of
+    each instance, without starting the model, and estimates the
+    number of instance switches and aggregations, the volume of data
+    exchanged between the coordinator and the instance processes,
+    the number and size of output writes and the memory held by the
+    coordinator.
+
+    Without calibration, variable shapes are derived from the grid
+    size and the number of directional bins, sediment fractions and
+    bed layers. If ``calibrate`` is given, the model is started, the
+    actual variable shapes are read from the instances and each
+    instance is run for the given number of time steps to measure
+    its simulation speed, the switch latency and the memory used by
+    each instance process. This yields an estimate of the wall time
+    of the run.
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+    calibrate : int, optional
+        number of time steps to run each instance for calibration,
+        no calibration if zero
+
+    Returns
+    -------
+    dict
+        plan with estimates
+
+    '''
+
+    from mako.template import Template
+
+    with open(configfile, 'r') as fp:
+        config = json.load(fp)
+
+    root = os.path.dirname(os.path.abspath(configfile))
+    parfile = os.path.join(root, config['params_file'])
+
+    # get instances
+    instances = list(config.get('instances', []))
+    for t, i in config.get('scenario', []):
+        instances.extend(i if type(i) is list else [i])
+    instances = sorted(set(instances))
+
+    # read rendered params.txt files
+    template = Template(filename=parfile)
+    params = {
+        instance : xbeachmi.validation.parse_params(
+            template.render(**xbeachmi.validation.get_markers(
+                parfile, instance, instances, markers=config.get('markers'))))
+        for instance in instances
+    }
+
+    cfg = params[instances[0]]
+    sizes = get_dimension_sizes(cfg)
+    tstart = float(cfg.get('tstart', 0.))
+    tstop = float(max([p.get('tstop', tstart) for p in params.values()]))
+
+    # get variable shapes
+    exchange = config.get('exchange', [])
+    subsets = {}
+    if type(exchange) is dict:
+        subsets = {k : v for k, v in exchange.items() if v is not None}
+        exchange = list(exchange.keys())
+    outputvars = config.get('netcdf', {}).get('outputvars', [])
+
+    calibration = None
+    if calibrate:
+        calibration = run_calibration(configfile, calibrate, exchange + outputvars)
+        shapes = calibration['shapes']
+    else:
+        shapes = {var : get_var_shape(var, sizes) for var in exchange + outputvars}
+
+    for var, subset in subsets.items():
+        shapes[var] = tuple(subset['count'])
+
+    exchange_bytes = sum([int(np.prod(shapes[var])) * ITEMSIZE for var in exchange])
+
+    # walk through scenario
+    segments = get_segments(config, instances, tstart, tstop)
+
+    switches = 0
+    aggregations = 0
+    ipc_bytes = 0
+    running = list(instances)
+    for t0, t1, nxt in segments:
+        if t0 > tstart or nxt != running:
+            if sorted(nxt) == sorted(running):
+                aggregations += 1
+            else:
+                switches += 1
+            ipc_bytes += (len(running) + len(nxt)) * exchange_bytes
+        running = nxt
+
+    if 'interval' in config.get('aggregate', {}).keys():
+        for t0, t1, nxt in segments:
+            n = int((t1 - t0) // config['aggregate']['interval'])
+            aggregations += n
+            ipc_bytes += n * 2 * len(nxt) * exchange_bytes
+
+    # output
+    output_writes = 0
+    output_bytes = 0
+    output_buffer_bytes = 0
+    if 'netcdf' in config.keys():
+        ncfg = config['netcdf']
+        per_instance = ncfg.get('per_instance', False)
+        for var in outputvars:
+            interval = ncfg.get('intervals', {}).get(var, ncfg['interval'])
+            n = int((tstop - tstart) // interval) + 1
+            nbytes = get_output_size(var, shapes[var], ncfg.get('subset', {}).get(var), sizes)
+            if per_instance:
+                nbytes *= len(instances)
+            output_writes += n
+            output_bytes += n * nbytes
+            output_buffer_bytes += nbytes
+
+            # values are gathered from all running instances
+            for t0, t1, nxt in segments:
+                ipc_bytes += int((t1 - t0) // interval) * len(nxt) * \
+                             int(np.prod(shapes[var])) * ITEMSIZE
+
+    # coordinator memory: aggregated storage, output buffers and the
+    # values of all running instances during aggregation
+    nrunning = max([len(s[2]) for s in segments] + [len(instances)])
+    coordinator_bytes = exchange_bytes + output_buffer_bytes + \
+                        nrunning * max([int(np.prod(shapes[var])) * ITEMSIZE
+                                        for var in exchange] + [0])
+
+    result = {
+        'instances' : instances,
+        'grid' : sizes,
+        'tstart' : tstart,
+        'tstop' : tstop,
+        'segments' : len(segments),
+        'switches' : switches,
+        'aggregations' : aggregations,
+        'exchange_bytes' : exchange_bytes,
+        'ipc_bytes' : ipc_bytes,
+        'output_writes' : output_writes,
+        'output_bytes' : output_bytes,
+        'coordinator_bytes' : coordinator_bytes,
+        'instance_bytes' : None,
+        'wall_time' : None,
+    }
+
+    if calibration is not None:
+        result['calibration'] = calibration
+        result['instance_bytes'] = {
+            k : v for k, v in calibration['peak_rss'].items()
+        }
+        wall = switches * calibration['switch_time']
+        for t0, t1, nxt in segments:
+            # running instances are updated one after another
+            wall += sum([(t1 - t0) / calibration['speed'][i] for i in nxt
+                         if calibration['speed'].get(i)])
+        result['wall_time'] = wall
+
+    return result
+
+
+def get_dimension_sizes(cfg):
+    '''Return dimension sizes from XBeach configuration
+
+    Parameters
+    ----------
+    cfg : dict
+        parsed params.txt file
+
+    Returns
+    -------
+    dict
+        dictionary with the sizes of the dimensions x, y,
+        fractions, layers and theta, see
+        :func:`xbeachmi.model.XBeachMI.read_dimension_sizes`
+
+    '''
+
+    sizes = {
+        'x' : int(cfg.get('nx', 0)) + 1,
+        'y' : int(cfg.get('ny', 0)) + 1,
+        'layers' : int(cfg.get('nd', 3)),
+    }
+
+    if 'ngd' in cfg.keys():
+        sizes['fractions'] = int(cfg['ngd'])
+    elif type(cfg.get('D50')) is list:
+        sizes['fractions'] = len(cfg['D50'])
+    else:
+        sizes['fractions'] = 1
+
+    thetamin = cfg.get('thetamin', -90.)
+    thetamax = cfg.get('thetamax', 90.)
+    dtheta = cfg.get('dtheta', 10.)
+    sizes['theta'] = max(1, int(np.round((thetamax - thetamin) / dtheta)))
+
+    return sizes
+
+
+def get_var_shape(var, sizes):
+    '''Return estimated shape of XBeach variable
+
+    Parameters
+    ----------
+    var : str
+        name of variable
+    sizes : dict
+        dimension sizes, see :func:`get_dimension_sizes`
+
+    Returns
+    -------
+    tuple
+        estimated shape
+
+    '''
+
+    return tuple([sizes[dim] for dim in xbeachmi.parsers.get_var_dimensions(var)])
+
+
+def get_output_size(var, shape, subset, sizes):
+    '''Return number of bytes written per output time step
+
+    Parameters
+    ----------
+    var : str
+        name of variable
+    shape : tuple
+        shape of variable
+    subset : dict or None
+        netCDF subset of variable, see
+        :func:`xbeachmi.model.XBeachMIWrapper.read_subset`
+    sizes : dict
+        dimension sizes, see :func:`get_dimension_sizes`
+
+    Returns
+    -------
+    int
+        number of bytes
+
+    '''
+
+    shape = list(shape)
+    if subset is not None:
+        if 'points' in subset.keys():
+            shape = shape[:-2] + [len(subset['points'])]
+        elif 'transect' in subset.keys():
+            shape = shape[:-2] + [max(sizes['x'], sizes['y'])]
+        else:
+            stride = subset.get('stride', 1)
+            for i in range(len(shape)):
+                if 'count' in subset.keys():
+                    shape[i] = subset['count'][i]
+                s = stride[i] if type(stride) is list else stride
+                shape[i] = int(np.ceil(shape[i] / float(s)))
+
+    return int(np.prod(shape)) * OUTPUT_ITEMSIZE
+
+
+def get_segments(config, instances, tstart, tstop):
+    '''Return scenario segments
+
+    Parameters
+    ----------
+    config : dict
+        XBeach MI configuration
+    instances : list
+        names of all instances, initially running
+    tstart, tstop : float
+        start and stop time of simulation
+
+    Returns
+    -------
+    list
+        list of tuples with start and end time and list of running
+        instances of each segment
+
+    '''
+
+    segments = []
+    t0 = tstart
+    running = list(instances)
+    for t, i in config.get('scenario', []):
+        if t >= tstop:
+            break
+        if t > t0:
+            segments.append((t0, t, running))
+            t0 = t
+        running = i if type(i) is list else [i]
+    segments.append((t0, tstop, running))
+
+    return segments
+
+
+def run_calibration(configfile, steps, variables):
+    '''Run each instance shortly to measure its performance
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+    steps : int
+        number of time steps per instance
+    variables : list
+        names of variables to read the shape of
+
+    Returns
+    -------
+    dict
+        dictionary with variable shapes, simulation speed per
+        instance in simulation seconds per wall clock second, mean
+        switch latency and peak memory per instance process
+
+    '''
+
+    from xbeachmi.model import XBeachMI
+
+    result = {
+        'shapes' : {},
+        'speed' : {},
+        'switch_time' : 0.,
+        'peak_rss' : {},
+    }
+
+    engine = XBeachMI(configfile=configfile)
+    engine.initialize()
+
+    try:
+        for var in variables:
+            result['shapes'][var] = tuple(engine.get_var_shape(var))
+
+        names = sorted(engine.instances.keys())
+        for instance in names:
+            logger.info('Calibrating "%s"...' % instance)
+            engine.running = [instance]
+            t0 = engine.get_current_time()
+            wall = time.time()
+            for i in range(steps):
+                engine._call('update', (-1,))
+            wall = time.time() - wall
+            dt = engine.get_current_time() - t0
+            result['speed'][instance] = dt / wall if wall > 0. else None
+
+        wall = time.time()
+        for i in range(len(names)):
+            engine.set_instances([names[(i+1) % len(names)]])
+        result['switch_time'] = (time.time() - wall) / len(names)
+
+        for instance, r in engine.get_resources().items():
+            if r is not None:
+                result['peak_rss'][instance] = r['peak_rss']
+
+    finally:
+        engine.finalize()
+
+    return result
+
+
+def format_plan(plan):
+    '''Format plan for printing
+
+    Parameters
+    ----------
+    plan : dict
+        plan as returned by :func:`plan`
+
+    Returns
+    -------
+    list
+        lines of report
+
+    '''
+
+    def mb(n):
+        return '%0.1f MB' % (n / 1e6)
+
+    lines = []
+    lines.append('Instances:           %s' % ', '.join(plan['instances']))
+    lines.append('Grid:                %d x %d, %d directional bins' %
+                 (plan['grid']['x'], plan['grid']['y'], plan['grid']['theta']))
+    lines.append('Simulation period:   %g - %g s' % (plan['tstart'], plan['tstop']))
+    lines.append('Scenario segments:   %d' % plan['segments'])
+    lines.append('Switches:            %d' % plan['switches'])
+    lines.append('Aggregations:        %d' % plan['aggregations'])
+    lines.append('Exchange per switch: %s per instance' % mb(plan['exchange_bytes']))
+    lines.append('IPC volume:          %s' % mb(plan['ipc_bytes']))
+    lines.append('Output writes:       %d' % plan['output_writes'])
+    lines.append('Output size:         %s' % mb(plan['output_bytes']))
+    lines.append('Coordinator memory:  %s' % mb(plan['coordinator_bytes']))
+
+    if plan['instance_bytes'] is not None:
+        for instance in sorted(plan['instance_bytes'].keys()):
+            if plan['instance_bytes'][instance] is not None:
+                lines.append('Peak memory:         %s (%s)' %
+                             (mb(plan['instance_bytes'][instance]), instance))
+    if plan['wall_time'] is not None:
+        lines.append('Wall time:           %0.1f h' % (plan['wall_time'] / 3600.))
+
+    return lines
@@ -0,0 +1,374 @@
+import os
+import csv
+import logging
+import numpy as np
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+class Plugin:
+    '''In-situ analysis plugin
+
+    Base class for plugins that reduce model fields to small time
+    series while the model is running, such that the full fields do
+    not need to be stored. Plugins list the variables they need in
+    :attr:`variables`. The wrapper calls :func:`sample` every
+    sample interval and :func:`compute` every output interval with
+    a dictionary of current fields. The fields are read-only and
+    may be views on model engine or shared memory, which are only
+    valid during the call. Plugins should copy any values they want
+    to keep.
+
+    '''
+
+
+    variables = []
+
+
+    def __init__(self, name, x, y, options=None):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        name : str
+            name of plugin, used to name its output
+        x : np.ndarray
+            cross-shore coordinates
+        y : np.ndarray
+            alongshore coordinates
+        options : dict, optional
+            plugin specific options
+
+        '''
+
+        self.name = name
+        self.x = np.asarray(x, dtype='float64')
+        self.y = np.asarray(y, dtype='float64')
+        self.options = options or {}
+
+
+    def get_dimensions(self):
+        '''Return plugin specific dimensions
+
+        Returns
+        -------
+        dict
+            dictionary with dimension names as keys and coordinate
+            values as values
+
+        '''
+
+        return {}
+
+
+    def get_outputs(self):
+        '''Return outputs of plugin
+
+        Returns
+        -------
+        dict
+            dictionary with output names as keys and tuples with
+            dimension names, excluding time, as values. Dimensions
+            are either "x", "y" or plugin specific dimensions.
+
+        '''
+
+        return {}
+
+
+    def sample(self, t, fields):
+        '''Sample fields in between outputs
+
+        Parameters
+        ----------
+        t : float
+            current time
+        fields : dict
+            dictionary with variable names as keys and read-only
+            arrays as values
+
+        '''
+
+        pass
+
+
+    def compute(self, t, fields):
+        '''Compute outputs
+
+        Parameters
+        ----------
+        t : float
+            current time
+        fields : dict
+            dictionary with variable names as keys and read-only
+            arrays as values
+
+        Returns
+        -------
+        dict
+            dictionary with output names as keys and scalars or
+            arrays as values
+
+        '''
+
+        return {}
+
+
+    def finalize(self):
+        '''Finalize plugin'''
+
+        pass
+
+
+    def get_cell_widths(self):
+        '''Return cross-shore cell widths'''
+
+        if len(self.x) < 2:
+            return np.ones(len(self.x))
+        return np.abs(np.gradient(self.x))
+
+
+class SedimentVolume(Plugin):
+    '''Sediment volume per profile section
+
+    Computes the volume of sediment above a reference level per
+    unit width in cross-shore sections of each profile.
+
+    Options
+    -------
+    sections : list
+        list of cross-shore ranges [xmin, xmax], defaults to the
+        entire profile
+    level : float
+        reference level, defaults to 0
+
+    '''
+
+
+    variables = ['zb']
+
+
+    def __init__(self, name, x, y, options=None):
+        Plugin.__init__(self, name, x, y, options)
+        self.sections = self.options.get('sections', [[self.x.min(), self.x.max()]]
+                                         if len(self.x) > 0 else [])
+        self.level = self.options.get('level', 0.)
+        self.weights = np.zeros((len(self.x), len(self.sections)))
+        dx = self.get_cell_widths()
+        for i, (xmin, xmax) in enumerate(self.sections):
+            self.weights[:,i] = dx * ((self.x >= xmin) & (self.x <= xmax))
+
+
+    def get_dimensions(self):
+        return {'section' : np.arange(len(self.sections))}
+
+
+    def get_outputs(self):
+        return {'volume' : ('y', 'section')}
+
+
+    def compute(self, t, fields):
+        h = np.maximum(fields['zb'] - self.level, 0.).reshape((len(self.y), len(self.x)))
+        return {'volume' : np.dot(h, self.weights)}
+
+
+class Shoreline(Plugin):
+    '''Shoreline position per profile
+
+    Determines the cross-shore position of the first crossing of the
+    bed level with a reference level, starting from the offshore
+    boundary, linearly interpolated between grid cells. Profiles
+    without a crossing get a NaN value.
+
+    Options
+    -------
+    level : float
+        reference level, defaults to 0
+
+    '''
+
+
+    variables = ['zb']
+
+
+    def __init__(self, name, x, y, options=None):
+        Plugin.__init__(self, name, x, y, options)
+        self.level = self.options.get('level', 0.)
+
+
+    def get_outputs(self):
+        return {'position' : ('y',)}
+
+
+    def compute(self, t, fields):
+        zb = np.asarray(fields['zb']).reshape((len(self.y), len(self.x))) - self.level
+        position = np.zeros(len(self.y)) + np.nan
+        dry = zb >= 0.
+        for j in range(len(self.y)):
+            i = np.argmax(dry[j])
+            if not dry[j,i]:
+                continue
+            if i == 0:
+                position[j] = self.x[0]
+            else:
+                f = -zb[j,i-1] / (zb[j,i] - zb[j,i-1])
+                position[j] = self.x[i-1] + f * (self.x[i] - self.x[i-1])
+        return {'position' : position}
+
+
+class MaxRunup(Plugin):
+    '''Maximum run-up per profile
+
+    Determines the water level at the most landward wet cell of each
+    profile every sample interval and returns the maximum since the
+    previous output. Set a short sample interval to capture
+    individual swash events.
+
+    Options
+    -------
+    eps : float
+        minimum water depth of wet cells, defaults to 0.01
+
+    '''
+
+
+    variables = ['zs', 'zb']
+
+
+    def __init__(self, name, x, y, options=None):
+        Plugin.__init__(self, name, x, y, options)
+        self.eps = self.options.get('eps', .01)
+        self.runup = np.zeros(len(self.y)) - np.inf
+        self.position = np.zeros(len(self.y)) + np.nan
+
+
+    def get_outputs(self):
+        return {'runup' : ('y',), 'position' : ('y',)}
+
+
+    def sample(self, t, fields):
+        shape = (len(self.y), len(self.x))
+        zs = np.asarray(fields['zs']).reshape(shape)
+        wet = zs - np.asarray(fields['zb']).reshape(shape) > self.eps
+        for j in range(len(self.y)):
+            i = np.nonzero(wet[j])[0]
+            if len(i) > 0 and zs[j,i[-1]] > self.runup[j]:
+                self.runup[j] = zs[j,i[-1]]
+                self.position[j] = self.x[i[-1]]
+
+
+    def compute(self, t, fields):
+        self.sample(t, fields)
+        runup = np.where(np.isfinite(self.runup), self.runup, np.nan)
+        result = {'runup' : runup, 'position' : self.position.copy()}
+        self.runup[:] = -np.inf
+        self.position[:] = np.nan
+        return result
+
+
+PLUGINS = {
+    'sediment_volume' : SedimentVolume,
+    'shoreline' : Shoreline,
+    'max_runup' : MaxRunup,
+}
+
+
+def load_plugin(cfg, x, y):
+    '''Create plugin from configuration
+
+    Parameters
+    ----------
+    cfg : dict
+        plugin configuration with the name of a built-in plugin or
+        the full path of a plugin class in the "class" entry and
+        optional "name" and "options" entries
+    x : np.ndarray
+        cross-shore coordinates
+    y : np.ndarray
+        alongshore coordinates
+
+    Returns
+    -------
+    Plugin
+        plugin object
+
+    '''
+
+    name = cfg['class']
+    if name in PLUGINS.keys():
+        cls = PLUGINS[name]
+    else:
+        module, _, clsname = name.rpartition('.')
+        if not module:
+            raise ValueError('Unknown plugin [%s]' % name)
+        cls = getattr(__import__(module, fromlist=[clsname]), clsname)
+
+    return cls(cfg.get('name', name.split('.')[-1].lower()), x, y,
+               options=cfg.get('options', {}))
+
+
+class CSVWriter:
+    '''Write plugin outputs as time series to a CSV file
+
+    Each output is flattened into one column per element, named
+    after the output and the element index.
+
+    '''
+
+
+    def __init__(self, filename, outputs, sizes):
+        '''Initialize the class
+
+        Creates the CSV file with a header row.
+
+        Parameters
+        ----------
+        filename : str
+            path to CSV file
+        outputs : dict
+            dictionary with output names as keys and dimension
+            tuples as values, see :func:`Plugin.get_outputs`
+        sizes : dict
+            dictionary with dimension sizes
+
+        '''
+
+        self.filename = filename
+        self.outputs = sorted(outputs.keys())
+
+        columns = ['time']
+        for output in self.outputs:
+            shape = tuple([sizes[dim] for dim in outputs[output]])
+            if len(shape) == 0:
+                columns.append(output)
+            else:
+                columns.extend(['%s_%s' % (output, '_'.join([str(i) for i in idx]))
+                                for idx in np.ndindex(*shape)])
+
+        path = os.path.dirname(filename)
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+        with open(self.filename, 'w') as fp:
+            csv.writer(fp).writerow(columns)
+
+
+    def append(self, t, values):
+        '''Append row to CSV file
+
+        Parameters
+        ----------
+        t : float
+            current time
+        values : dict
+            dictionary with output names as keys and values as
+            values
+
+        '''
+
+        row = [t]
+        for output in self.outputs:
+            row.extend(np.ravel(values[output]).tolist())
+        with open(self.filename, 'a') as fp:
+            csv.writer(fp).writerow(row)
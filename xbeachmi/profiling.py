@@ -0,0 +1,314 @@
+import os
+import time
+import json
+import math
+import pickle
+import logging
+import numpy as np
+
+import xbeachmi.worker
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# phases of a call between coordinator and instance process
+PHASES = ['queue', 'execute', 'serialize', 'return', 'total']
+
+
+class Histogram:
+    '''Histogram with logarithmic bins
+
+    Low-overhead histogram for durations. Bin edges are powers of two
+    of microseconds, such that a value can be assigned to its bin in
+    constant time without storing individual values.
+
+    '''
+
+
+    nbins = 32
+
+
+    def __init__(self):
+        '''Initialize the class'''
+
+        self.counts = [0] * self.nbins
+        self.count = 0
+        self.total = 0.
+        self.min = np.inf
+        self.max = 0.
+
+
+    def add(self, value):
+        '''Add value to histogram
+
+        Parameters
+        ----------
+        value : float
+            duration in seconds
+
+        '''
+
+        i = int(math.log(max(value, 1e-6) * 1e6, 2))
+        self.counts[min(max(i, 0), self.nbins - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+
+    def mean(self):
+        '''Return mean value'''
+
+        return self.total / self.count if self.count > 0 else 0.
+
+
+    def percentile(self, q):
+        '''Return approximate percentile
+
+        Parameters
+        ----------
+        q : float
+            percentile between 0 and 100
+
+        Returns
+        -------
+        float
+            upper edge of the bin containing the percentile
+
+        '''
+
+        n = 0
+        for i, c in enumerate(self.counts):
+            n += c
+            if n >= q / 100. * self.count:
+                return min(2.**(i+1) * 1e-6, self.max)
+        return self.max
+
+
+class CallProfiler:
+    '''Profiler for calls from coordinator to instance processes
+
+    Records for each combination of function name and instance the
+    number of calls, the number of bytes sent and received and
+    histograms of the wall time spent in each phase of the call:
+
+    * queue: from putting the command on the queue until the
+      instance process picks it up
+    * execute: execution of the command in the instance process
+    * serialize: pickling of the result in the instance process
+    * return: transfer and unpickling of the result
+    * total: complete call as seen by the coordinator
+
+    '''
+
+
+    def __init__(self):
+        '''Initialize the class'''
+
+        self.stats = {}
+        self.start = time.time()
+
+
+    def send(self, fcn, args):
+        '''Return command tuple with timestamp for instance process
+
+        Parameters
+        ----------
+        fcn : str
+            name of function
+        args : tuple
+            function arguments
+
+        Returns
+        -------
+        tuple
+            command tuple understood by :func:`execute`
+
+        '''
+
+        return (fcn, args, time.time())
+
+
+    def receive(self, fcn, instance, args, r, t):
+        '''Unpack result from instance process and record timing
+
+        Parameters
+        ----------
+        fcn : str
+            name of function
+        instance : str
+            name of instance
+        args : tuple
+            function arguments
+        r : tuple
+            result of :func:`execute`
+        t : float
+            time the command was sent
+
+        Returns
+        -------
+        any
+            function result
+
+        '''
+
+        if r is None:
+            return None
+
+        payload, (queue, execute, serialize, sent) = r
+        val = pickle.loads(payload)
+        now = time.time()
+
+        key = (fcn, instance)
+        if key not in self.stats.keys():
+            self.stats[key] = {
+                'count' : 0,
+                'bytes_to' : 0,
+                'bytes_from' : 0,
+                'histograms' : {p : Histogram() for p in PHASES},
+            }
+
+        stats = self.stats[key]
+        stats['count'] += 1
+        stats['bytes_to'] += sum([a.nbytes for a in args if isinstance(a, np.ndarray)])
+        stats['bytes_from'] += len(payload)
+        for phase, value in zip(PHASES, (queue, execute, serialize, now - sent, now - t)):
+            stats['histograms'][phase].add(value)
+
+        return val
+
+
+    def report(self):
+        '''Return summary report of all recorded calls
+
+        Returns
+        -------
+        list
+            lines of report
+
+        '''
+
+        lines = []
+        lines.append('Call profile after %0.1f s (phase columns are means in ms)' %
+                     (time.time() - self.start))
+        lines.append('%-16s %-12s %8s %10s %10s %10s %10s %10s %10s %10s %10s %10s' %
+                     ('function', 'instance', 'calls', 'total [s]', 'mean [ms]',
+                      'p95 [ms]', 'queue', 'execute', 'serialize', 'return',
+                      'sent [MB]', 'recv [MB]'))
+
+        keys = sorted(self.stats.keys(),
+                      key=lambda k: -self.stats[k]['histograms']['total'].total)
+        for fcn, instance in keys:
+            stats = self.stats[(fcn, instance)]
+            h = stats['histograms']
+            lines.append('%-16s %-12s %8d %10.3f %10.3f %10.3f %10.3f %10.3f %10.3f %10.3f %10.3f %10.3f' %
+                         (fcn, instance, stats['count'],
+                          h['total'].total,
+                          h['total'].mean() * 1e3,
+                          h['total'].percentile(95) * 1e3,
+                          h['queue'].mean() * 1e3,
+                          h['execute'].mean() * 1e3,
+                          h['serialize'].mean() * 1e3,
+                          h['return'].mean() * 1e3,
+                          stats['bytes_to'] / 1e6,
+                          stats['bytes_from'] / 1e6))
+
+        return lines
+
+
+    def log_report(self, *args):
+        '''Write summary report to log, usable as signal handler'''
+
+        for line in self.report():
+            logger.info(line)
+
+
+def execute(w, fcn, args, t, call=None):
+    '''Execute a command on a model engine and record timing
+
+    Used in the instance process instead of
+    :func:`xbeachmi.worker.execute` if the coordinator sends a
+    timestamp with the command. The result is pickled explicitly to
+    measure the serialization time and payload size.
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    fcn : str
+        name of command
+    args : tuple
+        command arguments
+    t : float
+        time the command was sent by the coordinator
+    call : function, optional
+        function executing the command, defaults to
+        :func:`xbeachmi.worker.execute`
+
+    Returns
+    -------
+    tuple
+        pickled result and tuple with queue, execution and
+        serialization time and the time the result is sent
+
+    '''
+
+    if call is None:
+        call = xbeachmi.worker.execute
+
+    t0 = time.time()
+    r = call(w, fcn, args)
+    t1 = time.time()
+    payload = pickle.dumps(r, pickle.HIGHEST_PROTOCOL)
+    t2 = time.time()
+
+    return payload, (t0 - t, t1 - t0, t2 - t1, t2)
+
+
+def dump_worker_profile(path, instance, profiler, timing):
+    '''Write profile of instance process
+
+    Writes the :mod:`cProfile` statistics to "<instance>.<pid>.prof",
+    which can be inspected with :mod:`pstats` or tools like
+    snakeviz, and the time spent per command to
+    "<instance>.<pid>.json".
+
+    Parameters
+    ----------
+    path : str
+        profile directory
+    instance : str
+        name of instance
+    profiler : cProfile.Profile
+        profiler of instance process
+    timing : dict
+        dictionary with command names as keys and
+        :class:`Histogram` objects as values
+
+    '''
+
+    if not os.path.exists(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            pass # created by other instance process
+
+    fname = os.path.join(path, '%s.%d' % (instance, os.getpid()))
+
+    profiler.dump_stats('%s.prof' % fname)
+
+    with open('%s.json' % fname, 'w') as fp:
+        json.dump({
+            fcn : {
+                'count' : h.count,
+                'total' : h.total,
+                'mean' : h.mean(),
+                'p50' : h.percentile(50),
+                'p95' : h.percentile(95),
+                'max' : h.max,
+            } for fcn, h in timing.items()
+        }, fp, indent=4)
+
+    logger.info('Profile of "%s" written to "%s.prof"' % (instance, fname))
@@ -8,8 +8,6 @@ class ProgressIndicator:
 
     fmt = ['[%5.1f%%] %s / %s / %s',
            '         t: %5.3f, avg. dt: %5.3f']
-    spaces = {}
-    default_space = None
 
 
     def __init__(self, duration=3600., fraction=.1, interval=60., spaces=['log', 'output']):
@@ -34,6 +32,8 @@ class ProgressIndicator:
         self.interval = interval # in real-world time
         self.last = 0. # in simulation time
         self.i = 1
+        self.spaces = {}
+        self.default_space = None
 
         t0 = time.time() # in real-world time
         for space in spaces:
@@ -0,0 +1,297 @@
+import os
+import json
+import logging
+import numpy as np
+from datetime import datetime
+
+import xbeachmi.netcdf
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+HEADER = 'header.json'
+VERSION = 1
+
+
+# cache of headers of opened raw output directories
+_headers = {}
+
+
+def initialize(path, dimensions, variables=None, attributes=None, crs=None,
+               times=None, instances=None):
+    '''Initialize raw binary output directory
+
+    Creates an output directory with an empty raw binary file for
+    each variable and a JSON header describing the dimensions,
+    variables, global attributes and coordinate reference system
+    (crs). The arguments are the same as for
+    :func:`xbeachmi.netcdf.initialize`, such that both output
+    backends can be used interchangeably.
+
+    Each time-dependent variable is stored as a C-ordered sequence of
+    fixed-size records, one for each time step, in its own file. The
+    files can therefore be opened with :class:`numpy.memmap` without
+    any parsing, see :func:`read`. Static variables, like the
+    coordinate variables of each dimension, are stored as a single
+    record.
+
+    Parameters
+    ----------
+    path : str
+        path to output directory
+    dimensions : dict
+        dict with dimension variables
+    variables : dict
+        dict of dicts with other variables, where each variable
+        defines at least its dimensions
+    attributes : dict
+        dict with global attributes
+    crs : dict
+        dict with EPSG attributes for local coordinate reference system (crs)
+    times : list
+        names of additional time dimensions for variables that are
+        written at their own interval
+    instances : list
+        names of instances, if given a "realization" dimension is
+        added that variables may use to store values per instance
+
+    '''
+
+    if times is None:
+        times = []
+    if variables is None:
+        variables = {}
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    timedims = ['time'] + list(times)
+    sizes = {dim : len(values) for dim, values in dimensions.items()}
+    if instances is not None:
+        sizes['realization'] = len(instances)
+
+    header = {
+        'version' : VERSION,
+        'date_created' : datetime.strftime(datetime.utcnow(), '%Y-%m-%dT%H:%MZ'),
+        'dimensions' : sizes,
+        'times' : timedims,
+        'instances' : instances,
+        'attributes' : attributes or {},
+        'crs' : crs or {},
+        'variables' : {},
+    }
+
+    # coordinate variables
+    for dim, values in dimensions.items():
+        header['variables'][dim] = _write_static(path, dim, (dim,), values)
+
+    for time in timedims:
+        header['variables'][time] = _create(path, time, (time,), (), 'float64')
+
+    header['variables']['instance'] = _create(path, 'instance', ('time',), (), 'S128')
+
+    # other variables
+    for var, props in variables.items():
+        dims = tuple(props['dimensions'])
+        if 'values' in props.keys():
+            header['variables'][var] = _write_static(path, var, dims, props['values'])
+        else:
+            shape = tuple([sizes[dim] for dim in dims[1:]])
+            header['variables'][var] = _create(path, var, dims, shape, 'float32')
+        if 'cell_methods' in props.keys():
+            header['variables'][var]['cell_methods'] = props['cell_methods']
+
+    with open(os.path.join(path, HEADER), 'w') as fp:
+        json.dump(header, fp, indent=4)
+
+    _headers[os.path.abspath(path)] = header
+
+
+def append(path, idx, variables, time='time'):
+    '''Write data to existing raw binary output directory
+
+    Parameters
+    ----------
+    path : str
+        path to output directory
+    idx : int
+        time index to write to
+    variables : dict
+        dict with variable names (keys) and data to be
+        appended (values)
+    time : str, optional
+        name of time dimension the variables are appended to
+
+    '''
+
+    header = read_header(path)
+
+    for name, value in variables.items():
+        props = header['variables'][name]
+        record = np.ascontiguousarray(value, dtype=props['dtype'])
+        with open(os.path.join(path, props['file']), 'r+b') as fp:
+            fp.seek(idx * record.nbytes)
+            fp.write(record.tobytes())
+
+
+def read_header(path):
+    '''Read header of raw binary output directory
+
+    Parameters
+    ----------
+    path : str
+        path to output directory
+
+    Returns
+    -------
+    dict
+        header with dimensions, variables and attributes
+
+    '''
+
+    key = os.path.abspath(path)
+    if key not in _headers.keys():
+        with open(os.path.join(path, HEADER), 'r') as fp:
+            _headers[key] = json.load(fp)
+
+    return _headers[key]
+
+
+def read(path, variables=None, mode='r'):
+    '''Open variables in raw binary output directory as memory maps
+
+    Time-dependent variables get the number of time steps written so
+    far as first axis. Reading, for example, the time series of a
+    single grid cell only touches the pages of the file holding that
+    cell.
+
+    Parameters
+    ----------
+    path : str
+        path to output directory
+    variables : list, optional
+        names of variables to open, defaults to all variables
+    mode : str, optional
+        memory map mode, defaults to read-only
+
+    Returns
+    -------
+    dict
+        dict with variable names (keys) and memory mapped arrays (values)
+
+    '''
+
+    header = read_header(path)
+    if variables is None:
+        variables = header['variables'].keys()
+
+    data = {}
+    for var in variables:
+        props = header['variables'][var]
+        fname = os.path.join(path, props['file'])
+        dtype = np.dtype(props['dtype'])
+        shape = tuple(props['shape'])
+
+        if props['static']:
+            data[var] = np.memmap(fname, dtype=dtype, mode=mode, shape=shape)
+        else:
+            n = os.path.getsize(fname) // (dtype.itemsize * int(np.prod(shape)))
+            if n == 0:
+                data[var] = np.zeros((0,) + shape, dtype=dtype)
+            else:
+                data[var] = np.memmap(fname, dtype=dtype, mode=mode,
+                                      shape=(n,) + shape)
+
+    return data
+
+
+def to_netcdf(path, ncfile):
+    '''Convert raw binary output directory to netCDF4 file
+
+    Creates a netCDF4 file with the same CF layout as written by
+    :mod:`xbeachmi.netcdf` and copies all time steps. If the files of
+    a time dimension hold a different number of time steps, for
+    example after an interrupted run, only the time steps present in
+    all files are copied.
+
+    Parameters
+    ----------
+    path : str
+        path to raw output directory
+    ncfile : str
+        path to netCDF4 file
+
+    '''
+
+    header = read_header(path)
+    data = read(path)
+
+    timedims = header['times']
+    dimensions = {}
+    variables = {}
+    for var, props in header['variables'].items():
+        if var in timedims or var == 'instance':
+            continue
+        if props['static'] and tuple(props['dimensions']) == (var,):
+            dimensions[var] = np.asarray(data[var])
+        else:
+            variables[var] = {'dimensions' : tuple(props['dimensions'])}
+            if 'cell_methods' in props.keys():
+                variables[var]['cell_methods'] = props['cell_methods']
+            if props['static']:
+                variables[var]['values'] = np.asarray(data[var])
+
+    xbeachmi.netcdf.initialize(ncfile,
+                               dimensions,
+                               variables=variables,
+                               attributes=header['attributes'],
+                               crs=header['crs'],
+                               times=[t for t in timedims if t != 'time'],
+                               instances=header['instances'])
+
+    for time in timedims:
+        names = [var for var, props in header['variables'].items()
+                 if not props['static'] and props['dimensions'][0] == time]
+        n = min([len(data[var]) for var in names + [time]])
+        if n < max([len(data[var]) for var in names + [time]]):
+            logger.warning('Truncated output in "%s", converting %d time steps of "%s"' %
+                           (path, n, time))
+        for idx in range(n):
+            xbeachmi.netcdf.append(ncfile,
+                                   idx=idx,
+                                   variables={var : data[var][idx] for var in names},
+                                   time=time)
+
+
+def _create(path, var, dims, shape, dtype):
+    '''Create empty file for time-dependent variable'''
+
+    fname = '%s.bin' % var
+    open(os.path.join(path, fname), 'wb').close()
+
+    return {
+        'file' : fname,
+        'dimensions' : list(dims),
+        'shape' : list(shape),
+        'dtype' : np.dtype(dtype).str,
+        'static' : False,
+    }
+
+
+def _write_static(path, var, dims, values):
+    '''Write file for static variable'''
+
+    fname = '%s.bin' % var
+    values = np.asarray(values, dtype='float32')
+    with open(os.path.join(path, fname), 'wb') as fp:
+        fp.write(np.ascontiguousarray(values).tobytes())
+
+    return {
+        'file' : fname,
+        'dimensions' : list(dims),
+        'shape' : list(values.shape),
+        'dtype' : values.dtype.str,
+        'static' : True,
+    }
@@ -0,0 +1,93 @@
+import os
+
+
+def read_resources(pid=None):
+    '''Read resource usage of a process from /proc
+
+    Parameters
+    ----------
+    pid : int, optional
+        process id, defaults to current process
+
+    Returns
+    -------
+    dict
+        dictionary with process id, resident set size (rss) and peak
+        resident set size (peak_rss) in bytes, CPU time in seconds
+        and number of open files, values that cannot be read are None
+
+    '''
+
+    if pid is None:
+        pid = os.getpid()
+
+    resources = {
+        'pid' : pid,
+        'rss' : None,
+        'peak_rss' : None,
+        'cpu_time' : None,
+        'open_files' : None,
+    }
+
+    proc = '/proc/%d' % pid
+
+    try:
+        with open(os.path.join(proc, 'status'), 'r') as fp:
+            for line in fp:
+                if line.startswith('VmRSS:'):
+                    resources['rss'] = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    resources['peak_rss'] = int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+
+    try:
+        with open(os.path.join(proc, 'stat'), 'r') as fp:
+            # skip command name, which may contain spaces
+            fields = fp.read().rsplit(')', 1)[1].split()
+        ticks = float(os.sysconf('SC_CLK_TCK'))
+        resources['cpu_time'] = (int(fields[11]) + int(fields[12])) / ticks
+    except (IOError, OSError, IndexError, ValueError):
+        pass
+
+    try:
+        resources['open_files'] = len(os.listdir(os.path.join(proc, 'fd')))
+    except (IOError, OSError):
+        pass
+
+    return resources
+
+
+def format_resources(resources):
+    '''Format resource usage of multiple processes for logging
+
+    Parameters
+    ----------
+    resources : dict
+        dictionary with process names as keys and resource usage
+        dictionaries as returned by :func:`read_resources` as values
+
+    Returns
+    -------
+    list
+        lines with resource usage per process
+
+    '''
+
+    def mb(n):
+        return '%8.1f MB' % (n / 1e6) if n is not None else '%11s' % '-'
+
+    lines = []
+    for name in sorted(resources.keys()):
+        r = resources[name]
+        if r is None:
+            continue
+        line = '%-16s rss: %s, peak: %s, cpu: %s, files: %s' % (
+            name, mb(r['rss']), mb(r['peak_rss']),
+            '%8.1f s' % r['cpu_time'] if r['cpu_time'] is not None else '-',
+            r['open_files'] if r['open_files'] is not None else '-')
+        if 'data_bytes' in r.keys():
+            line += ', data: %s' % mb(r['data_bytes'])
+        lines.append(line)
+
+    return lines
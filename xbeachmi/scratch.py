@@ -0,0 +1,222 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import traceback
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# name of directory holding snapshots of files to be copied back
+STAGING = '.staging'
+
+
+class ScratchDirectory:
+    '''Scratch directory with staged copy-back of results
+
+    Creates a unique run directory below a fast local path, like
+    "/dev/shm" or node-local disk, to hold the instance directories
+    and output files of a run instead of the directory of the
+    configuration file. Files created or modified by the run are
+    copied back to the corresponding location relative to the
+    directory of the configuration file in two stages:
+
+    1. :func:`stage` takes a snapshot of all files that changed since
+       the previous stage into a staging directory on the scratch
+       path. The snapshot is a fast local copy and is taken between
+       time steps, while the instances and output writers are idle,
+       such that the copied files are consistent.
+    2. A background thread copies the snapshot to the destination,
+       writing each file under a temporary name that is renamed when
+       complete, and removes the snapshot.
+
+    The run continues while the snapshot is copied back. A stage is
+    skipped if the copy-back of the previous stage is not finished
+    yet. :func:`close` stages all remaining changes, waits for the
+    copy-back and removes the scratch directory, unless copying back
+    failed.
+
+    '''
+
+
+    def __init__(self, root, path, interval=0):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        root : str
+            destination directory of the results, usually the
+            directory of the configuration file
+        path : str
+            fast local path to create the scratch directory in,
+            environment variables like "$TMPDIR" are expanded
+        interval : float, optional
+            interval in simulation time between stages, only at the
+            end of the run if zero
+
+        '''
+
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self.path = tempfile.mkdtemp(prefix='xbeachmi-',
+                                     dir=os.path.expanduser(os.path.expandvars(path)))
+        self.staging = os.path.join(self.path, STAGING)
+        self.staged = {}
+        self.failed = []
+        self.thread = None
+
+        logger.info('Using scratch directory "%s"' % self.path)
+
+
+    def get_path(self, relpath):
+        '''Return location of file or directory on the scratch path
+
+        Parameters
+        ----------
+        relpath : str
+            path relative to the destination directory
+
+        Returns
+        -------
+        str
+            absolute path, unchanged if ``relpath`` is absolute
+
+        '''
+
+        return os.path.join(self.path, relpath)
+
+
+    def mark(self):
+        '''Mark all current files as staged
+
+        Files present on the scratch path when marked, like the model
+        input copied into the instance directories, are only copied
+        back if they are modified afterwards.
+
+        '''
+
+        self.staged.update(self._changed())
+
+
+    def busy(self):
+        '''Return True if the copy-back of a stage is in progress'''
+
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def stage(self):
+        '''Take snapshot of changed files and start copying it back
+
+        Returns
+        -------
+        bool
+            True if a stage is started, False if no files changed or
+            the previous stage is still being copied back
+
+        '''
+
+        if self.busy():
+            logger.warning('Copy-back of previous stage still in progress, '
+                           'skipping stage')
+            return False
+
+        changed = self._changed()
+        if not changed:
+            return False
+
+        t0 = time.time()
+        nbytes = 0
+        for relpath, stat in changed.items():
+            dst = os.path.join(self.staging, relpath)
+            if not os.path.exists(os.path.dirname(dst)):
+                os.makedirs(os.path.dirname(dst))
+            shutil.copy2(os.path.join(self.path, relpath), dst)
+            nbytes += stat[0]
+        self.staged.update(changed)
+
+        logger.debug('Staged %d files (%0.1f MB) in %0.3f s' %
+                     (len(changed), nbytes / 1e6, time.time() - t0))
+
+        self.thread = threading.Thread(target=self._copy_back, args=(list(changed.keys()),))
+        self.thread.daemon = True
+        self.thread.start()
+
+        return True
+
+
+    def wait(self):
+        '''Wait for the copy-back of the current stage to finish'''
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+    def close(self):
+        '''Copy back all remaining changes and remove scratch directory'''
+
+        self.wait()
+        self.stage()
+        self.wait()
+
+        if self.failed:
+            logger.error('Failed to copy back %d files, keeping scratch directory "%s"' %
+                         (len(self.failed), self.path))
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+            logger.debug('Removed scratch directory "%s"' % self.path)
+
+
+    def _changed(self):
+        '''Return files that changed since they were last staged
+
+        Returns
+        -------
+        dict
+            paths relative to the scratch directory as keys and
+            tuples with size and modification time as values
+
+        '''
+
+        changed = {}
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            if dirpath == self.path and STAGING in dirnames:
+                dirnames.remove(STAGING)
+            for f in filenames:
+                path = os.path.join(dirpath, f)
+                s = os.stat(path)
+                stat = (s.st_size, s.st_mtime)
+                relpath = os.path.relpath(path, self.path)
+                if self.staged.get(relpath) != stat:
+                    changed[relpath] = stat
+
+        return changed
+
+
+    def _copy_back(self, relpaths):
+        '''Copy snapshot to destination, run in background thread'''
+
+        t0 = time.time()
+        for relpath in relpaths:
+            src = os.path.join(self.staging, relpath)
+            dst = os.path.join(self.root, relpath)
+            try:
+                if not os.path.exists(os.path.dirname(dst)):
+                    os.makedirs(os.path.dirname(dst))
+                shutil.copy2(src, '%s.tmp' % dst)
+                os.rename('%s.tmp' % dst, dst)
+                os.remove(src)
+                if relpath in self.failed:
+                    self.failed.remove(relpath)
+            except:
+                logger.error('Failed to copy back "%s"' % relpath)
+                logger.error(traceback.format_exc())
+                self.staged.pop(relpath, None) # retry in next stage
+                if relpath not in self.failed:
+                    self.failed.append(relpath)
+
+        logger.debug('Copied back %d files in %0.3f s' % (len(relpaths), time.time() - t0))
@@ -0,0 +1,353 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import subprocess
+import multiprocessing
+
+import xbeachmi.model
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+STATUS = 'status.json'
+
+
+def read_table(filename):
+    '''Read parameter table
+
+    The table is either a CSV file with a header row or a JSON file
+    with a list of dictionaries. Each row defines a run with the
+    column names as parameter names. The optional column "run_id" is
+    used as name of the run directory. Numeric CSV values are
+    converted to numbers.
+
+    Parameters
+    ----------
+    filename : str
+        path to CSV or JSON file
+
+    Returns
+    -------
+    list
+        list of dictionaries with parameter names as keys and
+        parameter values as values
+
+    '''
+
+    if filename.endswith('.json'):
+        with open(filename, 'r') as fp:
+            return json.load(fp)
+
+    rows = []
+    with open(filename, 'r') as fp:
+        for row in csv.DictReader(fp):
+            rows.append({k.strip() : parse_value(v) for k, v in row.items()})
+
+    return rows
+
+
+def parse_value(value):
+    '''Convert CSV value to number if possible
+
+    Parameters
+    ----------
+    value : str
+        CSV value
+
+    Returns
+    -------
+    str, int or float
+        parsed value
+
+    '''
+
+    value = value.strip()
+    for fcn in (int, float):
+        try:
+            return fcn(value)
+        except ValueError:
+            pass
+    return value
+
+
+def get_run_id(row, i):
+    '''Return name of run directory
+
+    Parameters
+    ----------
+    row : dict
+        parameters of run
+    i : int
+        index of run in parameter table
+
+    Returns
+    -------
+    str
+        value of "run_id" column or a name composed of the index and
+        the parameter values
+
+    '''
+
+    if 'run_id' in row.keys():
+        return str(row['run_id'])
+
+    name = '_'.join(['%s%s' % (k, row[k]) for k in sorted(row.keys())])
+    return '%04d_%s' % (i, re.sub('[^A-Za-z0-9\.\-]+', '-', name))
+
+
+def expand(template, table, outdir):
+    '''Expand configuration template and parameter table into runs
+
+    The directory containing the configuration template is copied
+    to a run directory for each row in the parameter table. The
+    configuration template is rendered with Mako using the parameters
+    of the row, which are also added to the "markers" entry of the
+    configuration, such that they can be used in the params.txt
+    template as well. Unchanged files are not copied or written
+    again and results of previous runs are left alone.
+
+    Parameters
+    ----------
+    template : str
+        path to JSON configuration template
+    table : list
+        parameter table as returned by :func:`read_table`
+    outdir : str
+        path to directory for run directories
+
+    Returns
+    -------
+    list
+        list of dictionaries describing each run
+
+    '''
+
+    from mako.template import Template
+
+    template = os.path.abspath(template)
+    outdir = os.path.abspath(outdir)
+    srcdir, fname = os.path.split(template)
+
+    tmpl = Template(filename=template)
+
+    def ignore(src, files):
+        return [f for f in files
+                if f.startswith('.') or f.endswith('.nc') or f.endswith('.log')
+                or os.path.join(src, f) == outdir or f == fname]
+
+    runs = []
+    for i, row in enumerate(table):
+        run_id = get_run_id(row, i)
+        path = os.path.join(outdir, run_id)
+
+        try:
+            config = json.loads(tmpl.render(**row))
+        except ValueError as e:
+            raise ValueError('Invalid configuration for run "%s" [%s]' % (run_id, e))
+        config.setdefault('markers', {}).update(row)
+
+        xbeachmi.model.sync_directory(srcdir, path, ignore=ignore,
+                                      keep=[fname], delete=False)
+
+        configfile = os.path.join(path, fname)
+        xbeachmi.model.write_if_changed(configfile, json.dumps(config, indent=4))
+
+        runs.append({
+            'id' : run_id,
+            'path' : path,
+            'configfile' : configfile,
+            'parameters' : row,
+            'cores' : get_cores(config),
+        })
+
+    return runs
+
+
+def get_cores(config):
+    '''Return number of instances computing simultaneously in a run
+
+    Parameters
+    ----------
+    config : dict
+        XBeach MI configuration
+
+    Returns
+    -------
+    int
+        maximum number of simultaneously running instances
+
+    '''
+
+    instances = set(config.get('instances', []))
+    cores = 1
+    for t, i in config.get('scenario', []):
+        i = i if type(i) is list else [i]
+        instances.update(i)
+        cores = max(cores, len(i))
+
+    if 'scenario' not in config.keys():
+        cores = max(cores, len(instances))
+
+    return cores
+
+
+def read_status(path):
+    '''Read status file of run
+
+    Parameters
+    ----------
+    path : str
+        path to run directory
+
+    Returns
+    -------
+    dict
+        status of run, empty if not available
+
+    '''
+
+    try:
+        with open(os.path.join(path, STATUS), 'r') as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def write_status(run, status, **kwargs):
+    '''Write status file of run
+
+    Parameters
+    ----------
+    run : dict
+        run description as returned by :func:`expand`
+    status : str
+        status of run, i.e. "running", "done", "failed" or
+        "interrupted"
+    kwargs : dict
+        additional status items
+
+    '''
+
+    data = read_status(run['path'])
+    data.update(kwargs)
+    data['status'] = status
+    data['parameters'] = run['parameters']
+    data['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    with open(os.path.join(run['path'], STATUS), 'w') as fp:
+        json.dump(data, fp, indent=4)
+
+
+def schedule(runs, cores=None, memory=None, memory_per_instance=None,
+             verbose=30, poll=1.):
+    '''Run XBeach MI runs in a bounded pool of processes
+
+    Runs are started in order as long as the sum of the cores used by
+    the active runs does not exceed the core budget and, if given, the
+    sum of their estimated memory does not exceed the memory budget.
+    The number of cores of a run is the maximum number of instances
+    computing simultaneously, see :func:`get_cores`. The memory of a
+    run is estimated as the number of instances times the memory per
+    instance. A run exceeding the budgets on its own is started when
+    no other runs are active.
+
+    Runs with a status file marking them as done with the same
+    parameters are skipped, such that an interrupted sweep can be
+    relaunched. Each run writes its log to "xbeachmi.log" in its run
+    directory.
+
+    Parameters
+    ----------
+    runs : list
+        run descriptions as returned by :func:`expand`
+    cores : int, optional
+        core budget, defaults to the number of CPUs
+    memory : float, optional
+        memory budget in MB
+    memory_per_instance : float, optional
+        estimated memory per instance process in MB
+    verbose : int, optional
+        logging level of runs
+    poll : float, optional
+        interval between checks of active runs in seconds
+
+    Returns
+    -------
+    dict
+        dictionary with run names as keys and final status as values
+
+    '''
+
+    if cores is None:
+        cores = multiprocessing.cpu_count()
+
+    def get_memory(run):
+        if memory_per_instance is None:
+            return 0.
+        with open(run['configfile'], 'r') as fp:
+            config = json.load(fp)
+        instances = set(config.get('instances', []))
+        for t, i in config.get('scenario', []):
+            instances.update(i if type(i) is list else [i])
+        return len(instances) * memory_per_instance
+
+    result = {}
+    pending = []
+    for run in runs:
+        status = read_status(run['path'])
+        if status.get('status') == 'done' and status.get('parameters') == run['parameters']:
+            logger.info('Skipping finished run "%s"' % run['id'])
+            result[run['id']] = 'done'
+        else:
+            run['memory'] = get_memory(run)
+            pending.append(run)
+
+    active = []
+    try:
+        while pending or active:
+
+            # start runs that fit in the budgets
+            for run in list(pending):
+                used_cores = sum([r['cores'] for r, p in active])
+                used_memory = sum([r['memory'] for r, p in active])
+                fits = used_cores + run['cores'] <= cores and \
+                       (memory is None or used_memory + run['memory'] <= memory)
+                if fits or len(active) == 0:
+                    logger.info('Starting run "%s" (%d cores)...' % (run['id'], run['cores']))
+                    with open(os.path.join(run['path'], 'xbeachmi.log'), 'w') as fp:
+                        p = subprocess.Popen([sys.executable, '-m', 'xbeachmi.console',
+                                              run['configfile'], '--verbose=%d' % verbose],
+                                             cwd=run['path'], stdout=fp,
+                                             stderr=subprocess.STDOUT)
+                    write_status(run, 'running', pid=p.pid,
+                                 started=time.strftime('%Y-%m-%dT%H:%M:%S'))
+                    active.append((run, p))
+                    pending.remove(run)
+
+            time.sleep(poll)
+
+            # check active runs
+            for run, p in list(active):
+                if p.poll() is not None:
+                    status = 'done' if p.returncode == 0 else 'failed'
+                    logger.info('Run "%s" %s' % (run['id'], status))
+                    write_status(run, status, returncode=p.returncode,
+                                 finished=time.strftime('%Y-%m-%dT%H:%M:%S'))
+                    result[run['id']] = status
+                    active.remove((run, p))
+
+    except KeyboardInterrupt:
+        for run, p in active:
+            p.terminate()
+            p.wait()
+            write_status(run, 'interrupted')
+            result[run['id']] = 'interrupted'
+        raise
+
+    return result
@@ -0,0 +1,248 @@
+import time
+import logging
+import numpy as np
+
+import xbeachmi.parsers
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# prognostic variables, carried over from one time step to the next
+PROGNOSTIC = ['zb', 'zs', 'zs0', 'uu', 'vv', 'ee', 'rr']
+
+# diagnostic variables, recomputed from the prognostic variables
+# every time step
+DIAGNOSTIC = ['Fx', 'Fy', 'Sxy', 'Syy', 'Sxx', 'H', 'cgx', 'cgy', 'cx', 'cy',
+              'ctheta', 'k', 'c', 'cg', 'hh', 'vu', 'uv', 'qx', 'qy', 'E',
+              'R', 'urms', 'D', 'Qb', 'ust', 'ueu', 'vev', 'u', 'v', 'ue',
+              've', 'wetu', 'wetv', 'wetz', 'hu', 'hv', 'hum', 'hvm', 'vmag',
+              'ccg', 'uwf', 'vwf', 'ustr', 'usd', 'DR', 'ur', 'Susg', 'Svsg',
+              'Subg', 'Svbg', 'ceqbg', 'ceqsg', 'ua', 'BR', 'kb', 'pbbed',
+              'bedfriccoef', 'taubx', 'tauby', 'Df', 'Dp', 'Sutot', 'Svtot',
+              'cctot', 'cf', 'cfu', 'cfv', 'viscu', 'viscv']
+
+# variables with a directional dimension
+DIRECTIONAL = xbeachmi.parsers.DIRECTIONAL
+
+
+class SyntheticModel:
+    '''Synthetic BMI model engine
+
+    Pure NumPy stand-in for :class:`bmi.wrapper.BMIWrapper` that
+    exposes the same interface and variable names as XBeach, without
+    the need for a compiled XBeach library. It is used to measure the
+    overhead of XBeach MI itself, see :mod:`xbeachmi.benchmark`, and
+    is selected by setting "engine" to "synthetic" in the XBeach MI
+    configuration file.
+
+    The model reads the grid size ("nx", "ny"), directional bins
+    ("thetamin", "thetamax", "dtheta") and simulation period
+    ("tstart", "tstop") from the params.txt file. Additionally, the
+    following parameters are supported:
+
+    * synthetic_dt: time step in seconds (default: 1)
+    * synthetic_cost: wall time in seconds spent per time step
+      (default: 0)
+    * synthetic_nvars: number of additional diagnostic variables
+      named var000, var001, etc. (default: 0)
+
+    The prognostic variables evolve with simple, but coupled,
+    dynamics. All other variables are diagnostic and are recomputed
+    from the prognostic variables every time step, such that only
+    the prognostic variables determine the continuation of a
+    simulation.
+
+    '''
+
+
+    def __init__(self, engine='synthetic', configfile=None):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        engine : str, optional
+            name of engine, not used
+        configfile : str
+            path to params.txt file
+
+        '''
+
+        self.engine = engine
+        self.configfile = configfile
+        self.vars = {}
+        self.t = 0.
+
+
+    def initialize(self, configfile=None):
+        '''Initialize model
+
+        Parameters
+        ----------
+        configfile : str, optional
+            path to params.txt file
+
+        '''
+
+        if configfile is not None:
+            self.configfile = configfile
+
+        cfg = xbeachmi.parsers.XBeachParser(self.configfile).parse()
+
+        self.nx = int(cfg.get('nx', 100))
+        self.ny = int(cfg.get('ny', 0))
+        self.ntheta = max(1, int(np.round((cfg.get('thetamax', 90.) -
+                                           cfg.get('thetamin', -90.)) /
+                                          cfg.get('dtheta', 10.))))
+        self.tstart = float(cfg.get('tstart', 0.))
+        self.tstop = float(cfg.get('tstop', 3600.))
+        self.dt = float(cfg.get('synthetic_dt', 1.))
+        self.cost = float(cfg.get('synthetic_cost', 0.))
+        self.t = self.tstart
+
+        extra = ['var%03d' % i for i in range(int(cfg.get('synthetic_nvars', 0)))]
+        self.names = PROGNOSTIC + DIAGNOSTIC + extra
+
+        shape = (self.ny+1, self.nx+1)
+        x = np.linspace(0., 1., self.nx+1)[np.newaxis,:] * np.ones(shape)
+
+        self.vars = {}
+        for name in self.names:
+            if name in DIRECTIONAL:
+                self.vars[name] = np.zeros((self.ntheta,) + shape)
+            else:
+                self.vars[name] = np.zeros(shape)
+
+        self.vars['zb'][...] = 10. * x - 5.
+        self.vars['ee'][...] = 100.
+        self.diagnose()
+
+
+    def update(self, dt=-1):
+        '''Update model with one or more time steps
+
+        Parameters
+        ----------
+        dt : float, optional
+            time to advance, defaults to a single time step
+
+        '''
+
+        target = self.t + (dt if dt > 0. else self.dt)
+        while self.t < target - 1e-10:
+            step = min(self.dt, target - self.t)
+            self.step(step)
+            self.t += step
+
+
+    def step(self, dt):
+        '''Compute single time step
+
+        Parameters
+        ----------
+        dt : float
+            time step
+
+        '''
+
+        t0 = time.time()
+
+        v = self.vars
+        f = min(1., dt / 100.)
+
+        # tide, water level and flow
+        v['zs0'][...] = np.sin(2. * np.pi * self.t / 44712.)
+        v['zs'] += f * (v['zs0'] - v['zs']) + 1e-4 * f * v['ee'].mean(axis=0)
+        v['uu'] += f * (np.gradient(v['zs'], axis=-1) - v['uu'])
+        v['vv'] *= 1. - f
+
+        # waves
+        v['ee'] += f * (100. - v['ee']) - f * 0.1 * v['ee'] * (v['zs'] > v['zb'])
+        v['rr'] += f * (0.1 * v['ee'] - v['rr'])
+
+        # morphology
+        v['zb'] -= 1e-6 * dt * np.gradient(v['uu'] * np.sqrt(v['ee'].mean(axis=0)), axis=-1)
+
+        self.diagnose()
+
+        # spend remaining wall time of step cost
+        while time.time() - t0 < self.cost:
+            np.sqrt(v['ee'])
+
+
+    def diagnose(self):
+        '''Recompute diagnostic variables from prognostic variables'''
+
+        v = self.vars
+        h = np.maximum(v['zs'] - v['zb'], 0.)
+        H = np.sqrt(8. * v['ee'].mean(axis=0) / 1025. / 9.81)
+
+        v['hh'][...] = h
+        v['H'][...] = H
+        for i, name in enumerate(self.names):
+            if name in PROGNOSTIC or name in ('hh', 'H'):
+                continue
+            v[name][...] = (1. + .01 * i) * H + v['uu'] * (i % 3) + .1 * h
+
+
+    def finalize(self):
+        '''Finalize model'''
+
+        self.vars = {}
+
+
+    def get_current_time(self):
+        return self.t
+
+
+    def set_current_time(self, t):
+        self.t = t
+
+
+    def get_start_time(self):
+        return self.tstart
+
+
+    def get_end_time(self):
+        return self.tstop
+
+
+    def get_time_step(self):
+        return self.dt
+
+
+    def get_var(self, name):
+        return self.vars[name]
+
+
+    def set_var(self, name, var):
+        self.vars[name][...] = var
+
+
+    def set_var_slice(self, name, start, count, var):
+        self.vars[name][tuple([slice(i, i+n) for i, n in zip(start, count)])] = var
+
+
+    def set_var_index(self, name, index, var):
+        self.vars[name].flat[index] = var
+
+
+    def get_var_count(self):
+        return len(self.names)
+
+
+    def get_var_name(self, i):
+        return self.names[i]
+
+
+    def get_var_shape(self, name):
+        return self.vars[name].shape
+
+
+    def get_var_rank(self, name):
+        return self.vars[name].ndim
+
+
+    def get_var_type(self, name):
+        return 'double'
@@ -0,0 +1,691 @@
+import time
+import json
+import struct
+import numbers
+import logging
+import traceback
+import collections
+import numpy as np
+
+import xbeachmi.worker
+import xbeachmi.profiling
+from xbeachmi.model import XBeachMI
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# first bytes of a trace file
+MAGIC = b'XBMITRC1'
+
+# record types
+HEADER = b'H'
+STRING = b'S'
+CALL = b'C'
+
+# kinds of argument and result descriptors
+NONE = 0
+ARRAY = 1
+FLOAT = 2
+VALUE = 3
+
+# batch, time sent, execution time, total time, instance, function
+# and number of arguments of a call record
+CALL_FORMAT = struct.Struct('<IdffIIB')
+
+# lists of numbers longer than this are described by their shape only
+MAX_VALUE_LENGTH = 16
+
+# commands that are executed by stub workers to reproduce the use of
+# shared memory buffers
+BUFFER_COMMANDS = ['attach_buffer', 'detach_buffer', 'get_var_into', 'set_var_from']
+
+
+class TraceRecorder(xbeachmi.profiling.CallProfiler):
+    '''Recorder of calls from coordinator to instances
+
+    Writes every call made through
+    :func:`xbeachmi.model.XBeachMI._call_each` to a compact binary
+    trace file that can be replayed against stub workers, see
+    :class:`Replay`. Arrays passed as arguments or returned as
+    results are stored by their shape and data type only. Names of
+    instances, functions and variables and other small values are
+    stored once in a string table. Each call record holds:
+
+    * the batch of concurrent calls it belongs to
+    * the time it was sent relative to the start of the recording
+    * the execution time in the instance process
+    * the total time until its result was received
+    * the instance and function called
+    * descriptors of the arguments and result
+
+    Calls to instance processes are timed using the same protocol
+    as :class:`~xbeachmi.profiling.CallProfiler`, which the recorder
+    extends, such that a call profile is available as well. Records
+    are written as the run progresses, such that the trace of a run
+    that is interrupted can be replayed up to the interruption.
+
+    '''
+
+
+    def __init__(self, filename, header=None):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        filename : str
+            path to trace file
+        header : dict, optional
+            description of the recorded run
+
+        '''
+
+        xbeachmi.profiling.CallProfiler.__init__(self)
+
+        self.filename = filename
+        self.strings = {}
+        self.batch = 0
+        self.ncalls = 0
+
+        header = json.dumps(header or {}).encode('utf-8')
+
+        self.fp = open(filename, 'wb')
+        self.fp.write(MAGIC)
+        self.fp.write(HEADER + struct.pack('<I', len(header)) + header)
+
+
+    def begin(self):
+        '''Start new batch of concurrent calls'''
+
+        self.batch += 1
+
+
+    def receive(self, fcn, instance, args, r, t):
+        '''Unpack result from instance process and record call
+
+        See :func:`xbeachmi.profiling.CallProfiler.receive`.
+
+        '''
+
+        val = xbeachmi.profiling.CallProfiler.receive(self, fcn, instance, args, r, t)
+        if r is not None:
+            self.record(instance, fcn, args, val, t, r[1][1])
+
+        return val
+
+
+    def record(self, instance, fcn, args, val, t, execute):
+        '''Write call record
+
+        Parameters
+        ----------
+        instance : str
+            name of instance
+        fcn : str
+            name of function
+        args : tuple
+            function arguments
+        val : any
+            function result
+        t : float
+            time the call was sent
+        execute : float
+            execution time of the call
+
+        '''
+
+        parts = [CALL, CALL_FORMAT.pack(self.batch, t - self.start, execute,
+                                        time.time() - t, self._intern(instance),
+                                        self._intern(fcn), len(args))]
+        parts.extend([self._describe(arg) for arg in args])
+        parts.append(self._describe(val))
+
+        self.fp.write(b''.join(parts))
+        self.ncalls += 1
+
+
+    def close(self):
+        '''Close trace file'''
+
+        if not self.fp.closed:
+            self.fp.close()
+            logger.info('Recorded %d calls in %d batches to "%s"' %
+                        (self.ncalls, self.batch, self.filename))
+
+
+    def _intern(self, s):
+        '''Return index of string in string table, add if new'''
+
+        if s not in self.strings.keys():
+            i = len(self.strings)
+            b = s.encode('utf-8')
+            self.fp.write(STRING + struct.pack('<II', i, len(b)) + b)
+            self.strings[s] = i
+
+        return self.strings[s]
+
+
+    def _describe(self, value):
+        '''Return binary descriptor of argument or result'''
+
+        if value is None:
+            return struct.pack('<B', NONE)
+
+        if isinstance(value, (list, tuple)) and len(value) > MAX_VALUE_LENGTH and \
+           isinstance(value[0], numbers.Number):
+            value = np.asarray(value)
+
+        if isinstance(value, np.ndarray):
+            return struct.pack('<BIB', ARRAY, self._intern(value.dtype.str), value.ndim) + \
+                struct.pack('<%dI' % value.ndim, *value.shape)
+
+        if isinstance(value, float):
+            return struct.pack('<Bd', FLOAT, value)
+
+        try:
+            s = json.dumps(value, default=lambda x: x.tolist() if hasattr(x, 'tolist') else repr(x))
+        except (TypeError, ValueError):
+            s = json.dumps(repr(value))
+
+        return struct.pack('<BI', VALUE, self._intern(s))
+
+
+def read_trace(filename):
+    '''Read trace file
+
+    A trace that ends with an incomplete record, for example
+    because the recorded run was killed, is read up to the last
+    complete record.
+
+    Parameters
+    ----------
+    filename : str
+        path to trace file, see :class:`TraceRecorder`
+
+    Returns
+    -------
+    header : dict
+        description of the recorded run
+    records : list
+        call records as dictionaries with keys "batch", "sent",
+        "execute", "total", "instance", "function", "args" and
+        "result", the latter two holding descriptors as tuples with
+        the kind and either the data type and shape of an array or
+        a value
+
+    '''
+
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+
+    if not data.startswith(MAGIC):
+        raise ValueError('Not a trace file [%s]' % filename)
+
+    header = {}
+    strings = {}
+    values = {}
+    records = []
+
+    def read(fmt, pos):
+        return struct.unpack_from(fmt, data, pos), pos + struct.calcsize(fmt)
+
+    def describe(pos):
+        (kind,), pos = read('<B', pos)
+        if kind == NONE:
+            return (NONE,), pos
+        elif kind == ARRAY:
+            (dtype, ndim), pos = read('<IB', pos)
+            shape, pos = read('<%dI' % ndim, pos)
+            return (ARRAY, strings[dtype], shape), pos
+        elif kind == FLOAT:
+            (value,), pos = read('<d', pos)
+            return (FLOAT, value), pos
+        elif kind == VALUE:
+            (i,), pos = read('<I', pos)
+            if i not in values.keys():
+                values[i] = json.loads(strings[i])
+            return (VALUE, values[i]), pos
+        else:
+            raise ValueError('Invalid descriptor [%d]' % kind)
+
+    pos = len(MAGIC)
+    try:
+        while pos < len(data):
+            kind = data[pos:pos+1]
+            pos += 1
+            if kind == HEADER:
+                (n,), pos = read('<I', pos)
+                header = json.loads(data[pos:pos+n].decode('utf-8'))
+                pos += n
+            elif kind == STRING:
+                (i, n), pos = read('<II', pos)
+                if pos + n > len(data):
+                    raise struct.error('incomplete string')
+                strings[i] = data[pos:pos+n].decode('utf-8')
+                pos += n
+            elif kind == CALL:
+                (batch, sent, execute, total, instance, fcn, nargs), pos = \
+                    read(CALL_FORMAT.format, pos)
+                args = []
+                for i in range(nargs):
+                    arg, pos = describe(pos)
+                    args.append(arg)
+                result, pos = describe(pos)
+                records.append({
+                    'batch' : batch,
+                    'sent' : sent,
+                    'execute' : execute,
+                    'total' : total,
+                    'instance' : strings[instance],
+                    'function' : strings[fcn],
+                    'args' : args,
+                    'result' : result,
+                })
+            else:
+                raise ValueError('Invalid record type at byte %d [%r]' % (pos - 1, kind))
+    except struct.error:
+        logger.warning('Trace "%s" is incomplete, read %d calls' % (filename, len(records)))
+
+    return header, records
+
+
+def make_value(descriptor, cache):
+    '''Create stand-in value from descriptor
+
+    Parameters
+    ----------
+    descriptor : tuple
+        descriptor of argument or result, see :func:`read_trace`
+    cache : dict
+        arrays created earlier, arrays of equal shape and data type
+        are reused
+
+    Returns
+    -------
+    any
+        array of zeros with the recorded shape and data type or
+        recorded value
+
+    '''
+
+    kind = descriptor[0]
+    if kind == ARRAY:
+        key = descriptor[1:]
+        if key not in cache.keys():
+            cache[key] = np.zeros(descriptor[2], dtype=descriptor[1])
+        return cache[key]
+    elif kind == NONE:
+        return None
+    else:
+        return descriptor[1]
+
+
+class ReplayEngine:
+    '''Stub model engine replaying the calls of a single instance
+
+    Returns stand-in results with the recorded shape and data type
+    after the recorded execution time, see :func:`execute`.
+
+    '''
+
+
+    def __init__(self, records, scale=1.):
+        '''Initialize the class
+
+        Parameters
+        ----------
+        records : list
+            call records of instance, see :func:`read_trace`
+        scale : float, optional
+            factor applied to recorded execution times
+
+        '''
+
+        self.records = collections.deque(records)
+        self.scale = scale
+        self.cache = {}
+        self.arrays = {}
+
+
+    def get_var(self, var):
+        '''Return stand-in values for shared memory buffer of variable'''
+
+        if var not in self.arrays.keys():
+            self.arrays[var] = np.zeros_like(xbeachmi.worker._buffers[var][1])
+        return self.arrays[var]
+
+
+    def set_var(self, var, val):
+        pass
+
+
+def execute(w, fcn, args=()):
+    '''Execute a command on a replay engine
+
+    Counterpart of :func:`xbeachmi.worker.execute`. The next record
+    of the instance should match the command. Commands that use
+    shared memory buffers are executed for real, with zeros as
+    values, such that the buffers are attached and copied as in the
+    recorded run. The remainder of the recorded execution time is
+    spent sleeping.
+
+    Parameters
+    ----------
+    w : ReplayEngine
+        replay engine
+    fcn : str
+        name of command
+    args : tuple, optional
+        command arguments
+
+    Returns
+    -------
+    any
+        stand-in result
+
+    '''
+
+    t0 = time.time()
+
+    if not w.records:
+        if fcn == 'finalize':
+            return None # trace ended before the run was finalized
+        raise RuntimeError('Call "%s" beyond end of trace' % fcn)
+
+    record = w.records.popleft()
+    if record['function'] != fcn:
+        raise RuntimeError('Call "%s" does not match trace [%s]' % (fcn, record['function']))
+
+    if fcn in BUFFER_COMMANDS:
+        xbeachmi.worker.execute(w, fcn, args)
+
+    val = make_value(record['result'], w.cache)
+
+    delay = record['execute'] * w.scale - (time.time() - t0)
+    if delay > 0:
+        time.sleep(delay)
+
+    return val
+
+
+def run_worker(records, queue_to, queue_from, scale=1.):
+    '''Listening loop of stub instance process
+
+    Counterpart of :func:`xbeachmi.model.XBeachMI.run` for replay
+    engines.
+
+    Parameters
+    ----------
+    records : list
+        call records of instance, see :func:`read_trace`
+    queue_to : multiprocessing.JoinableQueue
+        joinable queue for sharing data from master to subprocess
+    queue_from : multiprocessing.Queue
+        queue for sharing data from subprocess to master
+    scale : float, optional
+        factor applied to recorded execution times
+
+    '''
+
+    w = ReplayEngine(records, scale=scale)
+
+    while True:
+        q = queue_to.get()
+
+        if q:
+            fcn, args = q[:2]
+            try:
+                if len(q) > 2:
+                    r = xbeachmi.profiling.execute(w, fcn, args, q[2], call=execute)
+                else:
+                    r = execute(w, fcn, args)
+                queue_from.put(r)
+            except:
+                logger.error(traceback.format_exc())
+                queue_from.put(None)
+                raise
+
+            queue_to.task_done()
+
+            if fcn == 'finalize':
+                break
+
+
+class Replay(XBeachMI):
+    '''Replay of a recorded run against stub workers
+
+    Reproduces the exact sequence of calls of a recorded run, see
+    :class:`TraceRecorder`, using the communication layer of the
+    coordinator, :func:`~xbeachmi.model.XBeachMI._call_each`, with
+    stub instance processes that return stand-in results of the
+    recorded shape and data type after the recorded execution time.
+    Shared memory buffers are created with the recorded sizes and
+    are attached and filled by the stub instance processes. Arrays
+    passed as arguments are replaced by zeros of the recorded shape
+    and data type and long lists of numbers by arrays.
+
+    The time the coordinator spent between batches of calls, for
+    example on aggregation and output, is not reproduced unless
+    ``gaps`` is set. The difference between the replay time and the
+    recorded execution time is therefore the overhead of the
+    coordinator and the communication layer.
+
+    .. code-block:: python
+
+       with Replay('trace.bin', scale=0.) as replay:
+           results = replay.replay()
+
+    '''
+
+
+    def __init__(self, filename, scale=1., gaps=False, profile=False):
+        '''Initialize class
+
+        Parameters
+        ----------
+        filename : str
+            path to trace file
+        scale : float, optional
+            factor applied to recorded execution times, zero replays
+            the communication only
+        gaps : bool, optional
+            sleep the time the coordinator spent between batches
+        profile : bool, optional
+            profile calls during replay, see
+            :class:`~xbeachmi.profiling.CallProfiler`
+
+        '''
+
+        from multiprocessing import Queue, JoinableQueue
+
+        self.filename = filename
+        self.scale = scale
+        self.gaps = gaps
+        self.header, self.records = read_trace(filename)
+
+        self.instances = {}
+        for instance in self.header.get('instances', []) + \
+            [r['instance'] for r in self.records]:
+            if instance not in self.instances.keys():
+                self.instances[instance] = {'process' : None,
+                                            'engine' : None,
+                                            'queue_to' : JoinableQueue(),
+                                            'queue_from' : Queue(),
+                                            'records' : []}
+        for record in self.records:
+            self.instances[record['instance']]['records'].append(record)
+
+        self.running = list(self.instances.keys())
+        self.inprocess = self.header.get('inprocess')
+        self.profiler = xbeachmi.profiling.CallProfiler() if profile else None
+        self.tracer = None
+        self.blocks = {}
+        self.cache = {}
+
+
+    def initialize(self):
+        '''Create shared memory blocks and start stub instance processes'''
+
+        from multiprocessing import Process
+
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        except ImportError:
+            pass
+
+        # create shared memory blocks of the recorded size
+        sizes = {}
+        for record in self.records:
+            if record['function'] == 'attach_buffer':
+                var, name, shape, dtype, offset = [d[1] for d in record['args']]
+                size = offset + int(np.prod(shape)) * np.dtype(dtype).itemsize
+                sizes[name] = max(sizes.get(name, 1), size)
+        if sizes:
+            from multiprocessing import shared_memory
+            for name, size in sizes.items():
+                self.blocks[name] = shared_memory.SharedMemory(create=True, size=size)
+
+        for name, instance in self.instances.items():
+            if name == self.inprocess:
+                instance['engine'] = ReplayEngine(instance['records'], scale=self.scale)
+            else:
+                instance['process'] = Process(target=run_worker,
+                                              args=(instance['records'],
+                                                    instance['queue_to'],
+                                                    instance['queue_from'],
+                                                    self.scale))
+        self.start()
+
+
+    def replay(self):
+        '''Replay recorded calls
+
+        Returns
+        -------
+        dict
+            replay results with the number of calls and batches, the
+            recorded wall time and time spent in calls, the replay
+            wall time, the time spent computing according to the
+            trace, the time slept between batches and the overhead
+
+        '''
+
+        batches = []
+        for record in self.records:
+            if not batches or batches[-1][0]['batch'] != record['batch']:
+                batches.append([])
+            batches[-1].append(record)
+
+        results = {
+            'calls' : len(self.records),
+            'batches' : len(batches),
+            'recorded' : 0.,
+            'recorded_calls' : 0.,
+            'replayed' : 0.,
+            'compute' : 0.,
+            'gaps' : 0.,
+            'overhead' : 0.,
+        }
+
+        if not batches:
+            return results
+
+        finalized = []
+        end = None
+        t0 = time.time()
+        for batch in batches:
+
+            if self.gaps and end is not None:
+                gap = batch[0]['sent'] - end
+                if gap > 0:
+                    time.sleep(gap)
+                    results['gaps'] += gap
+
+            self._call_each([(r['instance'], r['function'], self._make_args(r))
+                             for r in batch])
+
+            # process instances compute concurrently, the in-process
+            # instance after the commands are sent
+            results['compute'] += self.scale * (
+                max([0.] + [r['execute'] for r in batch if r['instance'] != self.inprocess]) +
+                sum([r['execute'] for r in batch if r['instance'] == self.inprocess]))
+
+            end = max([r['sent'] + r['total'] for r in batch])
+            results['recorded_calls'] += end - batch[0]['sent']
+            finalized.extend([r['instance'] for r in batch if r['function'] == 'finalize'])
+
+        results['replayed'] = time.time() - t0
+        results['recorded'] = end - batches[0][0]['sent']
+        results['overhead'] = results['replayed'] - results['compute'] - results['gaps']
+
+        # stop stub instance processes of incomplete traces
+        self._call_each([(instance, 'finalize', ())
+                         for instance in self.instances.keys()
+                         if instance not in finalized and instance != self.inprocess])
+
+        return results
+
+
+    def finalize(self):
+        '''Wait for stub instance processes and release shared memory'''
+
+        self.join()
+
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+        if self.profiler is not None:
+            self.profiler.log_report()
+
+
+    def _make_args(self, record):
+        '''Create stand-in arguments of recorded call'''
+
+        args = [make_value(d, self.cache) for d in record['args']]
+        if record['function'] == 'attach_buffer':
+            args[1] = self.blocks[args[1]].name
+
+        return tuple(args)
+
+
+    def _call_inprocess(self, fcn, args=(), copy=True):
+        '''In-process function caller, see :func:`execute`'''
+
+        val = execute(self.instances[self.inprocess]['engine'], fcn, args)
+        if copy and isinstance(val, np.ndarray):
+            return val.copy()
+        return val
+
+
+def format_results(results):
+    '''Format replay results
+
+    Parameters
+    ----------
+    results : dict
+        replay results, see :func:`Replay.replay`
+
+    Returns
+    -------
+    list
+        lines of report
+
+    '''
+
+    lines = []
+    lines.append('Replayed %d calls in %d batches' % (results['calls'], results['batches']))
+    lines.append('%-24s %10.3f s' % ('recorded run', results['recorded']))
+    lines.append('%-24s %10.3f s' % ('recorded calls', results['recorded_calls']))
+    lines.append('%-24s %10.3f s' % ('replay', results['replayed']))
+    lines.append('%-24s %10.3f s' % ('  compute', results['compute']))
+    lines.append('%-24s %10.3f s' % ('  gaps', results['gaps']))
+    lines.append('%-24s %10.3f s' % ('  overhead', results['overhead']))
+    if results['calls'] > 0:
+        lines.append('%-24s %10.3f ms' % ('overhead per call',
+                                          results['overhead'] / results['calls'] * 1e3))
+
+    return lines
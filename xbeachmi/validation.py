@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import logging
+
+import xbeachmi.parsers
+import xbeachmi.plugins
+
+
+# initialize log
+logger = logging.getLogger(__name__)
+
+
+# required entries of the netCDF configuration
+NETCDF_ENTRIES = ['outputfile', 'outputvars', 'interval', 'attributes', 'crs']
+
+
+def validate(configfile):
+    '''Validate XBeach MI configuration file
+
+    Checks the JSON configuration file, the instance definitions,
+    exchange and output configuration, the rendering of the params.txt
+    template for each instance and the existence of files referenced
+    in the rendered params.txt files. Nothing is written to disk and
+    neither the model engine nor netCDF4 is imported, such that a
+    configuration can be checked quickly before starting a run.
+
+    Parameters
+    ----------
+    configfile : str
+        path to JSON configuration file
+
+    Returns
+    -------
+    errors : list
+        messages describing problems that prevent a run
+    warnings : list
+        messages describing suspicious configuration
+
+    '''
+
+    errors = []
+    warnings = []
+
+    if not os.path.exists(configfile):
+        errors.append('Configuration file not found [%s]' % configfile)
+        return errors, warnings
+
+    try:
+        with open(configfile, 'r') as fp:
+            config = json.load(fp)
+    except ValueError as e:
+        errors.append('Invalid JSON in configuration file [%s]' % e)
+        return errors, warnings
+
+    root = os.path.dirname(os.path.abspath(configfile))
+
+    # engine
+    if not isinstance(config.get('engine', 'xbeach'), str):
+        errors.append('Engine should be a name [%s]' % config['engine'])
+
+    # instances and scenario
+    instances = list(config.get('instances', []))
+    tprev = None
+    for entry in config.get('scenario', []):
+        if type(entry) is not list or len(entry) != 2:
+            errors.append('Invalid scenario entry [%s]' % entry)
+            continue
+        t, i = entry
+        if not isinstance(t, (int, float)):
+            errors.append('Invalid scenario time [%s]' % t)
+        elif tprev is not None and t < tprev:
+            errors.append('Scenario times should be increasing [%s]' % t)
+        else:
+            tprev = t
+        instances.extend(i if type(i) is list else [i])
+    instances = sorted(set(instances))
+
+    if len(instances) == 0:
+        errors.append('No instances defined')
+
+    inprocess = config.get('inprocess')
+    if inprocess and inprocess is not True and inprocess not in instances:
+        errors.append('Invalid in-process instance [%s]' % inprocess)
+
+    # exchange
+    exchange = config.get('exchange', [])
+    if type(exchange) is dict:
+        for var, subset in exchange.items():
+            if subset is None:
+                continue
+            if 'start' not in subset or 'count' not in subset or \
+               len(subset['start']) != len(subset['count']):
+                errors.append('Exchange subset of "%s" needs "start" and "count" '
+                              'of equal length' % var)
+    elif type(exchange) is not list:
+        errors.append('Exchange should be a list or dictionary')
+    elif len(exchange) == 0 and len(instances) > 1:
+        warnings.append('No exchange variables defined')
+
+    # aggregation
+    method = config.get('aggregate', {}).get('method', 'average')
+    if method != 'average':
+        errors.append('Unsupported aggregation method [%s]' % method)
+
+    # output
+    if 'netcdf' in config.keys():
+        cfg = config['netcdf']
+        for key in NETCDF_ENTRIES:
+            if key not in cfg.keys():
+                errors.append('Missing netCDF entry "%s"' % key)
+        outputvars = cfg.get('outputvars', [])
+        for key in ['intervals', 'subset']:
+            for var in cfg.get(key, {}).keys():
+                if var not in outputvars:
+                    warnings.append('Variable "%s" in netCDF entry "%s" is not '
+                                    'an output variable' % (var, key))
+        for var in cfg.get('ensemble', {}).get('variables', []):
+            if var not in outputvars:
+                errors.append('Ensemble variable "%s" is not an output variable' % var)
+        if cfg.get('format', 'netcdf4') not in ['netcdf4', 'raw']:
+            errors.append('Unsupported output format [%s]' % cfg['format'])
+
+    # in-situ analysis plugins
+    for plugin in config.get('plugins', []):
+        if 'class' not in plugin.keys() or 'interval' not in plugin.keys():
+            errors.append('Plugin needs "class" and "interval" [%s]' % plugin)
+            continue
+        name = plugin['class']
+        if name not in xbeachmi.plugins.PLUGINS.keys():
+            module, _, clsname = name.rpartition('.')
+            try:
+                getattr(__import__(module, fromlist=[clsname]), clsname)
+            except (ImportError, AttributeError, ValueError):
+                errors.append('Plugin class not found [%s]' % name)
+        if plugin.get('output') == 'netcdf' and 'netcdf' not in config.keys():
+            warnings.append('No netCDF output configured for plugin "%s"' % name)
+
+    # call profiling
+    if 'profile' in config.keys() and not isinstance(config['profile'], (bool, dict)):
+        errors.append('Profile should be true, false or a dictionary [%s]' % config['profile'])
+
+    # live view
+    if 'live' in config.keys() and not config['live'].get('variables'):
+        errors.append('No variables defined for live view')
+
+    # call trace
+    if 'trace' in config.keys() and not config['trace'].get('file'):
+        errors.append('No file defined for call trace')
+
+    # scratch directory
+    if 'scratch' in config.keys():
+        scratch = config['scratch']
+        if isinstance(scratch, dict):
+            scratch = scratch.get('path', '')
+        path = os.path.join(root, os.path.expanduser(os.path.expandvars(scratch)))
+        if not scratch or not os.path.isdir(path):
+            errors.append('Scratch directory not found [%s]' % scratch)
+
+    # params.txt template
+    if 'params_file' not in config.keys():
+        errors.append('No params file defined')
+    else:
+        parfile = os.path.join(root, config['params_file'])
+        if not os.path.exists(parfile):
+            errors.append('Params file not found [%s]' % config['params_file'])
+        else:
+            e, w = validate_template(parfile, instances,
+                                     markers=config.get('markers'))
+            errors.extend(e)
+            warnings.extend(w)
+
+    return errors, warnings
+
+
+def validate_template(parfile, instances, markers=None):
+    '''Validate params.txt template and referenced files
+
+    Renders the template in memory for each instance with the same
+    markers as used by :func:`xbeachmi.model.XBeachMI.load_configfile`
+    and checks if files referenced by keys ending with "file" exist.
+
+    Parameters
+    ----------
+    parfile : str
+        path to params.txt template
+    instances : list
+        names of instances
+    markers : dict, optional
+        additional template markers
+
+    Returns
+    -------
+    errors : list
+        messages describing problems that prevent a run
+    warnings : list
+        messages describing suspicious configuration
+
+    '''
+
+    from mako.template import Template
+
+    errors = []
+    warnings = []
+
+    fpath, fname = os.path.split(os.path.abspath(parfile))
+
+    try:
+        template = Template(filename=parfile)
+    except Exception as e:
+        errors.append('Failed to compile template "%s" [%s]' % (fname, e))
+        return errors, warnings
+
+    for instance in instances:
+        try:
+            rendered = template.render(**get_markers(parfile, instance, instances,
+                                                     markers=markers))
+        except Exception as e:
+            errors.append('Failed to render template for "%s" [%s]' % (instance, e))
+            continue
+
+        for key, value in parse_params(rendered).items():
+            if key.endswith('file') and isinstance(value, str):
+                if not os.path.exists(os.path.join(fpath, value)):
+                    errors.append('File "%s" referenced by "%s" not found for "%s"' %
+                                  (value, key, instance))
+
+    return errors, warnings
+
+
+def get_markers(parfile, instance, instances, markers=None):
+    '''Return mako template markers of an instance
+
+    Parameters
+    ----------
+    parfile : str
+        path to params.txt template
+    instance : str
+        name of instance
+    instances : list
+        names of all instances
+    markers : dict, optional
+        additional template markers, see the "markers" entry of the
+        configuration file
+
+    Returns
+    -------
+    dict
+        template markers, see
+        :func:`xbeachmi.model.XBeachMI.load_configfile`
+
+    '''
+
+    fpath, fname = os.path.split(os.path.abspath(parfile))
+    path = os.path.join(fpath, '.%s' % instance)
+
+    result = {
+        'instance' : instance,
+        'path' : path,
+        'parfile' : os.path.join(path, fname),
+        'tmplfile' : os.path.join(path, '%s.tmpl' % fname),
+        'instances' : instances,
+    }
+    for k, v in (markers or {}).items():
+        result.setdefault(k, v)
+
+    return result
+
+
+def parse_params(text):
+    '''Parse rendered params.txt file contents
+
+    Unlike :class:`xbeachmi.parsers.XBeachParser`, referenced files
+    are not read.
+
+    Parameters
+    ----------
+    text : str
+        params.txt file contents
+
+    Returns
+    -------
+    dict
+        key/value pairs of model configuration
+
+    '''
+
+    params = {}
+    for line in text.splitlines():
+        if '=' in line:
+            key, value = re.split('\s*=\s*', line, maxsplit=1)
+            params[key.strip()] = \
+                xbeachmi.parsers.ConfigParser.parse_config_value(value)
+
+    return params
@@ -0,0 +1,364 @@
+import sys
+import numpy as np
+
+import xbeachmi.resources
+
+
+# shared memory buffers attached by the instance process, with
+# variable names as keys and tuples with the shared memory block and
+# the array using it as values
+_buffers = {}
+
+
+def create_engine(engine, configfile):
+    '''Create model engine
+
+    Parameters
+    ----------
+    engine : str
+        name of engine, either "synthetic" for the NumPy stand-in
+        model :class:`xbeachmi.synthetic.SyntheticModel` or the name
+        of a BMI compatible library, like "xbeach"
+    configfile : str
+        path to params.txt file
+
+    Returns
+    -------
+    bmi.wrapper.BMIWrapper or xbeachmi.synthetic.SyntheticModel
+        model engine
+
+    '''
+
+    if engine == 'synthetic':
+        import xbeachmi.synthetic
+        return xbeachmi.synthetic.SyntheticModel(engine, configfile=configfile)
+    else:
+        from bmi.wrapper import BMIWrapper
+        return BMIWrapper(engine, configfile=configfile)
+
+
+def preload_engine(engine):
+    '''Load model engine library without initializing a model
+
+    Processes forked after loading share the loaded library, such
+    that :func:`create_engine` does not need to load it again.
+
+    Parameters
+    ----------
+    engine : str
+        name of engine, see :func:`create_engine`
+
+    Returns
+    -------
+    bmi.wrapper.BMIWrapper or None
+        uninitialized model engine keeping the library loaded
+
+    '''
+
+    if engine == 'synthetic':
+        import xbeachmi.synthetic
+        return None
+    else:
+        from bmi.wrapper import BMIWrapper
+        return BMIWrapper(engine)
+
+
+def execute(w, fcn, args=()):
+    '''Execute a command on a model engine
+
+    Commands listed in :data:`COMMANDS` are worker-side helpers that
+    combine or reduce BMI calls before the result is returned to the
+    coordinator. All other commands are passed to the model engine
+    directly.
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    fcn : str
+        name of command
+    args : tuple, optional
+        command arguments
+
+    Returns
+    -------
+    any
+        command result
+
+    '''
+
+    if fcn in COMMANDS:
+        return COMMANDS[fcn](w, *args)
+    else:
+        return getattr(w, fcn)(*args)
+
+
+def get_var_info(w, variables):
+    '''Get shape, rank and type of multiple variables at once
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    variables : list
+        list of variable names
+
+    Returns
+    -------
+    dict
+        dictionary with variable names as keys and dictionaries with
+        keys "shape", "rank" and "type" as values
+
+    '''
+
+    info = {}
+    for var in variables:
+        info[var] = {
+            'shape' : tuple(w.get_var_shape(var)),
+            'rank' : int(w.get_var_rank(var)),
+            'type' : str(w.get_var_type(var)),
+        }
+
+    return info
+
+
+def get_var_slice(w, var, start, count, stride=None):
+    '''Get a rectangular, optionally strided, slice of a variable
+
+    Only the requested slice is copied and returned, such that the
+    remainder of the variable does not cross the process boundary.
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+    start : list
+        start index for each axis
+    count : list
+        number of elements along each axis
+    stride : list, optional
+        step size along each axis
+
+    Returns
+    -------
+    np.ndarray
+        copy of variable slice
+
+    '''
+
+    return np.array(w.get_var(var)[get_slices(start, count, stride)])
+
+
+def set_var_slice(w, var, start, count, val):
+    '''Set a rectangular slice of a variable
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+    start : list
+        start index for each axis
+    count : list
+        number of elements along each axis
+    val : np.ndarray
+        values of slice
+
+    '''
+
+    x = np.array(w.get_var(var))
+    x[get_slices(start, count)] = val
+    w.set_var(var, x)
+
+
+def get_var_index(w, var, index):
+    '''Get values of a variable at flat indices
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+    index : list
+        flat indices in variable
+
+    Returns
+    -------
+    np.ndarray
+        values at indices
+
+    '''
+
+    return np.array(np.asarray(w.get_var(var)).flat[index])
+
+
+def set_var_index(w, var, index, val):
+    '''Set values of a variable at flat indices
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+    index : list
+        flat indices in variable
+    val : np.ndarray
+        values at indices
+
+    '''
+
+    x = np.array(w.get_var(var))
+    x.flat[index] = val
+    w.set_var(var, x)
+
+
+def get_slices(start, count, stride=None):
+    '''Convert start, count and stride lists to a tuple of slices
+
+    Parameters
+    ----------
+    start : list
+        start index for each axis
+    count : list
+        number of elements along each axis
+    stride : list, optional
+        step size along each axis
+
+    Returns
+    -------
+    tuple
+        tuple of slice objects
+
+    '''
+
+    if len(start) != len(count):
+        raise ValueError('Start and count differ in length [%d != %d]' %
+                         (len(start), len(count)))
+
+    if stride is None:
+        stride = [1] * len(start)
+
+    return tuple([slice(i, i+n*k, k) for i, n, k in zip(start, count, stride)])
+
+
+def get_resources(w):
+    '''Get resource usage of instance process
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+
+    Returns
+    -------
+    dict
+        resource usage, see :func:`xbeachmi.resources.read_resources`
+
+    '''
+
+    return xbeachmi.resources.read_resources()
+
+
+def attach_buffer(w, var, name, shape, dtype, offset=0):
+    '''Attach shared memory buffer for a variable
+
+    The buffer is created by the coordinator, see
+    :func:`xbeachmi.model.XBeachMI.register_buffer`, and is used by
+    :func:`get_var_into` and :func:`set_var_from` to pass values
+    without pickling.
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+    name : str
+        name of shared memory block
+    shape : tuple
+        shape of buffer
+    dtype : str
+        data type of buffer
+    offset : int, optional
+        offset of buffer in shared memory block in bytes
+
+    '''
+
+    from multiprocessing import shared_memory
+
+    detach_buffer(w, var)
+
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+
+    _buffers[var] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+
+
+def detach_buffer(w, var):
+    '''Detach shared memory buffer of a variable, if attached
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+
+    '''
+
+    if var in _buffers.keys():
+        shm, arr = _buffers.pop(var)
+        del arr
+        shm.close()
+
+
+def get_var_into(w, var):
+    '''Copy variable into its shared memory buffer
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+
+    '''
+
+    np.copyto(_buffers[var][1], w.get_var(var), casting='unsafe')
+
+
+def set_var_from(w, var):
+    '''Set variable from its shared memory buffer
+
+    Parameters
+    ----------
+    w : bmi.wrapper.BMIWrapper
+        model engine
+    var : str
+        name of variable
+
+    '''
+
+    w.set_var(var, _buffers[var][1])
+
+
+# worker-side commands that are not part of the model engine
+COMMANDS = {
+    'get_var_info' : get_var_info,
+    'get_var_slice' : get_var_slice,
+    'set_var_slice' : set_var_slice,
+    'get_var_index' : get_var_index,
+    'set_var_index' : set_var_index,
+    'get_resources' : get_resources,
+    'attach_buffer' : attach_buffer,
+    'detach_buffer' : detach_buffer,
+    'get_var_into' : get_var_into,
+    'set_var_from' : set_var_from,
+}